@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Optional
+
+import redis
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+ALERT_TYPE = "price"
+ALERT_DIRECTIONS = ("above", "below")
+ALERT_ENTITY_TYPES = ("card", "graded")
+PENDING_KEY = "alerts_pending"
+FIRED_KEY = "alerts_fired"
+
+ENABLED_ALERTS_SQL = """
+SELECT entity_type, entity_id, direction, threshold, id
+FROM alerts
+WHERE enabled AND type = :type AND threshold IS NOT NULL AND direction IN ('above', 'below')
+ORDER BY entity_type, entity_id, direction, threshold, id
+"""
+
+# The index only narrows the candidates; the condition is checked again here so
+# a stale index can delay an alert but never fire one that no longer applies.
+# Alerts are one-shot: firing disables them until the user re-enables them.
+TRIGGER_SQL = """
+WITH observed AS (
+    SELECT alert_id, price
+    FROM unnest(CAST(:alert_ids AS integer[]), CAST(:prices AS double precision[])) AS o (alert_id, price)
+),
+fired AS (
+    UPDATE alerts a
+    SET enabled = false
+    FROM observed o
+    WHERE a.id = o.alert_id
+      AND a.enabled
+      AND ((a.direction = 'above' AND o.price >= a.threshold) OR (a.direction = 'below' AND o.price <= a.threshold))
+    RETURNING a.id, a.user_id, a.entity_type, a.entity_id, a.threshold, a.direction, o.price
+)
+INSERT INTO alert_events (alert_id, user_id, entity_type, entity_id, threshold, direction, price, triggered_at)
+SELECT id, user_id, entity_type, entity_id, threshold, direction, price, :now
+FROM fired
+RETURNING id, alert_id, user_id, entity_type, entity_id, threshold, direction, price, triggered_at
+"""
+
+# (entity_type, entity_id) -> direction -> (sorted thresholds, alert ids); shared
+# by every session in the process and reloaded after ALERT_INDEX_TTL seconds.
+_index: dict = {"entries": None, "loaded_at": 0.0}
+_redis: dict = {"client": None}
+
+
+def index_ttl() -> float:
+    return float(os.environ.get("ALERT_INDEX_TTL", "60"))
+
+
+def load_alert_index(db) -> dict:
+    entries: dict = {}
+    for entity_type, entity_id, direction, threshold, alert_id in db.execute(text(ENABLED_ALERTS_SQL), {"type": ALERT_TYPE}):
+        thresholds, alert_ids = entries.setdefault((entity_type, entity_id), {}).setdefault(direction, ([], []))
+        thresholds.append(threshold)
+        alert_ids.append(alert_id)
+    return entries
+
+
+def alert_index(db) -> dict:
+    if _index["entries"] is None or time.monotonic() - _index["loaded_at"] > index_ttl():
+        _index["entries"] = load_alert_index(db)
+        _index["loaded_at"] = time.monotonic()
+    return _index["entries"]
+
+
+def invalidate_alert_index() -> None:
+    _index["entries"] = None
+
+
+def matching_alerts(entry: dict, price: float) -> list[int]:
+    matched = []
+    if "above" in entry:
+        thresholds, alert_ids = entry["above"]
+        matched.extend(alert_ids[:bisect_right(thresholds, price)])
+    if "below" in entry:
+        thresholds, alert_ids = entry["below"]
+        matched.extend(alert_ids[bisect_left(thresholds, price):])
+    return matched
+
+
+def queue_price_check(db: Session, entity_type: str, entity_id: int, market: Optional[float]) -> None:
+    if market is not None:
+        db.info.setdefault(PENDING_KEY, {})[(entity_type, entity_id)] = market
+
+
+def trigger_alerts(db, observed: dict) -> list[dict]:
+    # observed maps (entity_type, entity_id) -> latest market price.
+    index = alert_index(db)
+    alert_ids: list[int] = []
+    prices: list[float] = []
+    for key, price in observed.items():
+        entry = index.get(key)
+        if entry:
+            matched = matching_alerts(entry, price)
+            alert_ids.extend(matched)
+            prices.extend([price] * len(matched))
+    if not alert_ids:
+        return []
+    rows = db.execute(text(TRIGGER_SQL), {"alert_ids": alert_ids, "prices": prices, "now": datetime.utcnow()}).all()
+    invalidate_alert_index()
+    return [
+        {
+            "id": row[0],
+            "alert_id": row[1],
+            "user_id": row[2],
+            "entity_type": row[3],
+            "entity_id": row[4],
+            "threshold": row[5],
+            "direction": row[6],
+            "price": row[7],
+            "triggered_at": row[8],
+        }
+        for row in rows
+    ]
+
+
+def redis_client() -> redis.Redis:
+    if _redis["client"] is None:
+        _redis["client"] = redis.Redis.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=1)
+    return _redis["client"]
+
+
+def publish_alert_events(events: list[dict]) -> None:
+    # Best effort: events are already stored, clients can poll /api/alerts/events.
+    try:
+        pipeline = redis_client().pipeline(transaction=False)
+        for item in events:
+            pipeline.publish(f"alerts:user:{item['user_id']}", json.dumps(item, default=str))
+        pipeline.execute()
+    except redis.RedisError as exc:
+        logger.info("[alerts] publish failed for %s events: %s", len(events), exc)
+
+
+@event.listens_for(Session, "before_commit")
+def evaluate_pending_alerts(db: Session) -> None:
+    pending = db.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    fired = trigger_alerts(db, pending)
+    if fired:
+        db.info.setdefault(FIRED_KEY, []).extend(fired)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_fired_alerts(db: Session) -> None:
+    fired = db.info.pop(FIRED_KEY, None)
+    if fired:
+        publish_alert_events(fired)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_fired_alerts(db: Session) -> None:
+    db.info.pop(PENDING_KEY, None)
+    db.info.pop(FIRED_KEY, None)
@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.csv_import import normalize_number
+from app.text import normalize_token
+
+MAX_CANDIDATES = 5
+FUZZY_MIN_SIMILARITY = 0.3
+# Weights of the parts a line can provide; the score is normalized over the
+# parts that were actually present.
+NAME_WEIGHT = 0.6
+SET_WEIGHT = 0.25
+NUMBER_WEIGHT = 0.15
+
+CATALOG_SQL = """
+SELECT c.id, c.name, c.number, st.id, st.code, st.name
+FROM cards c
+JOIN sets st ON st.id = c.set_id
+"""
+
+QUANTITY_RE = re.compile(r"^(?:\*\s*)?(?:(\d+)\s*[x×]?|[x×]\s*(\d+))\s+(.*)$", re.IGNORECASE)
+TRAILING_QUANTITY_RE = re.compile(r"^(.*?)\s+[x×]\s*(\d+)$", re.IGNORECASE)
+NUMBER_RE = re.compile(r"^#?([a-z]*\d+[a-z0-9]*)(?:/[a-z0-9]+)?$", re.IGNORECASE)
+PAREN_RE = re.compile(r"\(([^)]*)\)|\[([^\]]*)\]")
+SECTION_RE = re.compile(r"^[^\d]*:\s*\d*\s*$")
+
+# Shared by every session in the process and reloaded after CARD_INDEX_TTL
+# seconds, so catalog imports show up without a restart.
+_index: dict = {"entries": None, "loaded_at": 0.0}
+
+
+def index_ttl() -> float:
+    return float(os.environ.get("CARD_INDEX_TTL", "600"))
+
+
+def trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(left: set[str], right: set[str]) -> float:
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared) if shared else 0.0
+
+
+def initials(name: str) -> str:
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    return "".join(word[0] for word in words) if len(words) > 1 else ""
+
+
+def load_set_abbreviations(path: str) -> dict:
+    # PokemonTCG set metadata carries the PTCGO codes used in decklists ("BS", "SVI").
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    items = data
+    if isinstance(data, dict):
+        items = data.get("data") or data.get("sets") or []
+    return {
+        str(item.get("id") or item.get("code")): str(item["ptcgoCode"])
+        for item in items
+        if isinstance(item, dict) and item.get("ptcgoCode")
+    }
+
+
+def build_card_index(db) -> dict:
+    abbreviations = load_set_abbreviations(os.environ.get("SET_METADATA_PATH", "/data/sets/en.json"))
+    cards: dict[int, tuple] = {}
+    sets: dict[int, tuple] = {}
+    set_hints: dict[str, set[int]] = defaultdict(set)
+    by_name: dict[str, list[int]] = defaultdict(list)
+    by_number: dict[tuple, list[int]] = defaultdict(list)
+    for card_id, name, number, set_id, set_code, set_name in db.execute(text(CATALOG_SQL)):
+        name_key = normalize_token(name)
+        cards[card_id] = (name, number, set_id, name_key, normalize_number(number))
+        by_name[name_key].append(card_id)
+        by_number[(set_id, normalize_number(number))].append(card_id)
+        if set_id not in sets:
+            sets[set_id] = (set_code, set_name)
+            for hint in (set_code, set_name, initials(set_name), abbreviations.get(set_code, "")):
+                if normalize_token(hint):
+                    set_hints[normalize_token(hint)].add(set_id)
+    names = list(by_name)
+    name_trigrams = [trigrams(name) for name in names]
+    postings: dict[str, list[int]] = defaultdict(list)
+    for position, grams in enumerate(name_trigrams):
+        for gram in grams:
+            postings[gram].append(position)
+    return {
+        "cards": cards,
+        "sets": sets,
+        "set_hints": dict(set_hints),
+        "by_name": dict(by_name),
+        "by_number": dict(by_number),
+        "names": names,
+        "name_trigrams": name_trigrams,
+        "postings": dict(postings),
+    }
+
+
+def card_index(db) -> dict:
+    if _index["entries"] is None or time.monotonic() - _index["loaded_at"] > index_ttl():
+        _index["entries"] = build_card_index(db)
+        _index["loaded_at"] = time.monotonic()
+    return _index["entries"]
+
+
+def parse_line(index: dict, line: str) -> Optional[dict]:
+    # "4x Charizard BS 4", "Charizard (Base Set) #4/102", "Pikachu x2"; returns
+    # None for blank lines, comments and decklist section headers.
+    line = line.strip()
+    if not line or line.startswith(("#", "//")) or SECTION_RE.match(line):
+        return None
+    quantity = 1
+    match = QUANTITY_RE.match(line)
+    if match:
+        quantity = int(match.group(1) or match.group(2))
+        line = match.group(3)
+    else:
+        match = TRAILING_QUANTITY_RE.match(line)
+        if match:
+            line, quantity = match.group(1), int(match.group(2))
+    set_hint = None
+    for bracketed in PAREN_RE.finditer(line):
+        set_hint = (bracketed.group(1) or bracketed.group(2)).strip() or set_hint
+    tokens = PAREN_RE.sub(" ", line).split()
+    number = None
+    if len(tokens) > 1 and NUMBER_RE.match(tokens[-1]):
+        number = tokens.pop()
+    if set_hint is None:
+        for size in (3, 2, 1):
+            if len(tokens) > size and normalize_token(" ".join(tokens[-size:])) in index["set_hints"]:
+                set_hint = " ".join(tokens[-size:])
+                del tokens[-size:]
+                break
+    return {"quantity": quantity, "name": " ".join(tokens), "set": set_hint, "number": number}
+
+
+def fuzzy_names(index: dict, name_key: str, limit: int) -> list[tuple[str, float]]:
+    grams = trigrams(name_key)
+    shared: Counter = Counter()
+    for gram in grams:
+        shared.update(index["postings"].get(gram, ()))
+    # A similarity of at least FUZZY_MIN_SIMILARITY needs that share of the
+    # query's trigrams, which drops most postings hits before scoring.
+    min_shared = FUZZY_MIN_SIMILARITY * len(grams)
+    scored = []
+    for position, count in shared.items():
+        if count < min_shared:
+            continue
+        candidate = index["name_trigrams"][position]
+        score = count / (len(grams) + len(candidate) - count)
+        if score >= FUZZY_MIN_SIMILARITY:
+            scored.append((index["names"][position], score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+
+def rank_candidates(index: dict, parsed: dict, limit: int = MAX_CANDIDATES) -> list[dict]:
+    name_key = normalize_token(parsed["name"])
+    number_key = normalize_number(parsed["number"]) if parsed["number"] else None
+    set_ids = index["set_hints"].get(normalize_token(parsed["set"] or ""), set())
+    pool: set[int] = set()
+    if number_key and set_ids:
+        for set_id in set_ids:
+            pool.update(index["by_number"].get((set_id, number_key), ()))
+    if name_key in index["by_name"]:
+        pool.update(index["by_name"][name_key])
+    elif name_key:
+        for fuzzy_name, _ in fuzzy_names(index, name_key, limit):
+            pool.update(index["by_name"][fuzzy_name])
+    query_grams = trigrams(name_key)
+    total = NAME_WEIGHT + (SET_WEIGHT if set_ids else 0) + (NUMBER_WEIGHT if number_key else 0)
+    scored = []
+    for card_id in pool:
+        name, number, set_id, card_name_key, card_number_key = index["cards"][card_id]
+        score = NAME_WEIGHT * (1.0 if card_name_key == name_key else similarity(query_grams, trigrams(card_name_key)))
+        if set_id in set_ids:
+            score += SET_WEIGHT
+        if number_key and card_number_key == number_key:
+            score += NUMBER_WEIGHT
+        scored.append((round(score / total, 3), card_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    candidates = []
+    for score, card_id in scored[:limit]:
+        name, number, set_id = index["cards"][card_id][:3]
+        set_code, set_name = index["sets"][set_id]
+        candidates.append(
+            {
+                "card_id": card_id,
+                "name": name,
+                "number": number,
+                "set_id": set_id,
+                "set_code": set_code,
+                "set_name": set_name,
+                "score": score,
+            }
+        )
+    return candidates
+
+
+def match_lines(db, lines: list[str], limit: int = MAX_CANDIDATES) -> list[dict]:
+    index = card_index(db)
+    results = []
+    # Pasted lists repeat lines; identical parses are ranked once.
+    ranked: dict[tuple, list[dict]] = {}
+    for line_number, line in enumerate(lines, start=1):
+        parsed = parse_line(index, line)
+        if parsed is None:
+            continue
+        key = (normalize_token(parsed["name"]), parsed["set"], parsed["number"])
+        if key not in ranked:
+            ranked[key] = rank_candidates(index, parsed, limit)
+        results.append({"line": line_number, "text": line.strip(), **parsed, "candidates": ranked[key]})
+    return results
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import zlib
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import JobRun
+
+MANIFEST_FILE = "manifest.json"
+PAGE_SIZE = 4096
+PATCH_MAGIC = b"PVPATCH1"
+# A patch larger than this share of the full bundle is not worth shipping.
+MAX_PATCH_RATIO = 0.5
+
+# table -> (Postgres query, SQLite columns); the first column is the primary key.
+BUNDLE_TABLES = {
+    "sets": (
+        "SELECT id, code, name, series, release_date, total_cards, symbol_url FROM sets ORDER BY id",
+        ["id", "code", "name", "series", "release_date", "total_cards", "symbol_url"],
+    ),
+    "cards": (
+        """
+        SELECT id, set_id, number, name, rarity, supertype, subtypes, types, hp, artist, set_position
+        FROM cards ORDER BY id
+        """,
+        ["id", "set_id", "number", "name", "rarity", "supertype", "subtypes", "types", "hp", "artist", "set_position"],
+    ),
+    "card_images": (
+        "SELECT id, card_id, kind, local_path FROM card_images WHERE local_path IS NOT NULL ORDER BY id",
+        ["id", "card_id", "kind", "local_path"],
+    ),
+    # Best market price per card across sources, as on the card pages.
+    "prices": (
+        """
+        SELECT DISTINCT ON (entity_id) entity_id, market, low, mid, high, updated_at
+        FROM latest_prices
+        WHERE entity_type = 'card'
+        ORDER BY entity_id, market DESC NULLS LAST
+        """,
+        ["card_id", "market", "low", "mid", "high", "updated_at"],
+    ),
+}
+
+SCHEMA_SQL = f"""
+PRAGMA page_size = {PAGE_SIZE};
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE sets (
+    id INTEGER PRIMARY KEY, code TEXT NOT NULL, name TEXT NOT NULL, series TEXT,
+    release_date TEXT, total_cards INTEGER, symbol_url TEXT
+);
+CREATE TABLE cards (
+    id INTEGER PRIMARY KEY, set_id INTEGER NOT NULL, number TEXT NOT NULL, name TEXT NOT NULL,
+    rarity TEXT, supertype TEXT, subtypes TEXT, types TEXT, hp TEXT, artist TEXT, set_position INTEGER
+);
+CREATE INDEX ix_cards_set ON cards (set_id, set_position);
+CREATE TABLE card_images (id INTEGER PRIMARY KEY, card_id INTEGER NOT NULL, kind TEXT NOT NULL, local_path TEXT);
+CREATE INDEX ix_card_images_card ON card_images (card_id);
+CREATE TABLE prices (
+    card_id INTEGER PRIMARY KEY, market REAL, low REAL, mid REAL, high REAL, updated_at TEXT
+);
+CREATE VIRTUAL TABLE cards_fts USING fts5(
+    name, content='cards', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER cards_fts_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER cards_fts_delete AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER cards_fts_update AFTER UPDATE OF name ON cards BEGIN
+    INSERT INTO cards_fts (cards_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO cards_fts (rowid, name) VALUES (new.id, new.name);
+END;
+"""
+
+
+def bundle_root() -> str:
+    return os.environ.get("CATALOG_BUNDLE_ROOT", os.path.join(settings.media_root, "catalog"))
+
+
+def load_manifest(root: str) -> dict:
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"latest": None, "versions": [], "patches": []}
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_manifest(root: str, manifest: dict) -> None:
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bundle_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def sync_table(db: Session, bundle: sqlite3.Connection, table: str, chunk_size: int = 5000) -> dict:
+    # Diffs Postgres against the rows already in the bundle and writes only
+    # inserts, updates and deletes, so an incremental build touches few pages.
+    query, columns = BUNDLE_TABLES[table]
+    key = columns[0]
+    existing = {row[0]: row for row in bundle.execute(f"SELECT {', '.join(columns)} FROM {table}")}
+    upsert = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT ({key}) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in columns[1:])}"
+    )
+    stats = {"inserted": 0, "updated": 0, "deleted": 0}
+    result = db.execute(text(query), execution_options={"stream_results": True, "max_row_buffer": chunk_size})
+    for rows in result.partitions(chunk_size):
+        changed = []
+        for row in rows:
+            values = tuple(bundle_value(value) for value in row)
+            previous = existing.pop(values[0], None)
+            if previous == values:
+                continue
+            stats["updated" if previous else "inserted"] += 1
+            changed.append(values)
+        bundle.executemany(upsert, changed)
+    if existing:
+        bundle.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(row_id,) for row_id in existing])
+        stats["deleted"] = len(existing)
+    return stats
+
+
+def make_page_patch(base_path: str, target_path: str, patch_path: str) -> int:
+    # Page-level delta between two bundle files: every page of the target that
+    # differs from the base, zlib-compressed. See apply_page_patch for the layout.
+    base_size = os.path.getsize(base_path)
+    target_size = os.path.getsize(target_path)
+    compressor = zlib.compressobj(9)
+    with open(base_path, "rb") as base, open(target_path, "rb") as target, open(patch_path, "wb") as out:
+        out.write(PATCH_MAGIC)
+        out.write(bytes.fromhex(file_sha256(base_path)) + bytes.fromhex(file_sha256(target_path)))
+        out.write(struct.pack(">IQ", PAGE_SIZE, target_size))
+        for page in range((target_size + PAGE_SIZE - 1) // PAGE_SIZE):
+            block = target.read(PAGE_SIZE)
+            if page * PAGE_SIZE < base_size and base.read(PAGE_SIZE) == block:
+                continue
+            out.write(compressor.compress(struct.pack(">I", page) + block))
+        out.write(compressor.flush())
+    return os.path.getsize(patch_path)
+
+
+def apply_page_patch(base_path: str, patch_path: str, out_path: str) -> None:
+    # Layout: magic, sha256 of base and target, page size and target size,
+    # then a zlib stream of (page number, page bytes) records.
+    with open(patch_path, "rb") as handle:
+        if handle.read(len(PATCH_MAGIC)) != PATCH_MAGIC:
+            raise ValueError("Not a catalog bundle patch")
+        base_sha, target_sha = handle.read(32).hex(), handle.read(32).hex()
+        page_size, target_size = struct.unpack(">IQ", handle.read(12))
+        records = zlib.decompress(handle.read())
+    if file_sha256(base_path) != base_sha:
+        raise ValueError("Patch does not apply to this bundle version")
+    shutil.copyfile(base_path, out_path)
+    with open(out_path, "r+b") as out:
+        out.truncate(target_size)
+        record_size = 4 + page_size
+        for offset in range(0, len(records), record_size):
+            (page,) = struct.unpack(">I", records[offset : offset + 4])
+            block = records[offset + 4 : offset + record_size]
+            out.seek(page * page_size)
+            out.write(block)
+    if file_sha256(out_path) != target_sha:
+        raise ValueError("Patched bundle does not match the target version")
+
+
+def prune_versions(root: str, manifest: dict, keep: int) -> None:
+    versions = sorted(manifest["versions"], key=lambda entry: entry["version"])
+    kept = versions[-keep:]
+    kept_numbers = {entry["version"] for entry in kept}
+    patches = [entry for entry in manifest["patches"] if entry["from"] in kept_numbers and entry["to"] in kept_numbers]
+    for entry in versions[:-keep]:
+        path = os.path.join(root, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+    for entry in manifest["patches"]:
+        if entry not in patches and os.path.exists(os.path.join(root, entry["file"])):
+            os.remove(os.path.join(root, entry["file"]))
+    manifest["versions"] = kept
+    manifest["patches"] = patches
+
+
+def build_catalog_bundle(db: Session, root: Optional[str] = None, full: bool = False, keep: int = 5) -> dict:
+    # Copies the latest bundle and applies the catalog diff to it; a new
+    # version is only published when something changed.
+    root = root or bundle_root()
+    os.makedirs(root, exist_ok=True)
+    manifest = load_manifest(root)
+    previous = next((entry for entry in manifest["versions"] if entry["version"] == manifest["latest"]), None)
+    previous_path = os.path.join(root, previous["file"]) if previous else None
+    incremental = previous_path is not None and os.path.exists(previous_path) and not full
+    version = (manifest["latest"] or 0) + 1
+    filename = f"catalog-v{version}.sqlite"
+    tmp_path = os.path.join(root, f"{filename}.tmp")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if incremental:
+        shutil.copyfile(previous_path, tmp_path)
+    bundle = sqlite3.connect(tmp_path)
+    try:
+        if not incremental:
+            bundle.executescript(SCHEMA_SQL)
+        changes = {table: sync_table(db, bundle, table) for table in BUNDLE_TABLES}
+        changed = any(any(stats.values()) for stats in changes.values())
+        if incremental and not changed:
+            bundle.close()
+            os.remove(tmp_path)
+            return {"version": previous["version"], "changed": False, "changes": changes}
+        built_at = datetime.utcnow().isoformat()
+        bundle.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            [("version", str(version)), ("built_at", built_at)],
+        )
+        bundle.commit()
+        if not incremental:
+            # Full builds are compacted; incremental ones keep the page layout
+            # so the patch from the previous version stays small.
+            bundle.execute("INSERT INTO cards_fts (cards_fts) VALUES ('optimize')")
+            bundle.commit()
+            bundle.execute("VACUUM")
+    finally:
+        bundle.close()
+    path = os.path.join(root, filename)
+    os.replace(tmp_path, path)
+    entry = {
+        "version": version,
+        "file": filename,
+        "size": os.path.getsize(path),
+        "sha256": file_sha256(path),
+        "built_at": built_at,
+        "incremental": incremental,
+        "changes": changes,
+    }
+    manifest["versions"].append(entry)
+    manifest["latest"] = version
+    if previous_path is not None and os.path.exists(previous_path):
+        patch_name = f"catalog-v{previous['version']}-v{version}.patch"
+        patch_path = os.path.join(root, patch_name)
+        patch_size = make_page_patch(previous_path, path, patch_path)
+        if patch_size <= entry["size"] * MAX_PATCH_RATIO:
+            manifest["patches"].append(
+                {
+                    "from": previous["version"],
+                    "to": version,
+                    "file": patch_name,
+                    "size": patch_size,
+                    "sha256": file_sha256(patch_path),
+                }
+            )
+        else:
+            os.remove(patch_path)
+    prune_versions(root, manifest, keep)
+    save_manifest(root, manifest)
+    return {**entry, "changed": True}
+
+
+def run_catalog_bundle_job(db: Session, full: bool = False) -> JobRun:
+    run = JobRun(job_name="catalog_bundle", status="running")
+    db.add(run)
+    db.commit()
+    try:
+        keep = int(os.environ.get("CATALOG_BUNDLE_KEEP", "5"))
+        result = build_catalog_bundle(db, full=full, keep=keep)
+        run.status = "completed"
+        run.stats_json = {key: result[key] for key in ("version", "changed", "changes") if key in result}
+    except Exception as exc:
+        db.rollback()
+        run.status = "failed"
+        run.error_text = str(exc)
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    return run
@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterator
+
+from sqlalchemy import text
+
+from app.csv_import import OWN_COLUMNS
+
+EXPORT_FORMATS = {"csv": "text/csv", "json": "application/json", "ndjson": "application/x-ndjson"}
+EXPORT_CHUNK = 1000
+
+# Holdings start with the columns the CSV importer recognizes as its own
+# format, so a CSV export can be imported again as is.
+HOLDING_EXPORT_COLUMNS = OWN_COLUMNS + [
+    "holding_id",
+    "card_id",
+    "rarity",
+    "sell_price",
+    "sell_date",
+    "storage_location_id",
+    "market_price",
+    "value",
+]
+GRADED_EXPORT_COLUMNS = [
+    "graded_id",
+    "card_id",
+    "set_code",
+    "set_name",
+    "number",
+    "name",
+    "grader",
+    "grade",
+    "cert_number",
+    "purchase_price",
+    "purchase_date",
+    "vendor",
+    "notes",
+    "sell_price",
+    "sell_date",
+    "storage_location_id",
+    "market_price",
+]
+
+HOLDINGS_EXPORT_SQL = """
+SELECT
+    st.code AS set_code, st.name AS set_name, c.number, c.name, h.quantity, h.condition,
+    h.is_for_trade, h.is_wantlist, h.is_watched, h.purchase_price, h.purchase_date, h.vendor, h.notes,
+    h.id AS holding_id, c.id AS card_id, c.rarity, h.sell_price, h.sell_date, h.storage_location_id,
+    lp.market AS market_price, lp.market * h.quantity AS value
+FROM holdings h
+JOIN cards c ON c.id = h.card_id
+JOIN sets st ON st.id = c.set_id
+LEFT JOIN LATERAL (
+    SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = h.card_id
+) lp ON TRUE
+WHERE h.user_id = :user_id
+ORDER BY h.id
+"""
+
+GRADED_EXPORT_SQL = """
+SELECT
+    g.id AS graded_id, c.id AS card_id, st.code AS set_code, st.name AS set_name, c.number, c.name,
+    g.grader, g.grade, g.cert_number, g.purchase_price, g.purchase_date, g.vendor, g.notes,
+    g.sell_price, g.sell_date, g.storage_location_id, lp.market AS market_price
+FROM graded_items g
+JOIN cards c ON c.id = g.card_id
+JOIN sets st ON st.id = c.set_id
+LEFT JOIN LATERAL (
+    SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'graded' AND entity_id = g.id
+) lp ON TRUE
+WHERE g.user_id = :user_id
+ORDER BY g.id
+"""
+
+EXPORT_KINDS = {
+    "holdings": (HOLDINGS_EXPORT_SQL, HOLDING_EXPORT_COLUMNS),
+    "graded": (GRADED_EXPORT_SQL, GRADED_EXPORT_COLUMNS),
+}
+
+
+def export_value(value):
+    # json.dumps fallback for the date columns.
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def encode_rows(rows, columns: list[str], format: str, first: bool) -> str:
+    # Rows come in the column order of the export statement.
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if first:
+            writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue()
+    records = [json.dumps(dict(zip(columns, row)), default=export_value) for row in rows]
+    if format == "ndjson":
+        return "".join(record + "\n" for record in records)
+    return ("[\n" if first else ",\n") + ",\n".join(records)
+
+
+def export_chunks(session_factory, user_id: int, kind: str, format: str, chunk_size: int = EXPORT_CHUNK) -> Iterator[str]:
+    # Owns its session: the request-scoped one is closed before a streamed body finishes.
+    statement, columns = EXPORT_KINDS[kind]
+    db = session_factory()
+    try:
+        result = db.execute(
+            text(statement),
+            {"user_id": user_id},
+            execution_options={"stream_results": True, "max_row_buffer": chunk_size},
+        )
+        first = True
+        for rows in result.partitions(chunk_size):
+            yield encode_rows(rows, columns, format, first)
+            first = False
+        if format == "csv" and first:
+            yield encode_rows([], columns, format, first)
+        elif format == "json":
+            yield "[]\n" if first else "\n]\n"
+    finally:
+        db.close()
+
+
+def gzip_stream(chunks: Iterator[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(session_factory, user_id: int, kind: str, format: str, gzip: bool = False) -> Iterator[bytes]:
+    chunks = export_chunks(session_factory, user_id, kind, format)
+    if gzip:
+        return gzip_stream(chunks)
+    return (chunk.encode("utf-8") for chunk in chunks)
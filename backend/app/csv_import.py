@@ -0,0 +1,304 @@
+import csv
+import io
+import math
+import os
+import re
+from datetime import date, datetime
+from typing import IO, Iterable, Iterator, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Holding, JobRun
+from app.portfolio import mark_position_changed
+from app.set_completion import mark_completion_changed
+from app.sync import mark_sync_changed
+
+IMPORT_JOB_NAME = "holdings_import"
+IMPORT_BATCH = 1000
+MAX_REPORTED_UNMATCHED = 500
+
+# Columns written by our own holdings export.
+OWN_COLUMNS = [
+    "set_code",
+    "set_name",
+    "number",
+    "name",
+    "quantity",
+    "condition",
+    "is_for_trade",
+    "is_wantlist",
+    "is_watched",
+    "purchase_price",
+    "purchase_date",
+    "vendor",
+    "notes",
+]
+
+# format -> field -> header candidates (compared case-insensitively). A format
+# is picked when all of its "signature" headers are present.
+CSV_FORMATS = {
+    "own": {
+        "signature": ["set_code", "number", "quantity", "is_for_trade"],
+        "set_code": ["set_code"],
+        "set_name": ["set_name"],
+        "number": ["number"],
+        "name": ["name"],
+        "quantity": ["quantity"],
+        "condition": ["condition"],
+        "is_for_trade": ["is_for_trade"],
+        "is_wantlist": ["is_wantlist"],
+        "is_watched": ["is_watched"],
+        "purchase_price": ["purchase_price"],
+        "purchase_date": ["purchase_date"],
+        "vendor": ["vendor"],
+        "notes": ["notes"],
+    },
+    "collectr": {
+        "signature": ["product name", "card number", "portfolio name"],
+        "set_name": ["set"],
+        "number": ["card number"],
+        "name": ["product name"],
+        "quantity": ["quantity"],
+        "condition": ["card condition"],
+        "purchase_price": ["average cost paid"],
+        "is_watched": ["watchlist"],
+        "notes": ["notes"],
+    },
+    "tcgplayer": {
+        "signature": ["quantity", "name", "set"],
+        "set_code": ["set code"],
+        "set_name": ["set"],
+        "number": ["card number", "number"],
+        "name": ["simple name", "name", "product name"],
+        "quantity": ["quantity", "total quantity", "add to quantity"],
+        "condition": ["condition"],
+        "purchase_price": ["price each", "price", "tcg market price"],
+    },
+}
+
+CONDITIONS = {
+    "near mint": "NM",
+    "nm": "NM",
+    "mint": "NM",
+    "lightly played": "LP",
+    "lp": "LP",
+    "moderately played": "MP",
+    "mp": "MP",
+    "heavily played": "HP",
+    "hp": "HP",
+    "damaged": "DMG",
+    "dmg": "DMG",
+}
+
+CATALOG_SQL = """
+SELECT c.id, c.number, c.name, st.code, st.name
+FROM cards c
+JOIN sets st ON st.id = c.set_id
+"""
+
+
+def normalize_text(value: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9]+", "", (value or "").casefold())
+
+
+def normalize_number(value: Optional[str]) -> str:
+    # "004/102" -> "4", "TG01" -> "tg1", "SWSH001" -> "swsh1"
+    number = (value or "").strip().casefold().split("/", 1)[0]
+    number = re.sub(r"[^a-z0-9]+", "", number)
+    return re.sub(r"^([a-z]*)0+(?=\d)", r"\1", number)
+
+
+def build_card_lookup(db) -> dict:
+    # Built once per import; ambiguous name keys map to None and never match.
+    lookup: dict = {"code_number": {}, "set_number": {}, "name_set": {}, "name": {}}
+
+    def add(table: dict, key, card_id: int) -> None:
+        table[key] = card_id if table.get(key, card_id) == card_id else None
+
+    for card_id, number, name, set_code, set_name in db.execute(text(CATALOG_SQL)):
+        number_key = normalize_number(number)
+        name_key = normalize_text(name)
+        lookup["code_number"][(normalize_text(set_code), number_key)] = card_id
+        add(lookup["set_number"], (normalize_text(set_name), number_key), card_id)
+        add(lookup["name_set"], (name_key, normalize_text(set_name)), card_id)
+        add(lookup["name_set"], (name_key, normalize_text(set_code)), card_id)
+        add(lookup["name"], name_key, card_id)
+    return lookup
+
+
+def resolve_card(lookup: dict, row: dict) -> Optional[int]:
+    number = normalize_number(row.get("number"))
+    set_code = normalize_text(row.get("set_code"))
+    set_name = normalize_text(row.get("set_name"))
+    name = normalize_text(row.get("name"))
+    candidates = []
+    if number:
+        candidates.append(lookup["code_number"].get((set_code, number)) if set_code else None)
+        candidates.append(lookup["code_number"].get((set_name, number)) if set_name else None)
+        candidates.append(lookup["set_number"].get((set_name, number)) if set_name else None)
+    if name:
+        candidates.append(lookup["name_set"].get((name, set_name or set_code)))
+        candidates.append(lookup["name"].get(name))
+    return next((card_id for card_id in candidates if card_id), None)
+
+
+def detect_format(headers: Iterable[str]) -> Optional[str]:
+    present = {header.strip().casefold() for header in headers if header}
+    for name, spec in CSV_FORMATS.items():
+        if all(column in present for column in spec["signature"]):
+            return name
+    return None
+
+
+def map_row(spec: dict, row: dict) -> dict:
+    normalized = {(key or "").strip().casefold(): value for key, value in row.items()}
+    mapped = {}
+    for field, candidates in spec.items():
+        if field == "signature":
+            continue
+        mapped[field] = next((normalized[column].strip() for column in candidates if normalized.get(column)), None)
+    return mapped
+
+
+def parse_bool(value: Optional[str]) -> bool:
+    return (value or "").strip().casefold() in ("1", "true", "yes", "y", "x")
+
+
+def parse_float(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        number = float(value.replace("$", "").replace(",", ""))
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def holding_values(row: dict) -> Optional[dict]:
+    try:
+        quantity = int(float(row.get("quantity") or 1))
+    except (ValueError, OverflowError):
+        return None
+    if quantity <= 0:
+        return None
+    return {
+        "quantity": quantity,
+        "condition": CONDITIONS.get((row.get("condition") or "").casefold(), "NM"),
+        "is_for_trade": parse_bool(row.get("is_for_trade")),
+        "is_wantlist": parse_bool(row.get("is_wantlist")),
+        "is_watched": parse_bool(row.get("is_watched")),
+        "purchase_price": parse_float(row.get("purchase_price")),
+        "purchase_date": parse_date(row.get("purchase_date")),
+        "vendor": row.get("vendor"),
+        "notes": row.get("notes"),
+    }
+
+
+def iter_csv_rows(handle: IO[bytes]) -> tuple[Optional[str], Iterator[dict]]:
+    # Wraps the binary upload so rows are decoded and parsed one at a time.
+    reader = csv.DictReader(io.TextIOWrapper(handle, encoding="utf-8-sig", newline=""))
+    format_name = detect_format(reader.fieldnames or [])
+    if format_name is None:
+        return None, iter(())
+    spec = CSV_FORMATS[format_name]
+    return format_name, (map_row(spec, row) for row in reader)
+
+
+def flush_holdings(db: Session, user_id: int, rows: list[dict]) -> None:
+    now = datetime.utcnow()
+    values = [{**row, "user_id": user_id, "created_at": now, "updated_at": now} for row in rows]
+    holding_ids = db.execute(insert(Holding).returning(Holding.id), values).scalars().all()
+    card_ids = {row["card_id"] for row in rows}
+    mark_position_changed(db, user_id, card_ids)
+    mark_completion_changed(db, user_id, card_ids)
+    mark_sync_changed(db, user_id, "holding", holding_ids)
+
+
+def import_holdings_csv(db: Session, run: JobRun, user_id: int, handle: IO[bytes], batch_size: int = IMPORT_BATCH) -> dict:
+    # Commits every batch and stores progress in run.stats_json as it goes.
+    stats = dict(run.stats_json or {})
+    format_name, rows = iter_csv_rows(handle)
+    if format_name is None:
+        raise ValueError("CSV format not recognized. Expected a TCGplayer, Collectr or holdings export file.")
+    lookup = build_card_lookup(db)
+    stats.update({"format": format_name, "rows": 0, "imported": 0, "unmatched": 0, "unmatched_rows": []})
+    pending: list[dict] = []
+    # Line 1 is the header.
+    for line, row in enumerate(rows, start=2):
+        stats["rows"] += 1
+        card_id = resolve_card(lookup, row)
+        values = holding_values(row) if card_id else None
+        if values is None:
+            stats["unmatched"] += 1
+            if len(stats["unmatched_rows"]) < MAX_REPORTED_UNMATCHED:
+                stats["unmatched_rows"].append({
+                    "line": line,
+                    "reason": "invalid quantity" if card_id else "card not found",
+                    "set": row.get("set_code") or row.get("set_name"),
+                    "number": row.get("number"),
+                    "name": row.get("name"),
+                })
+            continue
+        pending.append({**values, "card_id": card_id})
+        if len(pending) >= batch_size:
+            flush_holdings(db, user_id, pending)
+            stats["imported"] += len(pending)
+            pending = []
+            run.stats_json = dict(stats)
+            db.commit()
+    if pending:
+        flush_holdings(db, user_id, pending)
+        stats["imported"] += len(pending)
+    run.stats_json = stats
+    db.commit()
+    return stats
+
+
+def run_import_job(db: Session, run: JobRun, user_id: int, handle: IO[bytes]) -> JobRun:
+    run.status = "running"
+    db.commit()
+    try:
+        import_holdings_csv(db, run, user_id, handle)
+        run.status = "completed"
+    except Exception as exc:
+        db.rollback()
+        run.status = "failed"
+        run.error_text = str(exc)
+        # Batches are committed as they go; say how many rows a failure left behind.
+        stats = dict(run.stats_json or {})
+        if stats.get("imported"):
+            stats["partial"] = True
+            run.stats_json = stats
+            run.error_text = f"{exc} ({stats['imported']} rows from earlier batches were already imported)"
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    return run
+
+
+def spool_path(job_id: int) -> str:
+    return os.path.join(settings.media_root, "imports", f"holdings-{job_id}.csv")
+
+
+def run_spooled_import(session_factory, job_id: int, user_id: int) -> None:
+    # Background task entry point: owns its session and removes the spooled upload.
+    db = session_factory()
+    path = spool_path(job_id)
+    try:
+        run = db.get(JobRun, job_id)
+        with open(path, "rb") as handle:
+            run_import_job(db, run, user_id, handle)
+    finally:
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
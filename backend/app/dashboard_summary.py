@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+from typing import Iterable
+
+import redis
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.alerts import redis_client
+
+logger = logging.getLogger("uvicorn.error")
+
+STALE_KEY = "summary_stale"
+TOP_HOLDINGS = 5
+
+# One pass over the user's unsold holdings and graded items. Only counts,
+# sums and the top cards come back, whatever the collection size. Values are
+# read from portfolio_totals so they match the live value and snapshots.
+SUMMARY_SQL = """
+WITH held AS (
+    SELECT h.card_id, h.quantity, h.is_wantlist, h.is_for_trade, lp.market, lp.market * h.quantity AS value
+    FROM holdings h
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = h.card_id
+    ) lp ON TRUE
+    WHERE h.user_id = :user_id AND h.sell_date IS NULL AND h.sell_price IS NULL
+),
+owned AS (
+    SELECT * FROM held WHERE NOT is_wantlist AND quantity > 0
+),
+top AS (
+    SELECT o.card_id, c.name, c.number, st.code AS set_code, SUM(o.quantity) AS quantity, MAX(o.market) AS market, SUM(o.value) AS value
+    FROM owned o
+    JOIN cards c ON c.id = o.card_id
+    JOIN sets st ON st.id = c.set_id
+    WHERE o.value > 0
+    GROUP BY o.card_id, c.name, c.number, st.code
+    ORDER BY SUM(o.value) DESC, o.card_id
+    LIMIT :top
+),
+graded AS (
+    SELECT COUNT(*) AS graded, COUNT(lp.market) AS priced_graded
+    FROM graded_items g
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'graded' AND entity_id = g.id
+    ) lp ON TRUE
+    WHERE g.user_id = :user_id AND g.sell_date IS NULL AND g.sell_price IS NULL
+)
+SELECT
+    (SELECT COUNT(*) FROM owned) AS holdings,
+    (SELECT COUNT(market) FROM owned) AS priced_holdings,
+    (SELECT COALESCE(SUM(quantity), 0) FROM owned) AS copies,
+    (SELECT COUNT(*) FROM owned WHERE is_for_trade) AS for_trade,
+    (SELECT COUNT(*) FROM held WHERE is_wantlist) AS wantlist,
+    g.graded, g.priced_graded,
+    COALESCE(pt.raw_value, 0) AS holdings_value,
+    COALESCE(pt.graded_value, 0) AS graded_value,
+    COALESCE(pt.total_value, 0) AS total_value,
+    (SELECT COALESCE(json_agg(top ORDER BY value DESC, card_id), '[]') FROM top) AS top_holdings
+FROM graded g
+LEFT JOIN portfolio_totals pt ON pt.user_id = :user_id
+"""
+
+
+def cache_ttl() -> int:
+    return int(os.environ.get("SUMMARY_CACHE_TTL", "900"))
+
+
+def summary_keys(user_id: int) -> tuple[str, str]:
+    return f"summary:user:{user_id}", f"summary:user:{user_id}:generation"
+
+
+def compute_summary(db, user_id: int) -> dict:
+    row = db.execute(text(SUMMARY_SQL), {"user_id": user_id, "top": TOP_HOLDINGS}).one()
+    summary = dict(row._mapping)
+    for field in ("holdings_value", "graded_value", "total_value"):
+        summary[field] = round(summary[field], 2)
+    return summary
+
+
+def load_summary(db, user_id: int) -> dict:
+    # The cached copy is tagged with the user's generation, which is bumped
+    # after every commit that touches their holdings, graded items or prices.
+    # The generation is read before the summary is computed, so a write that
+    # commits mid-way leaves the new copy behind an already stale generation.
+    summary_key, generation_key = summary_keys(user_id)
+    try:
+        cached, generation = redis_client().mget(summary_key, generation_key)
+    except redis.RedisError as exc:
+        logger.info("[summary] cache unavailable: %s", exc)
+        return compute_summary(db, user_id)
+    generation = int(generation or 0)
+    if cached:
+        payload = json.loads(cached)
+        if payload["generation"] == generation:
+            return payload["summary"]
+    summary = compute_summary(db, user_id)
+    try:
+        redis_client().set(summary_key, json.dumps({"generation": generation, "summary": summary}), ex=cache_ttl())
+    except redis.RedisError as exc:
+        logger.info("[summary] cache write failed: %s", exc)
+    return summary
+
+
+def mark_summary_stale(db: Session, user_ids: Iterable[int]) -> None:
+    db.info.setdefault(STALE_KEY, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_stale_summaries(db: Session) -> None:
+    stale = db.info.pop(STALE_KEY, None)
+    if not stale:
+        return
+    try:
+        pipeline = redis_client().pipeline(transaction=False)
+        for user_id in stale:
+            pipeline.incr(summary_keys(user_id)[1])
+        pipeline.execute()
+    except redis.RedisError as exc:
+        logger.info("[summary] invalidation failed for %s users: %s", len(stale), exc)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_stale_summaries(db: Session) -> None:
+    db.info.pop(STALE_KEY, None)
@@ -0,0 +1,119 @@
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.holdings_listing import decode_cursor, encode_cursor
+
+PERMISSION_TTL = 60
+PERMISSION_CACHE_SIZE = 10000
+COMPARE_DIRECTIONS = ("theirs", "mine", "common")
+# Holding fields a viewer does not get to see.
+PRIVATE_FIELDS = ("purchase_price", "purchase_date", "notes", "storage_location_id")
+
+_permissions: dict[tuple[int, int], tuple[Optional[str], float]] = {}
+
+PERMISSION_SQL = """
+SELECT permission FROM shared_collections WHERE owner_user_id = :owner_id AND viewer_user_id = :viewer_id
+"""
+
+OWNED_CARD_IDS = """
+SELECT card_id FROM holdings
+WHERE user_id = :{user} AND quantity > 0 AND NOT is_wantlist AND sell_date IS NULL AND sell_price IS NULL
+"""
+
+# Set operation over the two owners' card ids; both sides read the
+# (user_id, card_id) index only. Pages are keyed on (price, card id).
+COMPARE_SQL = """
+WITH diff AS (
+    {left}
+    {operator}
+    {right}
+),
+priced AS (
+    SELECT
+        c.id AS card_id, c.name, c.number, c.rarity,
+        st.id AS set_id, st.code AS set_code, st.name AS set_name,
+        lp.market AS card_price, img.local_path AS image_path,
+        COALESCE(lp.market, -1) AS sort_key
+    FROM diff d
+    JOIN cards c ON c.id = d.card_id
+    JOIN sets st ON st.id = c.set_id
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = c.id
+    ) lp ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT local_path FROM card_images
+        WHERE card_id = c.id AND kind = 'small' AND local_path IS NOT NULL
+        ORDER BY id
+        LIMIT 1
+    ) img ON TRUE
+)
+SELECT * FROM priced
+WHERE {after}
+ORDER BY sort_key DESC, card_id DESC
+LIMIT :limit
+"""
+
+
+def collection_permission(db, owner_id: int, viewer_id: int) -> Optional[str]:
+    key = (owner_id, viewer_id)
+    cached = _permissions.get(key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    permission = db.execute(text(PERMISSION_SQL), {"owner_id": owner_id, "viewer_id": viewer_id}).scalar()
+    # Misses are not cached, so a share granted on accept applies at once.
+    if permission is None:
+        return None
+    if len(_permissions) >= PERMISSION_CACHE_SIZE:
+        _permissions.clear()
+    _permissions[key] = (permission, time.monotonic() + PERMISSION_TTL)
+    return permission
+
+
+def hide_private_fields(item: dict) -> dict:
+    return {key: value for key, value in item.items() if key not in PRIVATE_FIELDS}
+
+
+def load_collection_diff(
+    db,
+    owner_id: int,
+    viewer_id: int,
+    direction: str,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> dict:
+    # theirs: cards the owner has that the viewer does not; mine: the reverse;
+    # common: cards both own.
+    owner_cards = OWNED_CARD_IDS.format(user="owner_id")
+    viewer_cards = OWNED_CARD_IDS.format(user="viewer_id")
+    left, operator, right = {
+        "theirs": (owner_cards, "EXCEPT", viewer_cards),
+        "mine": (viewer_cards, "EXCEPT", owner_cards),
+        "common": (owner_cards, "INTERSECT", viewer_cards),
+    }[direction]
+    params: dict = {"owner_id": owner_id, "viewer_id": viewer_id, "limit": page_size + 1}
+    after = "TRUE"
+    if cursor:
+        after_key, after_id = decode_cursor(cursor)
+        after = "(sort_key, card_id) < (CAST(:after_key AS double precision), :after_id)"
+        params.update({"after_key": after_key, "after_id": after_id})
+    statement = COMPARE_SQL.format(left=left, operator=operator, right=right, after=after)
+    rows = db.execute(text(statement), params).all()
+    page = rows[:page_size]
+    next_cursor = encode_cursor(page[-1].sort_key, page[-1].card_id) if len(rows) > page_size else None
+    data = [
+        {
+            "card": {
+                "id": row.card_id,
+                "name": row.name,
+                "number": row.number,
+                "rarity": row.rarity,
+                "image_path": row.image_path,
+            },
+            "set": {"id": row.set_id, "code": row.set_code, "name": row.set_name},
+            "card_price": row.card_price,
+        }
+        for row in page
+    ]
+    return {"data": data, "next_cursor": next_cursor}
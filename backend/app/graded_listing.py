@@ -0,0 +1,142 @@
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.holdings_listing import decode_cursor, encode_cursor
+
+# sort name -> (ordering expression over "listed", direction, cursor value type)
+GRADED_SORTS = {
+    "recent": ("id", "DESC", "integer"),
+    "value": ("COALESCE(graded_price, -1)", "DESC", "double precision"),
+    "name": ("card_name", "ASC", "text"),
+    "number": ("set_code || '-' || lpad(card_number, 8, '0')", "ASC", "text"),
+}
+
+# One row per graded item with its card and set, the best graded price (and
+# the source it came from), the raw card price for comparison, the tag
+# details and the local small image.
+LISTING_SQL = """
+WITH listed AS (
+    SELECT
+        g.id, g.grader, g.grade, g.cert_number, g.price_estimator, g.notes,
+        g.purchase_price, g.purchase_date, g.vendor, g.sell_price, g.sell_date,
+        g.storage_location_id, g.created_at,
+        c.id AS card_id, c.name AS card_name, c.number AS card_number, c.rarity,
+        st.id AS set_id, st.code AS set_code, st.name AS set_name,
+        gp.market AS graded_price, gp.source AS price_source, gp.source_type AS price_source_type,
+        gp.updated_at AS price_updated_at,
+        cp.market AS card_price,
+        td.graded_item_id AS tag_graded_id, td.overall_grade, td.subgrades_json, td.dig_report_url,
+        img.local_path AS image_path
+    FROM graded_items g
+    JOIN cards c ON c.id = g.card_id
+    JOIN sets st ON st.id = c.set_id
+    LEFT JOIN LATERAL (
+        SELECT lp.market, ps.name AS source, ps.type AS source_type, lp.updated_at
+        FROM latest_prices lp
+        JOIN price_sources ps ON ps.id = lp.source_id
+        WHERE lp.entity_type = 'graded' AND lp.entity_id = g.id
+        ORDER BY lp.market DESC NULLS LAST
+        LIMIT 1
+    ) gp ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = g.card_id
+    ) cp ON TRUE
+    LEFT JOIN tag_details td ON td.graded_item_id = g.id
+    LEFT JOIN LATERAL (
+        SELECT local_path FROM card_images
+        WHERE card_id = g.card_id AND kind = 'small' AND local_path IS NOT NULL
+        ORDER BY id
+        LIMIT 1
+    ) img ON TRUE
+    WHERE {filters}
+)
+SELECT *, {sort_key} AS sort_key
+FROM listed
+WHERE {after}
+ORDER BY {sort_key} {direction}, id {direction}
+LIMIT :limit
+"""
+
+
+def listing_statement(
+    user_id: int,
+    limit: int,
+    sort: str = "recent",
+    q: Optional[str] = None,
+    set_id: Optional[int] = None,
+    grader: Optional[str] = None,
+    grade: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> tuple[str, dict]:
+    sort_key, direction, key_type = GRADED_SORTS[sort]
+    filters = ["g.user_id = :user_id"]
+    params: dict = {"user_id": user_id, "limit": limit}
+    if q:
+        filters.append("(c.name ILIKE :q OR c.number ILIKE :q OR st.name ILIKE :q OR st.code ILIKE :q OR g.cert_number ILIKE :q)")
+        params["q"] = f"%{q}%"
+    if set_id is not None:
+        filters.append("c.set_id = :set_id")
+        params["set_id"] = set_id
+    if grader:
+        filters.append("UPPER(g.grader) = UPPER(:grader)")
+        params["grader"] = grader
+    if grade:
+        filters.append("g.grade = :grade")
+        params["grade"] = grade
+    after = "TRUE"
+    if cursor:
+        after_key, after_id = decode_cursor(cursor)
+        comparison = "<" if direction == "DESC" else ">"
+        after = f"({sort_key}, id) {comparison} (CAST(:after_key AS {key_type}), :after_id)"
+        params.update({"after_key": after_key, "after_id": after_id})
+    statement = LISTING_SQL.format(filters=" AND ".join(filters), sort_key=sort_key, direction=direction, after=after)
+    return statement, params
+
+
+def serialize_graded(row) -> dict:
+    premium = row.graded_price - row.card_price if row.graded_price is not None and row.card_price is not None else None
+    return {
+        "id": row.id,
+        "card_id": row.card_id,
+        "grader": row.grader,
+        "grade": row.grade,
+        "cert_number": row.cert_number,
+        "price_estimator": row.price_estimator,
+        "notes": row.notes,
+        "purchase_price": row.purchase_price,
+        "purchase_date": row.purchase_date.isoformat() if row.purchase_date else None,
+        "vendor": row.vendor,
+        "sell_price": row.sell_price,
+        "sell_date": row.sell_date.isoformat() if row.sell_date else None,
+        "storage_location_id": row.storage_location_id,
+        "created_at": row.created_at.isoformat(),
+        "card": {
+            "id": row.card_id,
+            "name": row.card_name,
+            "number": row.card_number,
+            "rarity": row.rarity,
+            "image_path": row.image_path,
+        },
+        "set": {"id": row.set_id, "code": row.set_code, "name": row.set_name},
+        "graded_price": row.graded_price,
+        "price_source": {"name": row.price_source, "type": row.price_source_type} if row.price_source else None,
+        "price_updated_at": row.price_updated_at.isoformat() if row.price_updated_at else None,
+        "card_price": row.card_price,
+        "premium": premium,
+        "tag_details": {
+            "overall_grade": row.overall_grade,
+            "subgrades": row.subgrades_json,
+            "dig_report_url": row.dig_report_url,
+        }
+        if row.tag_graded_id
+        else None,
+    }
+
+
+def load_graded_page(db, user_id: int, page_size: int, **options) -> dict:
+    statement, params = listing_statement(user_id, limit=page_size + 1, **options)
+    rows = db.execute(text(statement), params).all()
+    page = rows[:page_size]
+    next_cursor = encode_cursor(page[-1].sort_key, page[-1].id) if len(rows) > page_size else None
+    return {"data": [serialize_graded(row) for row in page], "next_cursor": next_cursor}
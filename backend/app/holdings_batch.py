@@ -0,0 +1,112 @@
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+
+from app.models import Card, Holding, StorageLocation
+from app.portfolio import mark_position_changed
+from app.schemas import HoldingBatchOperation, HoldingCreate, HoldingUpdate
+from app.set_completion import mark_completion_changed
+from app.sync import mark_sync_changed
+
+MAX_BATCH_OPERATIONS = 10000
+BATCH_OPS = ("create", "update", "delete")
+
+
+def validation_detail(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+
+
+def apply_holding_batch(db, user_id: int, operations: list[HoldingBatchOperation]) -> list[dict]:
+    # Invalid items are reported and skipped; the rest are applied with one
+    # statement per operation type. The caller commits.
+    now = datetime.utcnow()
+    results = [{"index": index, "op": item.op, "id": item.id, "status": "ok"} for index, item in enumerate(operations)]
+    creates: list[tuple[int, dict]] = []
+    updates: list[tuple[int, dict]] = []
+    deletes: list[int] = []
+    seen_ids: set[int] = set()
+
+    def fail(index: int, detail: str) -> None:
+        results[index]["status"] = "error"
+        results[index]["detail"] = detail
+
+    for index, item in enumerate(operations):
+        if item.op not in BATCH_OPS:
+            fail(index, f"op must be one of: {', '.join(BATCH_OPS)}")
+            continue
+        if item.op == "create":
+            try:
+                creates.append((index, HoldingCreate.model_validate(item.data).model_dump()))
+            except ValidationError as exc:
+                fail(index, validation_detail(exc))
+            continue
+        if item.id is None:
+            fail(index, "id is required")
+        elif item.id in seen_ids:
+            fail(index, "Holding appears more than once in this batch")
+        elif item.op == "update":
+            try:
+                changes = HoldingUpdate.model_validate(item.data).model_dump(exclude_unset=True)
+            except ValidationError as exc:
+                fail(index, validation_detail(exc))
+                continue
+            seen_ids.add(item.id)
+            updates.append((index, changes))
+        else:
+            seen_ids.add(item.id)
+            deletes.append(index)
+
+    owned = {}
+    if seen_ids:
+        rows = db.execute(
+            select(Holding.id, Holding.card_id).where(Holding.user_id == user_id, Holding.id.in_(seen_ids))
+        ).all()
+        owned = {row.id: row.card_id for row in rows}
+    card_ids = {values["card_id"] for _, values in creates}
+    known_cards = set()
+    if card_ids:
+        known_cards = set(db.execute(select(Card.id).where(Card.id.in_(card_ids))).scalars())
+
+    location_ids = {values["storage_location_id"] for _, values in creates + updates if values.get("storage_location_id") is not None}
+    known_locations = set()
+    if location_ids:
+        known_locations = set(db.execute(
+            select(StorageLocation.id).where(StorageLocation.user_id == user_id, StorageLocation.id.in_(location_ids))
+        ).scalars())
+
+    for index, values in creates:
+        if values["card_id"] not in known_cards:
+            fail(index, "Card not found")
+    for index, values in creates + updates:
+        if values.get("storage_location_id") is not None and values["storage_location_id"] not in known_locations:
+            fail(index, "Storage location not found")
+    for index in [index for index, _ in updates] + deletes:
+        if operations[index].id not in owned:
+            fail(index, "Holding not found")
+    creates = [(index, values) for index, values in creates if results[index]["status"] == "ok"]
+    updates = [(index, values) for index, values in updates if results[index]["status"] == "ok"]
+    deletes = [index for index in deletes if results[index]["status"] == "ok"]
+
+    if creates:
+        rows = [{**values, "user_id": user_id, "created_at": now, "updated_at": now} for _, values in creates]
+        new_ids = db.execute(insert(Holding).returning(Holding.id, sort_by_parameter_order=True), rows).scalars().all()
+        for (index, _), holding_id in zip(creates, new_ids):
+            results[index]["id"] = holding_id
+    if updates:
+        db.execute(update(Holding), [{**values, "id": operations[index].id, "updated_at": now} for index, values in updates])
+    if deletes:
+        db.execute(
+            delete(Holding).where(Holding.user_id == user_id, Holding.id.in_([operations[index].id for index in deletes])),
+            execution_options={"synchronize_session": False},
+        )
+
+    touched = {values["card_id"] for _, values in creates}
+    touched.update(owned[operations[index].id] for index, _ in updates)
+    touched.update(owned[operations[index].id] for index in deletes)
+    mark_position_changed(db, user_id, touched)
+    mark_completion_changed(db, user_id, touched)
+    mark_sync_changed(db, user_id, "holding", [results[index]["id"] for index, _ in creates])
+    mark_sync_changed(db, user_id, "holding", [operations[index].id for index, _ in updates])
+    mark_sync_changed(db, user_id, "holding", [operations[index].id for index in deletes], deleted=True)
+    return results
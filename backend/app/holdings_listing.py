@@ -0,0 +1,184 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+# sort name -> (ordering expression over "valued", direction, cursor value type)
+HOLDING_SORTS = {
+    "updated": ("updated_at", "DESC", "timestamp"),
+    "value": ("COALESCE(value, -1)", "DESC", "double precision"),
+    "price": ("COALESCE(COALESCE(graded_price, card_price), -1)", "DESC", "double precision"),
+    "name": ("card_name", "ASC", "text"),
+    "number": ("set_code || '-' || lpad(card_number, 8, '0')", "ASC", "text"),
+    "quantity": ("quantity", "DESC", "integer"),
+}
+HOLDING_FLAGS = ("is_for_trade", "is_wantlist", "is_watched")
+
+# One row per holding with the best card price, the graded item the portfolio
+# would pick for the same card (and its price) and the local small image.
+# Value follows the portfolio rule: the graded price wins over the raw price.
+LISTING_SQL = """
+WITH listed AS (
+    SELECT
+        h.id, h.quantity, h.condition, h.is_for_trade, h.is_wantlist, h.is_watched, h.notes,
+        h.purchase_price, h.purchase_date, h.storage_location_id, h.updated_at,
+        c.id AS card_id, c.name AS card_name, c.number AS card_number, c.rarity,
+        st.id AS set_id, st.code AS set_code, st.name AS set_name,
+        cp.market AS card_price,
+        g.id AS graded_id, g.grader, g.grade,
+        gp.market AS graded_price,
+        img.local_path AS image_path
+    FROM holdings h
+    JOIN cards c ON c.id = h.card_id
+    JOIN sets st ON st.id = c.set_id
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = h.card_id
+    ) cp ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT id, grader, grade FROM graded_items
+        WHERE user_id = h.user_id AND card_id = h.card_id
+        ORDER BY id DESC
+        LIMIT 1
+    ) g ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'graded' AND entity_id = g.id
+    ) gp ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT local_path FROM card_images
+        WHERE card_id = h.card_id AND kind = 'small' AND local_path IS NOT NULL
+        ORDER BY id
+        LIMIT 1
+    ) img ON TRUE
+    WHERE {filters}
+),
+valued AS (
+    SELECT *, COALESCE(graded_price, card_price) * quantity AS value FROM listed
+)
+SELECT *, {sort_key} AS sort_key
+FROM valued
+WHERE {after}
+ORDER BY {sort_key} {direction}, id {direction}
+{limit}
+"""
+
+
+def encode_cursor(sort_key, holding_id: int) -> str:
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps([sort_key, holding_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    # Raises ValueError for anything that is not a cursor we issued.
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, holding_id = json.loads(raw)
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(holding_id, int):
+        raise ValueError("Invalid cursor")
+    return sort_key, holding_id
+
+
+def listing_statement(
+    user_id: int,
+    sort: str = "updated",
+    q: Optional[str] = None,
+    set_id: Optional[int] = None,
+    flags: Optional[dict] = None,
+    condition: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> tuple[str, dict]:
+    sort_key, direction, key_type = HOLDING_SORTS[sort]
+    filters = ["h.user_id = :user_id"]
+    params: dict = {"user_id": user_id}
+    if q:
+        filters.append("(c.name ILIKE :q OR c.number ILIKE :q OR st.name ILIKE :q OR st.code ILIKE :q)")
+        params["q"] = f"%{q}%"
+    if set_id is not None:
+        filters.append("c.set_id = :set_id")
+        params["set_id"] = set_id
+    if condition:
+        filters.append("h.condition = :condition")
+        params["condition"] = condition
+    for flag, value in (flags or {}).items():
+        if value is not None:
+            filters.append(f"h.{flag} = :{flag}")
+            params[flag] = value
+    after = "TRUE"
+    if cursor:
+        after_key, after_id = decode_cursor(cursor)
+        comparison = "<" if direction == "DESC" else ">"
+        after = f"({sort_key}, id) {comparison} (CAST(:after_key AS {key_type}), :after_id)"
+        params.update({"after_key": after_key, "after_id": after_id})
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = "LIMIT :limit"
+        params["limit"] = limit
+    statement = LISTING_SQL.format(
+        filters=" AND ".join(filters),
+        sort_key=sort_key,
+        direction=direction,
+        after=after,
+        limit=limit_clause,
+    )
+    return statement, params
+
+
+def serialize_holding(row) -> dict:
+    return {
+        "holding_id": row.id,
+        "quantity": row.quantity,
+        "condition": row.condition,
+        "is_for_trade": row.is_for_trade,
+        "is_wantlist": row.is_wantlist,
+        "is_watched": row.is_watched,
+        "notes": row.notes,
+        "purchase_price": row.purchase_price,
+        "purchase_date": row.purchase_date.isoformat() if row.purchase_date else None,
+        "storage_location_id": row.storage_location_id,
+        "updated_at": row.updated_at.isoformat(),
+        "card": {
+            "id": row.card_id,
+            "name": row.card_name,
+            "number": row.card_number,
+            "rarity": row.rarity,
+            "image_path": row.image_path,
+        },
+        "set": {"id": row.set_id, "code": row.set_code, "name": row.set_name},
+        "graded": {"id": row.graded_id, "grader": row.grader, "grade": row.grade} if row.graded_id else None,
+        "card_price": row.card_price,
+        "graded_price": row.graded_price,
+        "value": row.value,
+    }
+
+
+def load_holdings_page(db, user_id: int, page_size: int, **options) -> dict:
+    statement, params = listing_statement(user_id, limit=page_size + 1, **options)
+    rows = db.execute(text(statement), params).all()
+    page = rows[:page_size]
+    next_cursor = encode_cursor(page[-1].sort_key, page[-1].id) if len(rows) > page_size else None
+    return {"data": [serialize_holding(row) for row in page], "next_cursor": next_cursor}
+
+
+def stream_holdings(session_factory, user_id: int, chunk_size: int = 1000, **options) -> Iterator[str]:
+    # Owns its session: the request-scoped one is closed before a streamed body finishes.
+    statement, params = listing_statement(user_id, **options)
+    db = session_factory()
+    try:
+        result = db.execute(
+            text(statement),
+            params,
+            execution_options={"stream_results": True, "max_row_buffer": chunk_size},
+        )
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield "".join(json.dumps(serialize_holding(row)) + "\n" for row in rows)
+    finally:
+        db.close()
@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
-from app.routers import admin, analytics, auth, cards, friends, graded, holdings, imports, photos
+from app.routers import admin, alerts, analytics, auth, cards, catalog, exports, friends, graded, holdings, imports, photos, sync
 
 app = FastAPI(title=settings.app_name)
 
@@ -21,11 +21,15 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(friends.router, prefix="/api/friends", tags=["friends"])
 app.include_router(cards.router, prefix="/api", tags=["catalog"])
+app.include_router(catalog.router, prefix="/api/catalog", tags=["catalog"])
 app.include_router(holdings.router, prefix="/api/holdings", tags=["holdings"])
 app.include_router(graded.router, prefix="/api/graded", tags=["graded"])
 app.include_router(photos.router, prefix="/api/photos", tags=["photos"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
 app.include_router(imports.router, prefix="/api/import", tags=["import"])
+app.include_router(exports.router, prefix="/api/export", tags=["export"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
@@ -1,5 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Integer, JSON, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, JSON, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import BIT
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -58,6 +59,7 @@ class Set(Base):
 
 class Card(Base):
     __tablename__ = "cards"
+    __table_args__ = (Index("ix_cards_set_position", "set_id", "set_position"),)
 
     id = Column(Integer, primary_key=True)
     set_id = Column(Integer, ForeignKey("sets.id"), nullable=False, index=True)
@@ -70,6 +72,8 @@ class Card(Base):
     hp = Column(String(20), nullable=True)
     artist = Column(String(120), nullable=True)
     text = Column(Text, nullable=True)
+    # Stable index of the card within its set; bit position in set completion bitmaps.
+    set_position = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
@@ -96,7 +100,7 @@ class CardImage(Base):
     __tablename__ = "card_images"
 
     id = Column(Integer, primary_key=True)
-    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
+    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False, index=True)
     kind = Column(String(40), nullable=False)
     source_url = Column(String(500), nullable=True)
     local_path = Column(String(500), nullable=True)
@@ -131,6 +135,7 @@ class StorageLocation(Base):
 
 class Holding(Base):
     __tablename__ = "holdings"
+    __table_args__ = (Index("ix_holdings_user_card", "user_id", "card_id"),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -156,11 +161,12 @@ class GradedItem(Base):
     __tablename__ = "graded_items"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
     grader = Column(String(20), nullable=False)
     grade = Column(String(20), nullable=False)
     cert_number = Column(String(80), nullable=True)
+    price_estimator = Column(String(20), nullable=True)
     notes = Column(Text, nullable=True)
     purchase_price = Column(Float, nullable=True)
     purchase_date = Column(Date, nullable=True)
@@ -204,16 +210,23 @@ class LatestPrice(Base):
     mid = Column(Float, nullable=True)
     high = Column(Float, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    history_at = Column(DateTime, nullable=True)
 
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
-
-    id = Column(Integer, primary_key=True)
+    __table_args__ = (
+        Index("ix_price_history_entity_ts", "entity_type", "entity_id", "ts"),
+        Index("ix_price_history_ts_brin", "ts", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+    # Monthly range partitions on ts require ts to be part of the primary key.
+    id = Column(Integer, primary_key=True, autoincrement=True)
     entity_type = Column(String(20), nullable=False)
     entity_id = Column(Integer, nullable=False)
     source_id = Column(Integer, ForeignKey("price_sources.id"), nullable=False)
-    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    ts = Column(DateTime, default=datetime.utcnow, primary_key=True)
     market = Column(Float, nullable=True)
     low = Column(Float, nullable=True)
     mid = Column(Float, nullable=True)
@@ -221,8 +234,27 @@ class PriceHistory(Base):
     volume = Column(Float, nullable=True)
 
 
+class PriceHistoryDaily(Base):
+    __tablename__ = "price_history_daily"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "source_id", "day", name="uq_price_history_daily"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    source_id = Column(Integer, ForeignKey("price_sources.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    market_open = Column(Float, nullable=True)
+    market_high = Column(Float, nullable=True)
+    market_low = Column(Float, nullable=True)
+    market_close = Column(Float, nullable=True)
+    samples = Column(Integer, default=0, nullable=False)
+
+
 class PortfolioSnapshot(Base):
     __tablename__ = "portfolio_snapshots"
+    __table_args__ = (Index("ix_portfolio_snapshots_user_ts", "user_id", "ts"),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -232,15 +264,93 @@ class PortfolioSnapshot(Base):
     graded_value = Column(Float, nullable=False)
 
 
+class CardMover(Base):
+    __tablename__ = "card_movers"
+    __table_args__ = (
+        UniqueConstraint("period", "card_id", name="uq_card_mover"),
+        Index("ix_card_movers_period_pct", "period", "change_pct"),
+        Index("ix_card_movers_period_abs", "period", "change_abs"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False)
+    period = Column(String(10), nullable=False)
+    price = Column(Float, nullable=False)
+    previous_price = Column(Float, nullable=False)
+    change_abs = Column(Float, nullable=False)
+    change_pct = Column(Float, nullable=True)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PortfolioPosition(Base):
+    __tablename__ = "portfolio_positions"
+    __table_args__ = (UniqueConstraint("user_id", "card_id", name="uq_portfolio_position"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # card_id index doubles as the card -> holders lookup for price updates.
+    card_id = Column(Integer, ForeignKey("cards.id"), nullable=False, index=True)
+    quantity = Column(Integer, default=0, nullable=False)
+    graded_item_id = Column(Integer, ForeignKey("graded_items.id", ondelete="SET NULL"), nullable=True)
+    card_price = Column(Float, nullable=True)
+    graded_price = Column(Float, nullable=True)
+    raw_value = Column(Float, default=0, nullable=False)
+    graded_value = Column(Float, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PortfolioTotal(Base):
+    __tablename__ = "portfolio_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_value = Column(Float, default=0, nullable=False)
+    raw_value = Column(Float, default=0, nullable=False)
+    graded_value = Column(Float, default=0, nullable=False)
+    positions = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SetCompletion(Base):
+    __tablename__ = "set_completions"
+    __table_args__ = (UniqueConstraint("user_id", "set_id", name="uq_set_completion"),)
+
+    # missing_bitmap has one bit per set_position; 1 means the user does not own that card.
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    set_id = Column(Integer, ForeignKey("sets.id"), nullable=False)
+    owned_cards = Column(Integer, nullable=False)
+    total_cards = Column(Integer, nullable=False)
+    missing_bitmap = Column(BIT(varying=True), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PortfolioPnl(Base):
+    __tablename__ = "portfolio_pnl"
+
+    # Cached P&L summary; valid while computed_at >= portfolio_totals.updated_at.
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    cost_basis = Column(Float, default=0, nullable=False)
+    market_value = Column(Float, default=0, nullable=False)
+    unrealized_gain = Column(Float, default=0, nullable=False)
+    realized_gain = Column(Float, default=0, nullable=False)
+    proceeds = Column(Float, default=0, nullable=False)
+    annualized_return = Column(Float, nullable=True)
+    open_lots = Column(Integer, default=0, nullable=False)
+    closed_lots = Column(Integer, default=0, nullable=False)
+    unpriced_lots = Column(Integer, default=0, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class PortfolioBreakdown(Base):
     __tablename__ = "portfolio_breakdowns"
+    __table_args__ = (Index("ix_portfolio_breakdowns_user_type_ts", "user_id", "breakdown_type", "ts"),)
 
+    # One row per user, snapshot and breakdown type; values_json maps key -> value.
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     ts = Column(DateTime, default=datetime.utcnow, nullable=False)
     breakdown_type = Column(String(40), nullable=False)
-    key = Column(String(120), nullable=False)
-    value = Column(Float, nullable=False)
+    values_json = Column(JSON, nullable=False)
 
 
 class Alert(Base):
@@ -257,6 +367,40 @@ class Alert(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class AlertEvent(Base):
+    __tablename__ = "alert_events"
+    __table_args__ = (Index("ix_alert_events_user_id_id", "user_id", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    threshold = Column(Float, nullable=False)
+    direction = Column(String(20), nullable=False)
+    price = Column(Float, nullable=False)
+    triggered_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+    # One row per entity: the latest change wins, deletes stay as tombstones.
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", name="uq_sync_change"),
+        Index("ix_sync_changes_user_xid", "user_id", "change_xid"),
+        Index("ix_sync_changes_type_xid", "entity_type", "change_xid"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Null for price changes, which are shared by every owner of the card.
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, default=False, nullable=False)
+    change_xid = Column(BigInteger, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class JobRun(Base):
     __tablename__ = "job_runs"
 
@@ -0,0 +1,99 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import JobRun
+
+MOVER_PERIODS = {"1d": 1, "7d": 7, "30d": 30}
+
+# Best current market per card against the best market as of now - period,
+# taken per source from raw history and falling back to the daily rollups.
+REFRESH_MOVERS_SQL = """
+WITH periods AS (
+    SELECT * FROM unnest(CAST(:periods AS varchar[]), CAST(:days AS integer[])) AS p (period, days)
+),
+current AS (
+    SELECT entity_id AS card_id, source_id, market
+    FROM latest_prices
+    WHERE entity_type = 'card' AND market IS NOT NULL
+),
+compared AS (
+    SELECT
+        c.card_id,
+        p.period,
+        MAX(c.market) AS price,
+        MAX(COALESCE(raw.market, daily.market_close)) AS previous_price
+    FROM current c
+    CROSS JOIN periods p
+    LEFT JOIN LATERAL (
+        SELECT h.market
+        FROM price_history h
+        WHERE h.entity_type = 'card'
+          AND h.entity_id = c.card_id
+          AND h.source_id = c.source_id
+          AND h.ts <= CAST(:now AS timestamp) - p.days * INTERVAL '1 day'
+          AND h.market IS NOT NULL
+        ORDER BY h.ts DESC
+        LIMIT 1
+    ) raw ON true
+    LEFT JOIN LATERAL (
+        SELECT d.market_close
+        FROM price_history_daily d
+        WHERE raw.market IS NULL
+          AND d.entity_type = 'card'
+          AND d.entity_id = c.card_id
+          AND d.source_id = c.source_id
+          AND d.day < CAST(CAST(:now AS timestamp) - p.days * INTERVAL '1 day' AS date)
+          AND d.market_close IS NOT NULL
+        ORDER BY d.day DESC
+        LIMIT 1
+    ) daily ON true
+    GROUP BY c.card_id, p.period
+)
+INSERT INTO card_movers (card_id, period, price, previous_price, change_abs, change_pct, computed_at)
+SELECT
+    card_id,
+    period,
+    price,
+    previous_price,
+    price - previous_price,
+    CASE WHEN previous_price > 0 THEN (price - previous_price) / previous_price * 100 END,
+    :now
+FROM compared
+WHERE previous_price IS NOT NULL AND price >= :min_price
+"""
+
+
+def refresh_movers(db, now: Optional[datetime] = None, min_price: Optional[float] = None) -> int:
+    # Replaces the whole table in the caller's transaction, so readers see
+    # either the previous or the new ranking.
+    if min_price is None:
+        min_price = float(os.environ.get("MOVERS_MIN_PRICE", "0.5"))
+    db.execute(text("DELETE FROM card_movers"))
+    result = db.execute(text(REFRESH_MOVERS_SQL), {
+        "periods": list(MOVER_PERIODS),
+        "days": list(MOVER_PERIODS.values()),
+        "now": now or datetime.utcnow(),
+        "min_price": min_price,
+    })
+    return result.rowcount or 0
+
+
+def run_movers_job(db: Session) -> JobRun:
+    run = JobRun(job_name="compute_movers", status="running")
+    db.add(run)
+    db.commit()
+    try:
+        rows = refresh_movers(db)
+        run.status = "completed"
+        run.stats_json = {"rows": rows}
+    except Exception as exc:
+        db.rollback()
+        run.status = "failed"
+        run.error_text = str(exc)
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    return run
@@ -0,0 +1,287 @@
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from app.config import settings
+
+STATE_FILE = "_export_state.json"
+
+PRICE_HISTORY_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("entity_type", pa.string()),
+    ("entity_id", pa.int64()),
+    ("source_id", pa.int64()),
+    ("ts", pa.timestamp("us")),
+    ("market", pa.float64()),
+    ("low", pa.float64()),
+    ("mid", pa.float64()),
+    ("high", pa.float64()),
+    ("volume", pa.float64()),
+])
+
+PORTFOLIO_SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("ts", pa.timestamp("us")),
+    ("total_value", pa.float64()),
+    ("raw_value", pa.float64()),
+    ("graded_value", pa.float64()),
+])
+
+# table -> (schema, hive partition columns besides month, mode). "append"
+# keeps exported rows after retention deletes them; "mirror" rewrites a
+# month whenever its rows change, so the copy matches the table.
+EXPORT_TABLES = {
+    "price_history": (PRICE_HISTORY_SCHEMA, ["entity_type"], "append"),
+    "portfolio_snapshots": (PORTFOLIO_SNAPSHOT_SCHEMA, [], "mirror"),
+}
+
+STAGING_PREFIX = "_staging-"
+
+# Per-month fingerprint of the table. Ids are handed out before commit, so a
+# month can still gain rows below the highest id already exported; the count
+# and id sum catch those, as well as deletes and backfilled history.
+MONTH_FINGERPRINTS_SQL = """
+SELECT to_char(ts, 'YYYY-MM') AS month, COUNT(*) AS rows, SUM(id) AS id_sum, MAX(id) AS max_id
+FROM {table}
+GROUP BY 1
+"""
+
+MONTH_BELOW_SQL = """
+SELECT COUNT(*), COALESCE(SUM(id), 0)
+FROM {table}
+WHERE ts >= :start AND ts < :end AND id <= :max_id
+"""
+
+
+def export_root() -> str:
+    return os.environ.get("EXPORT_ROOT", os.path.join(settings.media_root, "exports"))
+
+
+def load_state(root: str) -> dict:
+    path = os.path.join(root, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_state(root: str, state: dict) -> None:
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def month_bounds(month: str) -> tuple[datetime, datetime]:
+    year, number = (int(part) for part in month.split("-"))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def stream_rows(conn, table: str, columns: list[str], month: str, after_id: int, chunk_size: int) -> Iterator[list[tuple]]:
+    # Server-side cursor: rows are fetched from PostgreSQL chunk_size at a time.
+    start, end = month_bounds(month)
+    result = conn.execute(
+        text(f"SELECT {', '.join(columns)} FROM {table} WHERE ts >= :start AND ts < :end AND id > :after_id ORDER BY id"),
+        {"start": start, "end": end, "after_id": after_id},
+        execution_options={"stream_results": True, "max_row_buffer": chunk_size},
+    )
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def partition_dir(root: str, table: str, keys: dict) -> str:
+    parts = [root, table]
+    parts.extend(f"{name}={value}" for name, value in keys.items())
+    return os.path.join(*parts)
+
+
+def month_dirs(root: str, table: str, month: str) -> list[str]:
+    return glob.glob(os.path.join(root, table, "**", f"month={month}"), recursive=True)
+
+
+def exported_ids(root: str, table: str, month: str) -> Optional[pa.Array]:
+    files = [path for directory in month_dirs(root, table, month) for path in glob.glob(os.path.join(directory, "part-*.parquet"))]
+    if not files:
+        return None
+    return pa.concat_arrays([chunk for path in files for chunk in pq.read_table(path, columns=["id"])["id"].chunks])
+
+
+def write_chunk(
+    root: str,
+    table: str,
+    schema: pa.Schema,
+    partition_columns: list[str],
+    rows: list[tuple],
+    skip_ids: Optional[pa.Array] = None,
+    prefix: str = "",
+) -> int:
+    names = schema.names
+    columns = list(zip(*rows))
+    batch = pa.table({name: pa.array(values, type=schema.field(name).type) for name, values in zip(names, columns)})
+    if skip_ids is not None:
+        batch = batch.filter(pc.invert(pc.is_in(batch["id"], value_set=skip_ids)))
+        if batch.num_rows == 0:
+            return 0
+    months = pc.strftime(batch["ts"], format="%Y-%m")
+    batch = batch.append_column("month", months)
+    group_columns = ["month", *partition_columns]
+    groups = batch.group_by(group_columns).aggregate([]).to_pylist()
+    written = 0
+    for keys in groups:
+        mask = None
+        for name in group_columns:
+            condition = pc.equal(batch[name], keys[name])
+            mask = condition if mask is None else pc.and_(mask, condition)
+        part = batch.filter(mask).drop_columns(group_columns)
+        if part.num_rows == 0:
+            continue
+        ordered_keys = {name: keys[name] for name in [*partition_columns, "month"]}
+        directory = partition_dir(root, table, ordered_keys)
+        os.makedirs(directory, exist_ok=True)
+        first_id = part["id"][0].as_py()
+        last_id = part["id"][-1].as_py()
+        name = f"part-{first_id:012d}-{last_id:012d}"
+        path = os.path.join(directory, f"{prefix}{name}.parquet")
+        copy = 1
+        while os.path.exists(path):
+            path = os.path.join(directory, f"{prefix}{name}-{copy}.parquet")
+            copy += 1
+        pq.write_table(part, path, compression="zstd")
+        written += part.num_rows
+    return written
+
+
+def replace_month(root: str, table: str, month: str) -> None:
+    # Swaps the staged files of a rewritten month in for the previous ones.
+    # Readers skip "_"-prefixed files, so the staged copy stays hidden until here.
+    for directory in month_dirs(root, table, month):
+        staged = glob.glob(os.path.join(directory, f"{STAGING_PREFIX}*.parquet"))
+        for path in glob.glob(os.path.join(directory, "part-*.parquet")):
+            os.remove(path)
+        for path in staged:
+            os.replace(path, os.path.join(directory, os.path.basename(path)[len(STAGING_PREFIX):]))
+        if not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def export_month(conn, root: str, table: str, month: str, fingerprint: dict, previous: Optional[dict], chunk_size: int) -> int:
+    schema, partition_columns, mode = EXPORT_TABLES[table]
+    if mode == "mirror":
+        # Leftovers of an interrupted rewrite would otherwise be swapped in too.
+        for directory in month_dirs(root, table, month):
+            for path in glob.glob(os.path.join(directory, f"{STAGING_PREFIX}*.parquet")):
+                os.remove(path)
+        exported = 0
+        for rows in stream_rows(conn, table, schema.names, month, 0, chunk_size):
+            exported += write_chunk(root, table, schema, partition_columns, rows, prefix=STAGING_PREFIX)
+        replace_month(root, table, month)
+        return exported
+    after_id = 0
+    skip_ids = None
+    if previous is not None:
+        start, end = month_bounds(month)
+        below = conn.execute(
+            text(MONTH_BELOW_SQL.format(table=table)),
+            {"start": start, "end": end, "max_id": previous["max_id"]},
+        ).first()
+        if (below[0], below[1]) == (previous["rows"], previous["id_sum"]):
+            # Nothing changed below the last exported id: only newer rows are missing.
+            after_id = previous["max_id"]
+        else:
+            skip_ids = exported_ids(root, table, month)
+    else:
+        skip_ids = exported_ids(root, table, month)
+    exported = 0
+    for rows in stream_rows(conn, table, schema.names, month, after_id, chunk_size):
+        exported += write_chunk(root, table, schema, partition_columns, rows, skip_ids=skip_ids)
+    return exported
+
+
+def export_table(conn, root: str, table: str, state: dict, chunk_size: int) -> int:
+    _, _, mode = EXPORT_TABLES[table]
+    # State written before per-month fingerprints only had a last_id; such
+    # months are reconciled against the ids already in the files.
+    state.setdefault(table, {}).pop("last_id", None)
+    months = state[table].setdefault("months", {})
+    fingerprints = {
+        row.month: {"rows": row.rows, "id_sum": int(row.id_sum), "max_id": row.max_id}
+        for row in conn.execute(text(MONTH_FINGERPRINTS_SQL.format(table=table)))
+    }
+    exported = 0
+    for month in sorted(fingerprints):
+        if months.get(month) == fingerprints[month]:
+            continue
+        exported += export_month(conn, root, table, month, fingerprints[month], months.get(month), chunk_size)
+        months[month] = fingerprints[month]
+        state[table]["updated_at"] = datetime.utcnow().isoformat()
+        save_state(root, state)
+    if mode == "mirror":
+        for month in sorted(set(months) - set(fingerprints)):
+            replace_month(root, table, month)
+            del months[month]
+        save_state(root, state)
+    return exported
+
+
+def price_history_dataset(root: Optional[str] = None) -> Optional[ds.Dataset]:
+    path = os.path.join(root or export_root(), "price_history")
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def aggregate_price_history(
+    entity_type: str,
+    entity_id: int,
+    start: Optional[datetime] = None,
+    root: Optional[str] = None,
+) -> list[dict]:
+    # Daily min/max/mean/last of market straight from the Parquet export.
+    dataset = price_history_dataset(root)
+    if dataset is None:
+        return []
+    condition = (ds.field("entity_type") == entity_type) & (ds.field("entity_id") == entity_id)
+    if start is not None:
+        # month prunes whole partition directories before any file is opened.
+        condition = condition & (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("ts") >= pa.scalar(start, pa.timestamp("us")))
+    table = dataset.to_table(columns=["ts", "market"], filter=condition & ds.field("market").is_valid())
+    if table.num_rows == 0:
+        return []
+    table = table.sort_by("ts")
+    table = table.append_column("day", pc.strftime(table["ts"], format="%Y-%m-%d"))
+    # Single-threaded grouping keeps input order, so "last" is the closing price.
+    grouped = table.group_by("day", use_threads=False).aggregate([
+        ("market", "min"),
+        ("market", "max"),
+        ("market", "mean"),
+        ("market", "last"),
+        ("market", "count"),
+    ])
+    rows = grouped.sort_by("day").to_pylist()
+    return [
+        {
+            "day": row["day"],
+            "min": row["market_min"],
+            "max": row["market_max"],
+            "avg": row["market_mean"],
+            "market": row["market_last"],
+            "samples": row["market_count"],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,168 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+MIN_ANNUALIZE_DAYS = 30
+PNL_SORTS = {
+    "gain": "gain",
+    "gain_pct": "gain_pct",
+    "annualized": "annualized",
+    "value": "value",
+    "cost": "cost",
+    "purchase_date": "purchase_date",
+}
+PNL_STATUSES = ("all", "open", "closed")
+
+# Every holding and graded item of one user is a lot. purchase_price and
+# sell_price are per unit; a lot with a sell_price or sell_date is closed and
+# valued at its sale, open lots at the best current market (card price for
+# holdings, graded price for graded items). Lots without a cost or a value have
+# a NULL gain and are counted as unpriced.
+LOTS_SQL = """
+WITH lots AS (
+    SELECT
+        'holding' AS lot_type, h.id AS lot_id, h.card_id, h.quantity,
+        h.purchase_price, h.purchase_date, h.sell_price, h.sell_date,
+        (SELECT MAX(market) FROM latest_prices WHERE entity_type = 'card' AND entity_id = h.card_id) AS market
+    FROM holdings h
+    WHERE h.user_id = :user_id
+    UNION ALL
+    SELECT
+        'graded', g.id, g.card_id, 1,
+        g.purchase_price, g.purchase_date, g.sell_price, g.sell_date,
+        (SELECT MAX(market) FROM latest_prices WHERE entity_type = 'graded' AND entity_id = g.id)
+    FROM graded_items g
+    WHERE g.user_id = :user_id
+),
+valued AS (
+    SELECT
+        *,
+        sell_price IS NOT NULL OR sell_date IS NOT NULL AS closed,
+        purchase_price * quantity AS cost,
+        CASE WHEN sell_price IS NOT NULL OR sell_date IS NOT NULL THEN sell_price ELSE market END * quantity AS value,
+        COALESCE(sell_date, CAST(:today AS date)) - purchase_date AS days_held
+    FROM lots
+),
+gains AS (
+    SELECT
+        *,
+        value - cost AS gain,
+        CASE WHEN cost > 0 THEN (value - cost) / cost END AS gain_pct,
+        CASE
+            WHEN cost > 0 AND value > 0 AND days_held >= :min_days
+            THEN power(value / cost, 365.0 / days_held) - 1
+        END AS annualized
+    FROM valued
+)
+"""
+
+# Portfolio annualized return uses the cost-weighted holding period of every
+# lot old enough to annualize.
+SUMMARY_SQL = LOTS_SQL + """,
+summary AS (
+    SELECT
+        COALESCE(SUM(cost) FILTER (WHERE NOT closed AND gain IS NOT NULL), 0) AS cost_basis,
+        COALESCE(SUM(value) FILTER (WHERE NOT closed AND gain IS NOT NULL), 0) AS market_value,
+        COALESCE(SUM(gain) FILTER (WHERE closed), 0) AS realized_gain,
+        COALESCE(SUM(value) FILTER (WHERE closed AND gain IS NOT NULL), 0) AS proceeds,
+        SUM(value) FILTER (WHERE annualized IS NOT NULL) AS annualized_value,
+        SUM(cost) FILTER (WHERE annualized IS NOT NULL) AS annualized_cost,
+        SUM(cost * days_held) FILTER (WHERE annualized IS NOT NULL) AS cost_days,
+        COUNT(*) FILTER (WHERE NOT closed) AS open_lots,
+        COUNT(*) FILTER (WHERE closed) AS closed_lots,
+        COUNT(*) FILTER (WHERE gain IS NULL) AS unpriced_lots
+    FROM gains
+)
+INSERT INTO portfolio_pnl
+    (user_id, cost_basis, market_value, unrealized_gain, realized_gain, proceeds,
+     annualized_return, open_lots, closed_lots, unpriced_lots, computed_at)
+SELECT
+    :user_id, cost_basis, market_value, market_value - cost_basis, realized_gain, proceeds,
+    CASE WHEN annualized_cost > 0 THEN power(annualized_value / annualized_cost, 365.0 * annualized_cost / cost_days) - 1 END,
+    open_lots, closed_lots, unpriced_lots, :now
+FROM summary
+ON CONFLICT (user_id) DO UPDATE SET
+    cost_basis = EXCLUDED.cost_basis,
+    market_value = EXCLUDED.market_value,
+    unrealized_gain = EXCLUDED.unrealized_gain,
+    realized_gain = EXCLUDED.realized_gain,
+    proceeds = EXCLUDED.proceeds,
+    annualized_return = EXCLUDED.annualized_return,
+    open_lots = EXCLUDED.open_lots,
+    closed_lots = EXCLUDED.closed_lots,
+    unpriced_lots = EXCLUDED.unpriced_lots,
+    computed_at = EXCLUDED.computed_at
+"""
+
+POSITIONS_SQL = LOTS_SQL + """
+SELECT
+    l.lot_type, l.lot_id, l.card_id, c.name, c.number, st.code,
+    l.quantity, l.purchase_price, l.purchase_date, l.sell_price, l.sell_date, l.market,
+    l.closed, l.cost, l.value, l.gain, l.gain_pct, l.annualized, l.days_held
+FROM gains l
+JOIN cards c ON c.id = l.card_id
+JOIN sets st ON st.id = c.set_id
+WHERE {filters}
+ORDER BY l.{sort} {order} NULLS LAST, l.lot_type, l.lot_id
+LIMIT :limit OFFSET :offset
+"""
+
+
+def refresh_pnl(db, user_id: int, today: Optional[date] = None) -> None:
+    db.execute(text(SUMMARY_SQL), {
+        "user_id": user_id,
+        "today": today or date.today(),
+        "min_days": MIN_ANNUALIZE_DAYS,
+        "now": datetime.utcnow(),
+    })
+
+
+def load_pnl_positions(
+    db,
+    user_id: int,
+    status: str = "all",
+    sort: str = "gain",
+    descending: bool = True,
+    min_gain: Optional[float] = None,
+    max_gain: Optional[float] = None,
+    limit: int = 50,
+    offset: int = 0,
+    today: Optional[date] = None,
+) -> list[dict]:
+    filters = ["TRUE"]
+    params = {"user_id": user_id, "today": today or date.today(), "min_days": MIN_ANNUALIZE_DAYS, "limit": limit, "offset": offset}
+    if status != "all":
+        filters.append("l.closed" if status == "closed" else "NOT l.closed")
+    if min_gain is not None:
+        filters.append("l.gain >= :min_gain")
+        params["min_gain"] = min_gain
+    if max_gain is not None:
+        filters.append("l.gain <= :max_gain")
+        params["max_gain"] = max_gain
+    statement = POSITIONS_SQL.format(filters=" AND ".join(filters), sort=PNL_SORTS[sort], order="DESC" if descending else "ASC")
+    rows = db.execute(text(statement), params).all()
+    return [
+        {
+            "lot_type": row[0],
+            "lot_id": row[1],
+            "card_id": row[2],
+            "name": row[3],
+            "number": row[4],
+            "set_code": row[5],
+            "quantity": row[6],
+            "purchase_price": row[7],
+            "purchase_date": row[8],
+            "sell_price": row[9],
+            "sell_date": row[10],
+            "market": row[11],
+            "closed": row[12],
+            "cost": row[13],
+            "value": row[14],
+            "gain": row[15],
+            "gain_pct": row[16],
+            "annualized_return": row[17],
+            "days_held": row[18],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,340 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.dashboard_summary import mark_summary_stale
+
+PENDING_KEY = "portfolio_pending"
+
+BREAKDOWN_TYPES = ("set", "series", "rarity", "supertype", "grader", "storage")
+
+# (date_trunc unit, longest span in days it is used for); keeps every range at
+# a couple of hundred points at most.
+SERIES_BUCKETS = (("hour", 7), ("day", 180), ("week", 1095), ("month", None))
+
+# Best (highest) market per card and per graded item, a single graded item per
+# (user, card) and graded prices taking precedence over the raw card price.
+# {scope} restricts the holdings to a set of users; everything else is joined
+# against that scope so single-user runs stay index lookups. Totals and the
+# per-dimension breakdowns are grouped from the same valued holdings.
+SNAPSHOT_SQL = """
+WITH scoped AS (
+    SELECT user_id, card_id, quantity, storage_location_id
+    FROM holdings
+    {scope}
+),
+card_price AS (
+    SELECT entity_id, MAX(market) AS market
+    FROM latest_prices
+    WHERE entity_type = 'card'
+      AND market IS NOT NULL
+      AND entity_id IN (SELECT card_id FROM scoped)
+    GROUP BY entity_id
+),
+graded_pick AS (
+    SELECT DISTINCT ON (user_id, card_id) user_id, card_id, id, grader
+    FROM graded_items
+    WHERE user_id IN (SELECT user_id FROM scoped)
+    ORDER BY user_id, card_id, id DESC
+),
+graded_price AS (
+    SELECT entity_id, MAX(market) AS market
+    FROM latest_prices
+    WHERE entity_type = 'graded'
+      AND market IS NOT NULL
+      AND entity_id IN (SELECT id FROM graded_pick)
+    GROUP BY entity_id
+),
+valued AS (
+    SELECT
+        s.user_id,
+        s.card_id,
+        s.storage_location_id,
+        CASE WHEN gp.market IS NOT NULL THEN g.grader END AS grader,
+        CASE WHEN gp.market IS NULL THEN COALESCE(cp.market, 0) * s.quantity ELSE 0 END AS raw_value,
+        COALESCE(gp.market, 0) * s.quantity AS graded_value
+    FROM scoped s
+    LEFT JOIN card_price cp ON cp.entity_id = s.card_id
+    LEFT JOIN graded_pick g ON g.user_id = s.user_id AND g.card_id = s.card_id
+    LEFT JOIN graded_price gp ON gp.entity_id = g.id
+),
+totals AS (
+    SELECT user_id, SUM(raw_value) AS raw_value, SUM(graded_value) AS graded_value
+    FROM valued
+    GROUP BY user_id
+),
+dimensions AS (
+    SELECT v.user_id, d.breakdown_type, d.key, SUM(v.raw_value + v.graded_value) AS value
+    FROM valued v
+    JOIN cards c ON c.id = v.card_id
+    JOIN sets st ON st.id = c.set_id
+    LEFT JOIN storage_locations sl ON sl.id = v.storage_location_id
+    CROSS JOIN LATERAL (VALUES
+        ('set', st.code),
+        ('series', COALESCE(st.series, 'Unknown')),
+        ('rarity', COALESCE(c.rarity, 'Unknown')),
+        ('supertype', COALESCE(c.supertype, 'Unknown')),
+        ('grader', COALESCE(v.grader, 'Raw')),
+        ('storage', COALESCE(sl.name, 'Unassigned'))
+    ) AS d (breakdown_type, key)
+    GROUP BY v.user_id, d.breakdown_type, d.key
+    HAVING SUM(v.raw_value + v.graded_value) > 0
+),
+breakdowns AS (
+    INSERT INTO portfolio_breakdowns (user_id, ts, breakdown_type, values_json)
+    SELECT user_id, :ts, breakdown_type, json_object_agg(key, value)
+    FROM dimensions
+    GROUP BY user_id, breakdown_type
+),
+snapshots AS (
+    INSERT INTO portfolio_snapshots (user_id, ts, total_value, raw_value, graded_value)
+    SELECT user_id, :ts, raw_value + graded_value, raw_value, graded_value
+    FROM totals
+    RETURNING id, user_id, ts, total_value, raw_value, graded_value
+)
+SELECT id, user_id, ts, total_value, raw_value, graded_value FROM snapshots
+"""
+
+
+def take_snapshots(db, user_ids: Optional[Iterable[int]] = None, ts: Optional[datetime] = None) -> list[dict]:
+    # db can be a Session or a Connection; the caller owns the transaction.
+    params = {"ts": ts or datetime.utcnow()}
+    scope = ""
+    if user_ids is not None:
+        params["user_ids"] = sorted(set(user_ids))
+        if not params["user_ids"]:
+            return []
+        scope = "WHERE user_id = ANY(:user_ids)"
+    rows = db.execute(text(SNAPSHOT_SQL.format(scope=scope)), params).all()
+    return [
+        {
+            "id": row[0],
+            "user_id": row[1],
+            "ts": row[2],
+            "total": row[3],
+            "raw": row[4],
+            "graded": row[5],
+        }
+        for row in rows
+    ]
+
+
+# Last snapshot per bucket, read through the (user_id, ts) index.
+SERIES_SQL = """
+SELECT DISTINCT ON (bucket) date_trunc(:unit, ts) AS bucket, ts, total_value, raw_value, graded_value
+FROM portfolio_snapshots
+WHERE user_id = :user_id AND ts >= :start
+ORDER BY bucket, ts DESC, id DESC
+"""
+
+# Keeps only the last row per user (and breakdown type) and day before :cutoff.
+COMPACT_SQL = """
+DELETE FROM {table} p
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY {partition}, ts::date ORDER BY ts DESC, id DESC) AS position
+    FROM {table}
+    WHERE ts < :cutoff
+) o
+WHERE p.id = o.id AND o.position > 1
+"""
+
+
+def series_bucket(span: timedelta) -> str:
+    for unit, max_days in SERIES_BUCKETS:
+        if max_days is None or span <= timedelta(days=max_days):
+            return unit
+    return SERIES_BUCKETS[-1][0]
+
+
+def portfolio_series(db, user_id: int, delta: Optional[timedelta], now: Optional[datetime] = None) -> dict:
+    now = now or datetime.utcnow()
+    if delta is None:
+        start = db.execute(text("SELECT MIN(ts) FROM portfolio_snapshots WHERE user_id = :user_id"), {"user_id": user_id}).scalar()
+        if start is None:
+            return {"bucket": None, "points": []}
+    else:
+        start = now - delta
+    unit = series_bucket(now - start)
+    rows = db.execute(text(SERIES_SQL), {"unit": unit, "user_id": user_id, "start": start}).all()
+    return {
+        "bucket": unit,
+        "points": [
+            {"ts": ts, "total": total, "raw": raw, "graded": graded}
+            for _, ts, total, raw, graded in rows
+        ],
+    }
+
+
+def compact_snapshots(conn, cutoff: date) -> dict:
+    snapshots = conn.execute(text(COMPACT_SQL.format(table="portfolio_snapshots", partition="user_id")), {"cutoff": cutoff})
+    breakdowns = conn.execute(
+        text(COMPACT_SQL.format(table="portfolio_breakdowns", partition="user_id, breakdown_type")),
+        {"cutoff": cutoff},
+    )
+    return {"snapshots": snapshots.rowcount or 0, "breakdowns": breakdowns.rowcount or 0}
+
+
+# Totals are recomputed from the positions rather than adjusted by deltas, and
+# the users' portfolio_totals rows are locked first (in user_id order), so two
+# transactions repricing the same user run one after the other; under READ
+# COMMITTED the second one's statements then see the first one's positions.
+ENSURE_TOTALS_SQL = """
+INSERT INTO portfolio_totals (user_id, total_value, raw_value, graded_value, positions, updated_at)
+SELECT DISTINCT user_id, 0, 0, 0, 0, :now FROM ({targets}) t
+ORDER BY user_id
+ON CONFLICT (user_id) DO NOTHING
+"""
+
+LOCK_TOTALS_SQL = """
+SELECT user_id FROM portfolio_totals
+WHERE user_id IN (SELECT user_id FROM ({targets}) t)
+ORDER BY user_id
+FOR UPDATE
+"""
+
+# Recomputes the given (user_id, card_id) positions of the locked users.
+REPRICE_SQL = """
+WITH targets AS (
+    SELECT DISTINCT user_id, card_id FROM ({targets}) t WHERE user_id = ANY(:locked_user_ids)
+),
+fresh AS (
+    SELECT t.user_id, t.card_id, COALESCE(SUM(h.quantity), 0) AS quantity
+    FROM targets t
+    LEFT JOIN holdings h ON h.user_id = t.user_id AND h.card_id = t.card_id
+    GROUP BY t.user_id, t.card_id
+),
+graded_pick AS (
+    SELECT DISTINCT ON (g.user_id, g.card_id) g.user_id, g.card_id, g.id
+    FROM graded_items g
+    JOIN targets t ON t.user_id = g.user_id AND t.card_id = g.card_id
+    ORDER BY g.user_id, g.card_id, g.id DESC
+),
+priced AS (
+    SELECT
+        f.user_id,
+        f.card_id,
+        f.quantity,
+        g.id AS graded_item_id,
+        (SELECT MAX(market) FROM latest_prices WHERE entity_type = 'card' AND entity_id = f.card_id) AS card_price,
+        (SELECT MAX(market) FROM latest_prices WHERE entity_type = 'graded' AND entity_id = g.id) AS graded_price
+    FROM fresh f
+    LEFT JOIN graded_pick g ON g.user_id = f.user_id AND g.card_id = f.card_id
+),
+valued AS (
+    SELECT
+        *,
+        CASE WHEN graded_price IS NULL THEN COALESCE(card_price, 0) * quantity ELSE 0 END AS raw_value,
+        COALESCE(graded_price, 0) * quantity AS graded_value
+    FROM priced
+),
+removed AS (
+    DELETE FROM portfolio_positions p
+    USING valued v
+    WHERE p.user_id = v.user_id AND p.card_id = v.card_id AND v.quantity = 0
+    RETURNING p.id
+)
+INSERT INTO portfolio_positions
+    (user_id, card_id, quantity, graded_item_id, card_price, graded_price, raw_value, graded_value, updated_at)
+SELECT user_id, card_id, quantity, graded_item_id, card_price, graded_price, raw_value, graded_value, :now
+FROM valued
+WHERE quantity > 0
+ON CONFLICT ON CONSTRAINT uq_portfolio_position DO UPDATE SET
+    quantity = EXCLUDED.quantity,
+    graded_item_id = EXCLUDED.graded_item_id,
+    card_price = EXCLUDED.card_price,
+    graded_price = EXCLUDED.graded_price,
+    raw_value = EXCLUDED.raw_value,
+    graded_value = EXCLUDED.graded_value,
+    updated_at = EXCLUDED.updated_at
+"""
+
+TOTALS_SQL = """
+UPDATE portfolio_totals t
+SET
+    total_value = s.raw_value + s.graded_value,
+    raw_value = s.raw_value,
+    graded_value = s.graded_value,
+    positions = s.positions,
+    updated_at = :now
+FROM (
+    SELECT u.user_id, COALESCE(SUM(p.raw_value), 0) AS raw_value, COALESCE(SUM(p.graded_value), 0) AS graded_value, COUNT(p.id) AS positions
+    FROM unnest(CAST(:user_ids AS integer[])) AS u (user_id)
+    LEFT JOIN portfolio_positions p ON p.user_id = u.user_id
+    GROUP BY u.user_id
+) s
+WHERE t.user_id = s.user_id
+RETURNING t.user_id
+"""
+
+POSITION_TARGETS = "SELECT unnest(CAST(:user_ids AS integer[])) AS user_id, unnest(CAST(:card_ids AS integer[])) AS card_id"
+CARD_HOLDER_TARGETS = "SELECT user_id, card_id FROM portfolio_positions WHERE card_id = ANY(:card_ids)"
+GRADED_TARGETS = "SELECT user_id, card_id FROM graded_items WHERE id = ANY(:graded_ids)"
+HOLDING_TARGETS = "SELECT user_id, card_id FROM holdings {scope}"
+
+
+def reprice(db, targets: str, params: dict) -> None:
+    now = datetime.utcnow()
+    db.execute(text(ENSURE_TOTALS_SQL.format(targets=targets)), {**params, "now": now})
+    user_ids = db.execute(text(LOCK_TOTALS_SQL.format(targets=targets)), params).scalars().all()
+    if not user_ids:
+        return
+    db.execute(text(REPRICE_SQL.format(targets=targets)), {**params, "locked_user_ids": user_ids, "now": now})
+    changed = db.execute(text(TOTALS_SQL), {"user_ids": user_ids, "now": now}).scalars().all()
+    mark_summary_stale(db, changed)
+
+
+def refresh_positions(db, pairs: Iterable[tuple[int, int]]) -> None:
+    pairs = sorted(set(pairs))
+    if pairs:
+        user_ids, card_ids = zip(*pairs)
+        reprice(db, POSITION_TARGETS, {"user_ids": list(user_ids), "card_ids": list(card_ids)})
+
+
+def reprice_cards(db, card_ids: Iterable[int]) -> None:
+    card_ids = sorted(set(card_ids))
+    if card_ids:
+        reprice(db, CARD_HOLDER_TARGETS, {"card_ids": card_ids})
+
+
+def reprice_graded(db, graded_ids: Iterable[int]) -> None:
+    graded_ids = sorted(set(graded_ids))
+    if graded_ids:
+        reprice(db, GRADED_TARGETS, {"graded_ids": graded_ids})
+
+
+def rebuild_positions(db, user_ids: Optional[Iterable[int]] = None) -> None:
+    params = {}
+    scope = ""
+    if user_ids is not None:
+        params["user_ids"] = sorted(set(user_ids))
+        scope = "WHERE user_id = ANY(:user_ids)"
+    db.execute(text(f"DELETE FROM portfolio_positions {scope}"), params)
+    db.execute(text(f"DELETE FROM portfolio_totals {scope}"), params)
+    reprice(db, HOLDING_TARGETS.format(scope=scope), params)
+
+
+def pending_changes(db: Session) -> dict:
+    return db.info.setdefault(PENDING_KEY, {"positions": set(), "cards": set(), "graded": set()})
+
+
+def mark_position_changed(db: Session, user_id: int, card_ids: Iterable[int]) -> None:
+    pending_changes(db)["positions"].update((user_id, card_id) for card_id in card_ids if card_id is not None)
+
+
+def mark_price_changed(db: Session, entity_type: str, entity_id: int) -> None:
+    pending_changes(db)["cards" if entity_type == "card" else "graded"].add(entity_id)
+
+
+@event.listens_for(Session, "before_commit")
+def apply_pending_changes(db: Session) -> None:
+    # Holdings, graded items and record_price() only mark what changed; the
+    # position deltas are applied once per transaction, right before commit.
+    pending = db.info.pop(PENDING_KEY, None)
+    if not pending or not any(pending.values()):
+        return
+    db.flush()
+    refresh_positions(db, pending["positions"])
+    reprice_graded(db, pending["graded"])
+    reprice_cards(db, pending["cards"])
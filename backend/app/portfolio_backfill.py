@@ -0,0 +1,250 @@
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+# Entities anyone still holds: every held card plus the graded item the
+# snapshot would pick for each (user, card).
+TRACKED_SQL = """
+SELECT 'card' AS entity_type, card_id AS entity_id FROM holdings GROUP BY card_id
+UNION ALL
+(SELECT DISTINCT ON (user_id, card_id) 'graded', id FROM graded_items ORDER BY user_id, card_id, id DESC)
+"""
+
+# Per-source daily closes of tracked entities inside the window, from raw rows
+# and the daily rollup tier; the max across sources is taken in NumPy. Only
+# held cards and graded items come back, so memory follows the tracked
+# positions rather than the catalog.
+WINDOW_CLOSES_SQL = """
+WITH tracked AS ({tracked})
+SELECT entity_type = 'graded', entity_id, ts::date - CAST(:start AS date), (array_agg(market ORDER BY ts DESC, id DESC))[1]
+FROM price_history
+WHERE ts >= :start AND ts < :end AND market IS NOT NULL
+  AND (entity_type, entity_id) IN (SELECT entity_type, entity_id FROM tracked)
+GROUP BY entity_type, entity_id, source_id, ts::date
+UNION ALL
+SELECT entity_type = 'graded', entity_id, day - CAST(:start AS date), market_close
+FROM price_history_daily
+WHERE day >= :start AND day < :end AND market_close IS NOT NULL
+  AND (entity_type, entity_id) IN (SELECT entity_type, entity_id FROM tracked)
+"""
+
+# Last daily close before the window per tracked entity (highest across sources).
+SEED_CLOSES_SQL = """
+WITH tracked AS ({tracked}),
+closes AS (
+    SELECT entity_type, entity_id, ts::date AS day, (array_agg(market ORDER BY ts DESC, id DESC))[1] AS close
+    FROM price_history
+    WHERE ts < :start AND market IS NOT NULL
+      AND (entity_type, entity_id) IN (SELECT entity_type, entity_id FROM tracked)
+    GROUP BY entity_type, entity_id, source_id, ts::date
+    UNION ALL
+    SELECT entity_type, entity_id, day, market_close
+    FROM price_history_daily
+    WHERE day < :start AND market_close IS NOT NULL
+      AND (entity_type, entity_id) IN (SELECT entity_type, entity_id FROM tracked)
+)
+SELECT DISTINCT ON (entity_type, entity_id) entity_type = 'graded', entity_id, close
+FROM closes
+ORDER BY entity_type, entity_id, day DESC, close DESC
+"""
+
+# Holding dates come back as day offsets into the window; undated holdings
+# count as held for the whole window.
+HOLDINGS_SQL = """
+SELECT
+    h.user_id,
+    h.card_id,
+    h.quantity,
+    COALESCE(h.purchase_date - CAST(:start AS date), 0),
+    COALESCE(h.sell_date - CAST(:start AS date), :days),
+    COALESCE(g.id, 0)
+FROM holdings h
+LEFT JOIN (
+    SELECT DISTINCT ON (user_id, card_id) user_id, card_id, id
+    FROM graded_items
+    ORDER BY user_id, card_id, id DESC
+) g ON g.user_id = h.user_id AND g.card_id = h.card_id
+ORDER BY h.user_id
+"""
+
+INSERT_SNAPSHOTS_SQL = """
+INSERT INTO portfolio_snapshots (user_id, ts, total_value, raw_value, graded_value)
+SELECT user_id, CAST(:origin AS timestamp) + offset_days * INTERVAL '1 day', raw + graded, raw, graded
+FROM unnest(
+    CAST(:user_ids AS integer[]),
+    CAST(:offsets AS integer[]),
+    CAST(:raw AS double precision[]),
+    CAST(:graded AS double precision[])
+) AS rows (user_id, offset_days, raw, graded)
+"""
+
+
+def day_axis(start: date, end: date) -> np.ndarray:
+    return np.arange(np.datetime64(start, "D"), np.datetime64(end, "D"))
+
+
+def forward_fill(grid: np.ndarray) -> np.ndarray:
+    # Carries the last observed price forward along the day axis.
+    positions = np.where(np.isnan(grid), 0, np.arange(grid.shape[1]))
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    return grid[np.arange(grid.shape[0])[:, None], positions]
+
+
+def load_price_grids(conn, start: date, end: date, work_mem: str = "256MB") -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    # Returns entity_type -> (sorted tracked entity ids, forward-filled [entity, day] closes).
+    # The last close before start seeds day 0 so positions are priced from the first day.
+    days = (end - start).days
+    conn.execute(text("SELECT set_config('work_mem', :work_mem, true)"), {"work_mem": work_mem})
+    tracked = conn.execute(text(TRACKED_SQL)).all()
+    window = conn.execute(text(WINDOW_CLOSES_SQL.format(tracked=TRACKED_SQL.strip())), {"start": start, "end": end}).all()
+    seed = conn.execute(text(SEED_CLOSES_SQL.format(tracked=TRACKED_SQL.strip())), {"start": start}).all()
+
+    if window:
+        window_graded, window_ids, window_offsets, window_closes = (np.array(column) for column in zip(*window))
+    grids = {}
+    for entity_type, graded in (("card", False), ("graded", True)):
+        ids = np.unique(np.array([row[1] for row in tracked if row[0] == entity_type], dtype=np.int64))
+        # One extra all-NaN row for entities without any history.
+        grid = np.full((ids.size + 1, days), np.nan)
+        if window:
+            selected = window_graded == graded
+            rows = lookup_rows(ids, window_ids[selected].astype(np.int64))
+            np.fmax.at(grid, (rows, window_offsets[selected].astype(np.int64)), window_closes[selected].astype(np.float64))
+        seed_rows = [row for row in seed if row[0] == graded]
+        if seed_rows:
+            _, entity_ids, closes = zip(*seed_rows)
+            rows = lookup_rows(ids, np.array(entity_ids, dtype=np.int64))
+            grid[rows, 0] = np.where(np.isnan(grid[rows, 0]), closes, grid[rows, 0])
+        # Ids missing from the lookup were routed to the NaN row; keep it empty.
+        grid[ids.size] = np.nan
+        grids[entity_type] = (ids, forward_fill(grid))
+    return grids
+
+
+def lookup_rows(ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Maps entity ids to grid rows; unknown ids land on the trailing NaN row.
+    if ids.size == 0:
+        return np.zeros(values.shape, dtype=np.int64)
+    rows = np.minimum(np.searchsorted(ids, values), ids.size - 1)
+    return np.where(ids[rows] == values, rows, ids.size)
+
+
+def iter_holdings(conn, start: date, days: int, chunk_size: int) -> Iterator[list]:
+    result = conn.execute(
+        text(HOLDINGS_SQL),
+        {"start": start, "days": days},
+        execution_options={"stream_results": True, "max_row_buffer": chunk_size},
+    )
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def add_segments(totals: np.ndarray, user_rows: np.ndarray, values: np.ndarray) -> None:
+    # user_rows is sorted, so every user is one contiguous segment of values.
+    boundaries = np.flatnonzero(np.r_[True, user_rows[1:] != user_rows[:-1]])
+    totals[user_rows[boundaries]] += np.add.reduceat(values, boundaries, axis=0)
+
+
+def value_holdings(
+    rows: list,
+    days: int,
+    grids: dict,
+    card_values: np.ndarray,
+    user_ids: np.ndarray,
+    totals: dict,
+    matmul_cells: int = 10_000_000,
+    gather_rows: int = 5000,
+) -> None:
+    columns = np.array(list(zip(*rows)), dtype=np.int64)
+    user_rows = np.searchsorted(user_ids, columns[0])
+    card_ids_sorted, card_grid = grids["card"]
+    graded_ids_sorted, graded_grid = grids["graded"]
+    card_rows = lookup_rows(card_ids_sorted, columns[1])
+    graded_rows = lookup_rows(graded_ids_sorted, columns[5])
+    quantity = columns[2].astype(np.float64)
+    purchased = columns[3]
+    sold = columns[4]
+
+    # Held for the whole window and never graded: value is quantity x card price
+    # on every day, so a block of users is one (users x cards) @ (cards x days) product.
+    simple = (purchased <= 0) & (sold >= days) & (graded_rows == graded_ids_sorted.size)
+    if simple.any():
+        local_users, local_index = np.unique(user_rows[simple], return_inverse=True)
+        block = max(1, matmul_cells // card_values.shape[0])
+        for begin in range(0, local_users.size, block):
+            in_block = (local_index >= begin) & (local_index < begin + block)
+            weights = np.zeros((min(block, local_users.size - begin), card_values.shape[0]))
+            np.add.at(weights, (local_index[in_block] - begin, card_rows[simple][in_block]), quantity[simple][in_block])
+            totals["raw"][local_users[begin:begin + block]] += weights @ card_values
+        totals["held"][local_users] += np.bincount(local_index)[:, None].astype(np.int32)
+
+    # Dated or graded holdings need a per-day mask and graded precedence.
+    rest = np.flatnonzero(~simple)
+    day_index = np.arange(days)
+    for begin in range(0, rest.size, gather_rows):
+        chunk = rest[begin:begin + gather_rows]
+        held = (day_index >= purchased[chunk, None]) & (day_index < sold[chunk, None])
+        card_prices = card_grid[card_rows[chunk]]
+        graded_prices = graded_grid[graded_rows[chunk]]
+        use_graded = held & ~np.isnan(graded_prices)
+        amount = quantity[chunk, None]
+        add_segments(totals["graded"], user_rows[chunk], np.where(use_graded, graded_prices * amount, 0.0))
+        add_segments(totals["raw"], user_rows[chunk], np.where(held & ~use_graded & ~np.isnan(card_prices), card_prices * amount, 0.0))
+        add_segments(totals["held"], user_rows[chunk], held.astype(np.int32))
+
+
+def backfill_days(conn, start: date, end: date, chunk_size: int = 200000, work_mem: str = "256MB") -> dict:
+    # Computes [user, day] raw/graded value matrices for every user over [start, end).
+    days = (end - start).days
+    user_ids = np.array([row[0] for row in conn.execute(text("SELECT id FROM users ORDER BY id")).all()], dtype=np.int64)
+    totals = {
+        "raw": np.zeros((user_ids.size, days)),
+        "graded": np.zeros((user_ids.size, days)),
+        "held": np.zeros((user_ids.size, days), dtype=np.int32),
+    }
+    grids = load_price_grids(conn, start, end, work_mem)
+    card_values = np.nan_to_num(grids["card"][1])
+    for rows in iter_holdings(conn, start, days, chunk_size):
+        value_holdings(rows, days, grids, card_values, user_ids, totals)
+    return {"user_ids": user_ids, "days": day_axis(start, end), **totals}
+
+
+def first_snapshot_offsets(conn, user_ids: np.ndarray, start: date, days: int) -> np.ndarray:
+    # Day offset of each user's first existing snapshot; backfill stops there.
+    offsets = np.full(user_ids.size, days, dtype=np.int64)
+    rows = conn.execute(text("SELECT user_id, MIN(ts)::date FROM portfolio_snapshots GROUP BY user_id")).all()
+    if rows:
+        positions = np.searchsorted(user_ids, [row[0] for row in rows])
+        first = np.array([(row[1] - start).days for row in rows], dtype=np.int64)
+        offsets[positions] = np.clip(first, 0, days)
+    return offsets
+
+
+def write_snapshots(conn, result: dict, cutoffs: np.ndarray, batch_size: int = 100000, snapshot_time: Optional[time] = None) -> int:
+    day_index = np.arange(result["days"].size)
+    mask = (result["held"] > 0) & (day_index[None, :] < cutoffs[:, None])
+    user_rows, day_rows = np.nonzero(mask)
+    origin = datetime.combine(result["days"][0].astype(object), snapshot_time or time(23, 59, 59)) if result["days"].size else None
+    written = 0
+    for begin in range(0, user_rows.size, batch_size):
+        users = user_rows[begin:begin + batch_size]
+        offsets = day_rows[begin:begin + batch_size]
+        conn.execute(text(INSERT_SNAPSHOTS_SQL), {
+            "origin": origin,
+            "user_ids": result["user_ids"][users].tolist(),
+            "offsets": offsets.tolist(),
+            "raw": result["raw"][users, offsets].tolist(),
+            "graded": result["graded"][users, offsets].tolist(),
+        })
+        written += users.size
+    return written
+
+
+def backfill_window(days: int, today: Optional[date] = None) -> tuple[date, date]:
+    end = today or date.today()
+    return end - timedelta(days=days), end
@@ -0,0 +1,230 @@
+import math
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import PriceHistory, PriceHistoryDaily
+
+PARENT_TABLE = "price_history"
+DEFAULT_PARTITION = "price_history_default"
+RANGE_UNIT_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+BUCKETED_HISTORY_SQL = """
+WITH points AS (
+    SELECT ts, market AS close, market AS lo, market AS hi
+    FROM price_history
+    WHERE entity_type = :entity_type AND entity_id = :entity_id AND ts >= :start AND market IS NOT NULL
+    UNION ALL
+    SELECT day::timestamp, market_close, market_low, market_high
+    FROM price_history_daily
+    WHERE entity_type = :entity_type
+      AND entity_id = :entity_id
+      AND day >= :start_day
+      AND market_close IS NOT NULL
+      AND day < COALESCE(
+          (SELECT MIN(ts)::date FROM price_history WHERE entity_type = :entity_type AND entity_id = :entity_id),
+          'infinity'::date
+      )
+)
+SELECT
+    GREATEST(0, FLOOR(EXTRACT(EPOCH FROM (ts - :start)) / :width))::bigint AS bucket,
+    MIN(lo),
+    MAX(hi),
+    AVG(close),
+    (array_agg(close ORDER BY ts DESC))[1],
+    COUNT(*)
+FROM points
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+FIRST_HISTORY_TS_SQL = """
+SELECT LEAST(
+    (SELECT MIN(ts) FROM price_history WHERE entity_type = :entity_type AND entity_id = :entity_id),
+    (SELECT MIN(day)::timestamp FROM price_history_daily WHERE entity_type = :entity_type AND entity_id = :entity_id)
+)
+"""
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(value: date) -> date:
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+
+def partition_name(value: date) -> str:
+    return f"{PARENT_TABLE}_y{value.year:04d}m{value.month:02d}"
+
+
+def is_partitioned(conn) -> bool:
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": PARENT_TABLE},
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn) -> list[tuple[str, date, date]]:
+    rows = conn.execute(text(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+        """
+    ), {"parent": PARENT_TABLE}).all()
+    partitions = []
+    for name, bound in rows:
+        if not bound or "FROM" not in bound:
+            continue
+        # bound looks like: FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')
+        lower = bound.split("FROM ('", 1)[1][:10]
+        upper = bound.split("TO ('", 1)[1][:10]
+        partitions.append((name, date.fromisoformat(lower), date.fromisoformat(upper)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def ensure_partitions(conn, start: date, end: date) -> list[str]:
+    if not is_partitioned(conn):
+        return []
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    existing = {name for name, _, _ in list_partitions(conn)}
+    created = []
+    current = month_start(start)
+    while current <= end:
+        upper = next_month(current)
+        name = partition_name(current)
+        if name not in existing:
+            # Rows that landed in the default partition for this month have to move
+            # before the range can be attached.
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+            conn.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE ts >= :lower AND ts < :upper RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                ),
+                {"lower": current, "upper": upper},
+            )
+            conn.execute(text(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            created.append(name)
+        current = upper
+    return created
+
+
+def rollup_daily(conn, before: date, since: Optional[date] = None) -> int:
+    params = {"before": before}
+    since_clause = ""
+    if since is not None:
+        since_clause = "AND ts >= :since"
+        params["since"] = since
+    result = conn.execute(text(
+        f"""
+        INSERT INTO price_history_daily
+            (entity_type, entity_id, source_id, day, market_open, market_high, market_low, market_close, samples)
+        SELECT
+            entity_type,
+            entity_id,
+            source_id,
+            ts::date,
+            (array_agg(market ORDER BY ts, id))[1],
+            MAX(market),
+            MIN(market),
+            (array_agg(market ORDER BY ts DESC, id DESC))[1],
+            COUNT(*)
+        FROM price_history
+        WHERE ts < :before {since_clause} AND market IS NOT NULL
+        GROUP BY entity_type, entity_id, source_id, ts::date
+        ON CONFLICT ON CONSTRAINT uq_price_history_daily DO UPDATE SET
+            market_high = GREATEST(price_history_daily.market_high, EXCLUDED.market_high),
+            market_low = LEAST(price_history_daily.market_low, EXCLUDED.market_low),
+            market_close = EXCLUDED.market_close,
+            samples = price_history_daily.samples + EXCLUDED.samples
+        """
+    ), params)
+    return result.rowcount or 0
+
+
+def load_price_history(db: Session, entity_type: str, entity_id: int, limit: int = 200) -> list[dict]:
+    # Newest raw rows first, then daily rollups for days older than the raw tier.
+    raw_rows = (
+        db.query(PriceHistory.ts, PriceHistory.market)
+        .filter(PriceHistory.entity_type == entity_type, PriceHistory.entity_id == entity_id)
+        .order_by(PriceHistory.ts.desc())
+        .limit(limit)
+        .all()
+    )
+    history = [{"ts": ts, "market": market} for ts, market in raw_rows]
+    remaining = limit - len(history)
+    if remaining <= 0:
+        return history
+    rollups = db.query(PriceHistoryDaily.day, PriceHistoryDaily.market_close).filter(
+        PriceHistoryDaily.entity_type == entity_type,
+        PriceHistoryDaily.entity_id == entity_id,
+    )
+    if history:
+        rollups = rollups.filter(PriceHistoryDaily.day < history[-1]["ts"].date())
+    for day, market in rollups.order_by(PriceHistoryDaily.day.desc()).limit(remaining).all():
+        history.append({"ts": datetime.combine(day, datetime.min.time()), "market": market})
+    return history
+
+
+def parse_range(value: Optional[str]) -> Optional[timedelta]:
+    if not value or value.strip().lower() == "all":
+        return None
+    match = re.fullmatch(r"(\d+)\s*([dwmy])", value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Unsupported range: {value}. Use e.g. 7d, 4w, 3m, 1y or all")
+    return timedelta(days=int(match.group(1)) * RANGE_UNIT_DAYS[match.group(2)])
+
+
+def downsample_price_history(
+    db: Session,
+    entity_type: str,
+    entity_id: int,
+    range_value: Optional[str],
+    max_points: int,
+) -> dict:
+    # Buckets both storage tiers in SQL so the payload is bounded by max_points
+    # regardless of how many rows the range covers.
+    delta = parse_range(range_value)
+    params = {"entity_type": entity_type, "entity_id": entity_id}
+    now = datetime.utcnow()
+    if delta is None:
+        start = db.execute(text(FIRST_HISTORY_TS_SQL), params).scalar()
+        if start is None:
+            return {"bucket_seconds": 0, "points": []}
+    else:
+        start = now - delta
+    span = max((now - start).total_seconds(), 1.0)
+    width = max(1, math.ceil(span / max_points))
+    rows = db.execute(
+        text(BUCKETED_HISTORY_SQL),
+        {**params, "start": start, "start_day": start.date(), "width": width},
+    ).all()
+    points = [
+        {
+            "ts": start + timedelta(seconds=int(bucket) * width),
+            "market": close,
+            "min": low,
+            "max": high,
+            "avg": float(avg) if avg is not None else None,
+            "samples": samples,
+        }
+        for bucket, low, high, avg, close, samples in rows
+    ]
+    return {"bucket_seconds": width, "points": points}
+
+
+def retention_cutoff(retention_days: int, today: Optional[date] = None) -> date:
+    return (today or date.today()) - timedelta(days=retention_days)
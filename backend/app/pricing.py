@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.alerts import queue_price_check
+from app.models import LatestPrice, PriceHistory
+from app.portfolio import mark_price_changed
+from app.sync import mark_sync_changed
+
+PRICE_FIELDS = ("market", "low", "mid", "high")
+LOOKUP_CHUNK = 5000
+
+
+def history_heartbeat_enabled() -> bool:
+    return os.environ.get("PRICE_HISTORY_HEARTBEAT", "0") == "1"
+
+
+def load_latest_prices(db: Session, entity_type: str, entity_ids: Iterable[int], source_id: int) -> dict[int, LatestPrice]:
+    ids = sorted({entity_id for entity_id in entity_ids if entity_id is not None})
+    latest_map: dict[int, LatestPrice] = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        rows = db.query(LatestPrice).filter(
+            LatestPrice.entity_type == entity_type,
+            LatestPrice.source_id == source_id,
+            LatestPrice.entity_id.in_(chunk),
+        ).all()
+        for row in rows:
+            latest_map[row.entity_id] = row
+    return latest_map
+
+
+def record_price(
+    db: Session,
+    latest_map: dict[int, LatestPrice],
+    entity_type: str,
+    entity_id: int,
+    source_id: int,
+    values: dict,
+    observed_at: Optional[datetime] = None,
+    currency: str = "USD",
+    heartbeat: bool = False,
+) -> bool:
+    # Upserts LatestPrice and appends PriceHistory only when a value or the
+    # upstream timestamp moved (or once per day when heartbeat is enabled).
+    now = datetime.utcnow()
+    prices = {field: values.get(field) for field in PRICE_FIELDS}
+    latest = latest_map.get(entity_id)
+    if latest is None:
+        latest = LatestPrice(entity_type=entity_type, entity_id=entity_id, source_id=source_id)
+        db.add(latest)
+        latest_map[entity_id] = latest
+        changed = True
+    else:
+        changed = any(getattr(latest, field) != value for field, value in prices.items())
+        if observed_at is not None and latest.updated_at != observed_at:
+            changed = True
+
+    latest.currency = currency
+    for field, value in prices.items():
+        setattr(latest, field, value)
+    latest.updated_at = observed_at or now
+    queue_price_check(db, entity_type, entity_id, prices["market"])
+
+    if changed:
+        mark_price_changed(db, entity_type, entity_id)
+        mark_sync_changed(db, None, f"{entity_type}_price", [entity_id])
+        ts = observed_at or now
+    elif heartbeat and (latest.history_at is None or latest.history_at.date() < now.date()):
+        ts = now
+    else:
+        return False
+    db.add(PriceHistory(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        source_id=source_id,
+        ts=ts,
+        **prices,
+    ))
+    latest.history_at = now
+    return True
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.dependencies import require_admin
 from app.models import JobRun
+from app.parquet_export import aggregate_price_history, export_root, load_state
+from app.price_history import parse_range
 from app.schemas import AdminJobRequest
 
 router = APIRouter()
@@ -40,3 +44,31 @@ def jobs(db: Session = Depends(get_db), admin=Depends(require_admin)):
         {"id": r.id, "job_name": r.job_name, "status": r.status, "started_at": r.started_at, "finished_at": r.finished_at}
         for r in runs
     ]
+
+
+@router.get("/exports")
+def exports_status(admin=Depends(require_admin)):
+    root = export_root()
+    return {"root": root, "tables": load_state(root)}
+
+
+@router.get("/exports/price-history")
+def exports_price_history(
+    entity_type: str = Query("card"),
+    entity_id: int = Query(...),
+    range: str = Query("all"),
+    admin=Depends(require_admin),
+):
+    if entity_type not in ("card", "graded"):
+        raise HTTPException(status_code=400, detail="entity_type must be card or graded")
+    try:
+        delta = parse_range(range)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    start = datetime.utcnow() - delta if delta is not None else None
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "range": range,
+        "daily": aggregate_price_history(entity_type, entity_id, start=start),
+    }
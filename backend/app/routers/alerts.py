@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.alerts import ALERT_DIRECTIONS, ALERT_ENTITY_TYPES, ALERT_TYPE, invalidate_alert_index
+from app.db import get_db
+from app.dependencies import get_current_user
+from app.models import Alert, AlertEvent, Card, GradedItem, User
+from app.schemas import AlertCreate, AlertEventOut, AlertOut, AlertUpdate
+
+router = APIRouter()
+
+
+def validate_alert(direction: str, threshold: float) -> None:
+    if direction not in ALERT_DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"direction must be one of: {', '.join(ALERT_DIRECTIONS)}")
+    if threshold is None or threshold <= 0:
+        raise HTTPException(status_code=400, detail="threshold must be positive")
+
+
+def validate_alert_entity(db: Session, entity_type: str, entity_id: int, user_id: int) -> None:
+    # Graded alerts only for the user's own items: a fired event carries the price.
+    if entity_type == "graded":
+        exists = db.query(GradedItem.id).filter(GradedItem.id == entity_id, GradedItem.user_id == user_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Graded item not found")
+    elif not db.get(Card, entity_id):
+        raise HTTPException(status_code=404, detail="Card not found")
+
+
+@router.get("", response_model=list[AlertOut])
+def list_alerts(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return db.query(Alert).filter(Alert.user_id == current_user.id).order_by(Alert.id).all()
+
+
+@router.post("", response_model=AlertOut)
+def create_alert(payload: AlertCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if payload.entity_type not in ALERT_ENTITY_TYPES:
+        raise HTTPException(status_code=400, detail=f"entity_type must be one of: {', '.join(ALERT_ENTITY_TYPES)}")
+    validate_alert(payload.direction, payload.threshold)
+    validate_alert_entity(db, payload.entity_type, payload.entity_id, current_user.id)
+    alert = Alert(user_id=current_user.id, type=ALERT_TYPE, **payload.model_dump())
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    invalidate_alert_index()
+    return alert
+
+
+@router.patch("/{alert_id}", response_model=AlertOut)
+def update_alert(alert_id: int, payload: AlertUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == current_user.id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    for key, value in payload.model_dump(exclude_unset=True).items():
+        if value is None:
+            raise HTTPException(status_code=400, detail=f"{key} cannot be null")
+        setattr(alert, key, value)
+    validate_alert(alert.direction, alert.threshold)
+    db.commit()
+    db.refresh(alert)
+    invalidate_alert_index()
+    return alert
+
+
+@router.delete("/{alert_id}")
+def delete_alert(alert_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == current_user.id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    db.query(AlertEvent).filter(AlertEvent.alert_id == alert.id).delete()
+    db.delete(alert)
+    db.commit()
+    invalidate_alert_index()
+    return {"status": "deleted"}
+
+
+@router.get("/events", response_model=list[AlertEventOut])
+def list_events(
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return (
+        db.query(AlertEvent)
+        .filter(AlertEvent.user_id == current_user.id, AlertEvent.id > after_id)
+        .order_by(AlertEvent.id)
+        .limit(limit)
+        .all()
+    )
@@ -1,100 +1,205 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+from app.dashboard_summary import load_summary
 from app.db import get_db
 from app.dependencies import get_current_user
-from app.models import GradedItem, Holding, LatestPrice, PortfolioBreakdown, PortfolioSnapshot, User
+from app.models import Card, CardMover, Holding, PortfolioBreakdown, PortfolioPnl, PortfolioTotal, Set, User
+from app.movers import MOVER_PERIODS
+from app.pnl import PNL_SORTS, PNL_STATUSES, load_pnl_positions, refresh_pnl
+from app.portfolio import BREAKDOWN_TYPES, portfolio_series, take_snapshots
+from app.price_history import parse_range
+from app.set_completion import load_missing_cards, load_set_completion
 
 router = APIRouter()
 
 
 @router.get("/portfolio")
 def portfolio(range: str = "30d", db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    snapshots = (
-        db.query(PortfolioSnapshot)
-        .filter(PortfolioSnapshot.user_id == current_user.id)
-        .order_by(PortfolioSnapshot.ts.desc())
-        .limit(500)
-        .all()
+    try:
+        delta = parse_range(range)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    series = portfolio_series(db, current_user.id, delta)
+    return {"range": range, "bucket": series["bucket"], "data": series["points"]}
+
+
+@router.get("/portfolio/live")
+def portfolio_live(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    totals = db.get(PortfolioTotal, current_user.id)
+    if not totals:
+        return {"total": 0.0, "raw": 0.0, "graded": 0.0, "positions": 0, "updated_at": None}
+    return {
+        "total": totals.total_value,
+        "raw": totals.raw_value,
+        "graded": totals.graded_value,
+        "positions": totals.positions,
+        "updated_at": totals.updated_at,
+    }
+
+
+@router.get("/summary")
+def summary(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return load_summary(db, current_user.id)
+
+
+@router.get("/pnl")
+def pnl(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    cached = db.get(PortfolioPnl, current_user.id)
+    totals = db.get(PortfolioTotal, current_user.id)
+    if cached is None or (totals is not None and cached.computed_at < totals.updated_at) or cached.computed_at.date() < datetime.utcnow().date():
+        refresh_pnl(db, current_user.id)
+        db.commit()
+        db.expire_all()
+        cached = db.get(PortfolioPnl, current_user.id)
+    return {
+        "cost_basis": cached.cost_basis,
+        "market_value": cached.market_value,
+        "unrealized_gain": cached.unrealized_gain,
+        "unrealized_pct": cached.unrealized_gain / cached.cost_basis if cached.cost_basis else None,
+        "realized_gain": cached.realized_gain,
+        "proceeds": cached.proceeds,
+        "total_gain": cached.unrealized_gain + cached.realized_gain,
+        "annualized_return": cached.annualized_return,
+        "open_lots": cached.open_lots,
+        "closed_lots": cached.closed_lots,
+        "unpriced_lots": cached.unpriced_lots,
+        "computed_at": cached.computed_at,
+    }
+
+
+@router.get("/pnl/positions")
+def pnl_positions(
+    status: str = "all",
+    sort: str = "gain",
+    order: str = "desc",
+    min_gain: Optional[float] = None,
+    max_gain: Optional[float] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if status not in PNL_STATUSES or sort not in PNL_SORTS or order not in ("asc", "desc"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"status must be {'|'.join(PNL_STATUSES)}, sort {'|'.join(PNL_SORTS)}, order asc|desc",
+        )
+    rows = load_pnl_positions(
+        db,
+        current_user.id,
+        status=status,
+        sort=sort,
+        descending=order == "desc",
+        min_gain=min_gain,
+        max_gain=max_gain,
+        limit=page_size + 1,
+        offset=(page - 1) * page_size,
     )
-    return {"range": range, "data": [
-        {"ts": s.ts, "total": s.total_value, "raw": s.raw_value, "graded": s.graded_value}
-        for s in snapshots
-    ]}
+    return {
+        "status": status,
+        "sort": sort,
+        "order": order,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+        "data": rows[:page_size],
+    }
 
 
 @router.post("/portfolio/snapshot")
 def snapshot_portfolio(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    holdings = db.query(Holding).filter(Holding.user_id == current_user.id).all()
-    if not holdings:
+    snapshots = take_snapshots(db, user_ids=[current_user.id])
+    if not snapshots:
         return {"status": "no_holdings"}
-
-    card_ids = list({holding.card_id for holding in holdings})
-    graded_items = db.query(GradedItem).filter(GradedItem.user_id == current_user.id).all()
-    graded_by_card = {graded.card_id: graded for graded in graded_items}
-    graded_ids = [graded.id for graded in graded_items]
-
-    card_prices = db.query(LatestPrice).filter(
-        LatestPrice.entity_type == "card",
-        LatestPrice.entity_id.in_(card_ids),
-    ).all()
-    graded_prices = []
-    if graded_ids:
-        graded_prices = db.query(LatestPrice).filter(
-            LatestPrice.entity_type == "graded",
-            LatestPrice.entity_id.in_(graded_ids),
-        ).all()
-
-    def build_price_map(rows):
-        price_map = {}
-        for row in rows:
-            if row.market is None:
-                continue
-            current = price_map.get(row.entity_id)
-            if current is None or row.market > current:
-                price_map[row.entity_id] = row.market
-        return price_map
-
-    card_price_map = build_price_map(card_prices)
-    graded_price_map = build_price_map(graded_prices)
-
-    raw_value = 0.0
-    graded_value = 0.0
-    for holding in holdings:
-        qty = float(holding.quantity or 0)
-        graded = graded_by_card.get(holding.card_id)
-        if graded and graded_price_map.get(graded.id) is not None:
-            graded_value += graded_price_map[graded.id] * qty
-        else:
-            price = card_price_map.get(holding.card_id)
-            if price is not None:
-                raw_value += price * qty
-
-    total_value = raw_value + graded_value
-    snapshot = PortfolioSnapshot(
-        user_id=current_user.id,
-        total_value=total_value,
-        raw_value=raw_value,
-        graded_value=graded_value,
-    )
-    db.add(snapshot)
     db.commit()
-    db.refresh(snapshot)
-    return {"status": "ok", "snapshot": {"ts": snapshot.ts, "total": snapshot.total_value}}
+    snapshot = snapshots[0]
+    return {"status": "ok", "snapshot": {"ts": snapshot["ts"], "total": snapshot["total"]}}
 
 
 @router.get("/breakdown")
 def breakdown(type: str, range: str = "30d", db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    rows = (
-        db.query(PortfolioBreakdown)
-        .filter(PortfolioBreakdown.user_id == current_user.id, PortfolioBreakdown.breakdown_type == type)
-        .order_by(PortfolioBreakdown.ts.desc())
-        .limit(500)
-        .all()
+    if type not in BREAKDOWN_TYPES:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(BREAKDOWN_TYPES)}")
+    try:
+        delta = parse_range(range)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    query = db.query(PortfolioBreakdown).filter(
+        PortfolioBreakdown.user_id == current_user.id,
+        PortfolioBreakdown.breakdown_type == type,
     )
-    return {"range": range, "data": [{"key": r.key, "value": r.value, "ts": r.ts} for r in rows]}
+    if delta is not None:
+        query = query.filter(PortfolioBreakdown.ts >= datetime.utcnow() - delta)
+    rows = query.order_by(PortfolioBreakdown.ts.desc()).limit(500).all()
+    return {"range": range, "type": type, "data": [{"ts": r.ts, "values": r.values_json} for r in rows]}
+
+
+@router.get("/sets/completion")
+def set_completion(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return {"data": load_set_completion(db, current_user.id)}
+
+
+@router.get("/sets/{set_id}/missing")
+def set_missing(set_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return {"set_id": set_id, "data": load_missing_cards(db, current_user.id, set_id)}
 
 
 @router.get("/top-movers")
-def top_movers(range: str = "7d"):
-    return {"range": range, "data": []}
+def top_movers(
+    range: str = "7d",
+    direction: str = "up",
+    sort: str = "pct",
+    scope: str = "all",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if range not in MOVER_PERIODS:
+        raise HTTPException(status_code=400, detail=f"range must be one of: {', '.join(MOVER_PERIODS)}")
+    if direction not in ("up", "down") or sort not in ("pct", "abs") or scope not in ("all", "holdings"):
+        raise HTTPException(status_code=400, detail="direction must be up|down, sort pct|abs, scope all|holdings")
+    column = CardMover.change_pct if sort == "pct" else CardMover.change_abs
+    query = (
+        db.query(CardMover, Card, Set)
+        .join(Card, CardMover.card_id == Card.id)
+        .join(Set, Card.set_id == Set.id)
+        .filter(CardMover.period == range, column.isnot(None))
+    )
+    if scope == "holdings":
+        owned = db.query(Holding.card_id).filter(Holding.user_id == current_user.id)
+        query = query.filter(CardMover.card_id.in_(owned))
+    if direction == "up":
+        query = query.filter(column > 0).order_by(column.desc(), CardMover.card_id)
+    else:
+        query = query.filter(column < 0).order_by(column.asc(), CardMover.card_id)
+    rows = query.offset((page - 1) * page_size).limit(page_size + 1).all()
+    return {
+        "range": range,
+        "direction": direction,
+        "sort": sort,
+        "scope": scope,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+        "computed_at": rows[0][0].computed_at if rows else None,
+        "data": [
+            {
+                "rank": (page - 1) * page_size + index + 1,
+                "card_id": card.id,
+                "name": card.name,
+                "number": card.number,
+                "set_code": set_row.code,
+                "set_name": set_row.name,
+                "price": mover.price,
+                "previous_price": mover.previous_price,
+                "change_abs": mover.change_abs,
+                "change_pct": mover.change_pct,
+            }
+            for index, (mover, card, set_row) in enumerate(rows[:page_size])
+        ],
+    }
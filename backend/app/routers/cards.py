@@ -3,15 +3,16 @@ import os
 import time
 import urllib.error
 import urllib.request
-from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.dependencies import get_current_user
-from app.models import Card, CardImage, LatestPrice, PriceHistory, PriceSource, Set
+from app.models import Card, CardImage, LatestPrice, PriceSource, Set
+from app.price_history import downsample_price_history, load_price_history
+from app.pricing import record_price
 from app.schemas import CardOut, SetOut
 
 router = APIRouter()
@@ -56,7 +57,7 @@ def card_detail(card_id: int, db: Session = Depends(get_db), current_user=Depend
         LatestPrice.entity_type == "card",
         LatestPrice.entity_id == card_id,
     ).all()
-    history = db.query(PriceHistory).filter(PriceHistory.entity_type == "card", PriceHistory.entity_id == card_id).order_by(PriceHistory.ts.desc()).limit(200).all()
+    history = load_price_history(db, "card", card_id)
     return {
         "card": CardOut.model_validate(card),
         "images": [{"kind": img.kind, "local_path": img.local_path} for img in images],
@@ -69,7 +70,30 @@ def card_detail(card_id: int, db: Session = Depends(get_db), current_user=Depend
             }
             for price, source in latest
         ],
-        "price_history": [{"ts": h.ts, "market": h.market} for h in history],
+        "price_history": history,
+    }
+
+
+@router.get("/cards/{card_id}/history")
+def card_history(
+    card_id: int,
+    range: str = "all",
+    max_points: int = Query(300, ge=2, le=2000),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    card = db.query(Card.id).filter(Card.id == card_id).first()
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+    try:
+        series = downsample_price_history(db, "card", card_id, range, max_points)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "range": range,
+        "max_points": max_points,
+        "bucket_seconds": series["bucket_seconds"],
+        "price_history": series["points"],
     }
 
 
@@ -173,32 +197,23 @@ def card_prices(payload: dict, db: Session = Depends(get_db), current_user=Depen
             tcgplayer = pricing.get("tcgplayer") or {}
             variant = pick_variant(tcgplayer)
             if variant:
-                updated_at = datetime.utcnow()
-                latest = LatestPrice(
-                    entity_type="card",
-                    entity_id=card.id,
-                    source_id=tcgdex_source.id,
+                record_price(
+                    db,
+                    {},
+                    "card",
+                    card.id,
+                    tcgdex_source.id,
+                    {
+                        "market": variant.get("marketPrice"),
+                        "low": variant.get("lowPrice"),
+                        "mid": variant.get("midPrice"),
+                        "high": variant.get("highPrice"),
+                    },
                     currency=str(tcgplayer.get("unit") or "USD"),
-                    market=variant.get("marketPrice"),
-                    low=variant.get("lowPrice"),
-                    mid=variant.get("midPrice"),
-                    high=variant.get("highPrice"),
-                    updated_at=updated_at,
                 )
-                db.add(latest)
-                db.add(PriceHistory(
-                    entity_type="card",
-                    entity_id=card.id,
-                    source_id=tcgdex_source.id,
-                    ts=updated_at,
-                    market=latest.market,
-                    low=latest.low,
-                    mid=latest.mid,
-                    high=latest.high,
-                ))
                 latest_map[card.id] = {
                     "card_id": card.id,
-                    "market": latest.market,
+                    "market": variant.get("marketPrice"),
                     "source": tcgdex_source.name,
                     "source_type": tcgdex_source.type,
                 }
@@ -234,32 +249,22 @@ def card_prices(payload: dict, db: Session = Depends(get_db), current_user=Depen
         if not price_entries:
             continue
         entry = price_entries[0]
-        updated_at = datetime.utcnow()
-        latest = LatestPrice(
-            entity_type="card",
-            entity_id=card.id,
-            source_id=tcgcsv_source.id,
-            currency="USD",
-            market=entry.get("marketPrice"),
-            low=entry.get("lowPrice"),
-            mid=entry.get("midPrice"),
-            high=entry.get("highPrice"),
-            updated_at=updated_at,
+        record_price(
+            db,
+            {},
+            "card",
+            card.id,
+            tcgcsv_source.id,
+            {
+                "market": entry.get("marketPrice"),
+                "low": entry.get("lowPrice"),
+                "mid": entry.get("midPrice"),
+                "high": entry.get("highPrice"),
+            },
         )
-        db.add(latest)
-        db.add(PriceHistory(
-            entity_type="card",
-            entity_id=card.id,
-            source_id=tcgcsv_source.id,
-            ts=updated_at,
-            market=latest.market,
-            low=latest.low,
-            mid=latest.mid,
-            high=latest.high,
-        ))
         latest_map[card.id] = {
             "card_id": card.id,
-            "market": latest.market,
+            "market": entry.get("marketPrice"),
             "source": tcgcsv_source.name,
             "source_type": tcgcsv_source.type,
         }
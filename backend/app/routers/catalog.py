@@ -0,0 +1,99 @@
+import os
+import re
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.catalog_bundle import bundle_root, load_manifest
+from app.dependencies import get_current_user
+
+router = APIRouter()
+
+BUNDLE_MEDIA_TYPE = "application/vnd.sqlite3"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_byte_range(value: str, size: int) -> tuple[int, int]:
+    # Single ranges only ("bytes=0-99", "bytes=100-", "bytes=-100"); raises ValueError otherwise.
+    match = RANGE_RE.match(value.strip())
+    if not match or match.groups() == ("", ""):
+        raise ValueError("Unsupported range")
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = handle.read(min(chunk_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def bundle_file_response(request: Request, path: str, sha256: str, media_type: str) -> Response:
+    # ETag is the content hash, so conditional requests and resumed downloads
+    # (If-Range) stay valid across rebuilds of identical content.
+    etag = f'"{sha256}"'
+    size = os.path.getsize(path)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"',
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            start, end = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(iter_file_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/bundle")
+def bundle_manifest(current_user=Depends(get_current_user)):
+    manifest = load_manifest(bundle_root())
+    if manifest["latest"] is None:
+        raise HTTPException(status_code=404, detail="No catalog bundle has been built yet")
+    return {
+        "latest": manifest["latest"],
+        "versions": [
+            {**entry, "url": f"/api/catalog/bundle/{entry['version']}"} for entry in manifest["versions"]
+        ],
+        "patches": [
+            {**entry, "url": f"/api/catalog/bundle/patches/{entry['from']}/{entry['to']}"} for entry in manifest["patches"]
+        ],
+    }
+
+
+@router.get("/bundle/{version}")
+def bundle_download(version: int, request: Request, current_user=Depends(get_current_user)):
+    root = bundle_root()
+    entry = next((item for item in load_manifest(root)["versions"] if item["version"] == version), None)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Bundle version not found")
+    return bundle_file_response(request, os.path.join(root, entry["file"]), entry["sha256"], BUNDLE_MEDIA_TYPE)
+
+
+@router.get("/bundle/patches/{from_version}/{to_version}")
+def bundle_patch(from_version: int, to_version: int, request: Request, current_user=Depends(get_current_user)):
+    root = bundle_root()
+    patches = load_manifest(root)["patches"]
+    entry = next((item for item in patches if item["from"] == from_version and item["to"] == to_version), None)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Bundle patch not found")
+    return bundle_file_response(request, os.path.join(root, entry["file"]), entry["sha256"], "application/octet-stream")
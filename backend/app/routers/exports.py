@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.collection_export import EXPORT_FORMATS, EXPORT_KINDS, stream_export
+from app.db import SessionLocal
+from app.dependencies import get_current_user
+from app.models import User
+
+router = APIRouter()
+
+
+@router.get("/{kind}")
+def export_collection(
+    kind: str,
+    format: str = Query("csv"),
+    gzip: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+):
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Export must be one of: {', '.join(EXPORT_KINDS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_export(SessionLocal, current_user.id, kind, format, gzip=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
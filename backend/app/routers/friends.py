@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.dependencies import get_current_user
+from app.friend_collections import COMPARE_DIRECTIONS, collection_permission, hide_private_fields, load_collection_diff
+from app.holdings_listing import HOLDING_SORTS, load_holdings_page
 from app.models import Friendship, SharedCollection, User
 from app.schemas import FriendshipAccept, FriendshipInvite
+from app.trade_matching import match_trades
 
 router = APIRouter()
 
@@ -42,14 +47,40 @@ def accept(payload: FriendshipAccept, db: Session = Depends(get_db), current_use
     return {"status": "accepted"}
 
 
+@router.get("/trades")
+def trade_matches(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return {"matches": match_trades(db, current_user.id)}
+
+
 @router.get("/collections/{user_id}")
-def view_collection(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def view_collection(
+    user_id: int,
+    compare: Optional[str] = Query(None),
+    sort: str = Query("value"),
+    q: Optional[str] = None,
+    set_id: Optional[int] = None,
+    page_size: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     if user_id == current_user.id:
-        return {"user_id": user_id, "permission": "owner"}
-    shared = db.query(SharedCollection).filter(
-        SharedCollection.owner_user_id == user_id,
-        SharedCollection.viewer_user_id == current_user.id,
-    ).first()
-    if not shared:
-        raise HTTPException(status_code=403, detail="No access")
-    return {"user_id": user_id, "permission": shared.permission}
+        permission = "owner"
+    else:
+        permission = collection_permission(db, user_id, current_user.id)
+        if not permission:
+            raise HTTPException(status_code=403, detail="No access")
+    if compare is not None and compare not in COMPARE_DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"compare must be one of: {', '.join(COMPARE_DIRECTIONS)}")
+    if sort not in HOLDING_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(HOLDING_SORTS)}")
+    try:
+        if compare:
+            page = load_collection_diff(db, user_id, current_user.id, compare, page_size, cursor=cursor)
+        else:
+            page = load_holdings_page(db, user_id, page_size, sort=sort, q=q, set_id=set_id, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if permission != "owner" and not compare:
+        page["data"] = [hide_private_fields(item) for item in page["data"]]
+    return {"user_id": user_id, "permission": permission, "compare": compare, **page}
@@ -5,26 +5,45 @@ import urllib.error
 import re
 import urllib.parse
 import urllib.request
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.dependencies import get_current_user
-from app.models import Card, ExternalId, GradedItem, LatestPrice, PriceHistory, PriceSource, Set, TagDetail, User
+from app.graded_listing import GRADED_SORTS, load_graded_page
+from app.models import Card, ExternalId, GradedItem, LatestPrice, PriceSource, Set, TagDetail, User
+from app.portfolio import mark_position_changed
+from app.price_history import downsample_price_history
+from app.pricing import history_heartbeat_enabled, load_latest_prices, record_price
+from app.sales_stats import DEFAULT_ESTIMATOR, ESTIMATORS, estimate_sales_price
 from app.schemas import GradedCreate, GradedOut
+from app.set_completion import mark_completion_changed
+from app.sync import mark_sync_changed
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn.error")
 
 
+def validate_price_estimator(value: Optional[str]) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if value not in ESTIMATORS:
+        raise HTTPException(status_code=400, detail=f"Unsupported price_estimator. Use one of: {', '.join(ESTIMATORS)}")
+    return value
+
+
 @router.post("", response_model=GradedOut)
 def create_graded(payload: GradedCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     graded = GradedItem(user_id=current_user.id, **payload.model_dump())
+    graded.price_estimator = validate_price_estimator(payload.price_estimator)
     db.add(graded)
+    mark_position_changed(db, current_user.id, [graded.card_id])
+    mark_completion_changed(db, current_user.id, [graded.card_id])
+    mark_sync_changed(db, current_user.id, "graded", [graded])
     db.commit()
     db.refresh(graded)
     return graded
@@ -36,6 +55,28 @@ def list_graded(db: Session = Depends(get_db), current_user: User = Depends(get_
     return [GradedOut.model_validate(row) for row in rows]
 
 
+@router.get("/listing")
+def graded_listing(
+    q: Optional[str] = None,
+    set_id: Optional[int] = None,
+    grader: Optional[str] = None,
+    grade: Optional[str] = None,
+    sort: str = "recent",
+    cursor: Optional[str] = None,
+    page_size: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if sort not in GRADED_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(GRADED_SORTS)}")
+    options = {"sort": sort, "q": q, "set_id": set_id, "grader": grader, "grade": grade}
+    try:
+        page = load_graded_page(db, current_user.id, page_size, cursor=cursor, **options)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"sort": sort, "page_size": page_size, **page}
+
+
 @router.post("/upsert")
 def upsert_graded(payload: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     card_id = payload.get("card_id")
@@ -43,6 +84,7 @@ def upsert_graded(payload: dict, db: Session = Depends(get_db), current_user: Us
     grade = payload.get("grade")
     if not card_id or not grader or not grade:
         raise HTTPException(status_code=400, detail="card_id, grader, and grade are required")
+    price_estimator = validate_price_estimator(payload.get("price_estimator"))
     graded = db.query(GradedItem).filter(
         GradedItem.user_id == current_user.id,
         GradedItem.card_id == card_id,
@@ -58,6 +100,11 @@ def upsert_graded(payload: dict, db: Session = Depends(get_db), current_user: Us
             grade=str(grade),
         )
         db.add(graded)
+    if price_estimator:
+        graded.price_estimator = price_estimator
+    mark_position_changed(db, current_user.id, [graded.card_id])
+    mark_completion_changed(db, current_user.id, [graded.card_id])
+    mark_sync_changed(db, current_user.id, "graded", [graded])
     db.commit()
     db.refresh(graded)
     return GradedOut.model_validate(graded)
@@ -224,44 +271,7 @@ def compute_sales_average(sales: object, mode: str, max_days: int) -> Optional[f
         return None
     if not isinstance(sales, list):
         return None
-    now = datetime.utcnow()
-    entries = []
-    for entry in sales:
-        if not isinstance(entry, dict):
-            continue
-        price = entry.get("price") or entry.get("salePrice") or entry.get("amount")
-        ts = entry.get("date") or entry.get("soldAt") or entry.get("timestamp")
-        if price is None or ts is None:
-            continue
-        try:
-            price_value = float(price)
-        except (TypeError, ValueError):
-            continue
-        sale_time = None
-        if isinstance(ts, (int, float)):
-            try:
-                sale_time = datetime.utcfromtimestamp(ts)
-            except Exception:
-                sale_time = None
-        elif isinstance(ts, str):
-            try:
-                sale_time = datetime.fromisoformat(ts.replace("Z", "+00:00")).replace(tzinfo=None)
-            except ValueError:
-                sale_time = None
-        if sale_time is None:
-            continue
-        entries.append({"price": price_value, "ts": sale_time})
-    if not entries:
-        return None
-    entries.sort(key=lambda row: row["ts"], reverse=True)
-    if mode == "last3":
-        entries = entries[:3]
-    else:
-        cutoff = now - timedelta(days=max_days)
-        entries = [row for row in entries if row["ts"] >= cutoff]
-    if not entries:
-        return None
-    return sum(row["price"] for row in entries) / len(entries)
+    return estimate_sales_price(sales, mode, max_days)
 
 
 def ensure_price_source(db: Session, source_type: str, name: str):
@@ -318,6 +328,8 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
             payload.get("grade"),
         )
 
+    price_estimator = validate_price_estimator(payload.get("price_estimator"))
+
     card = db.query(Card).filter(Card.id == card_id).first()
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
@@ -340,6 +352,11 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
             grade=str(grade),
         )
         db.add(graded)
+    if price_estimator:
+        graded.price_estimator = price_estimator
+    mark_position_changed(db, current_user.id, [graded.card_id])
+    mark_completion_changed(db, current_user.id, [graded.card_id])
+    mark_sync_changed(db, current_user.id, "graded", [graded])
     db.commit()
     db.refresh(graded)
 
@@ -403,24 +420,15 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
                             "source_type": source.type,
                             "cached": True,
                         }
-                updated_at = datetime.utcnow()
-                latest = existing or LatestPrice(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
+                record_price(
+                    db,
+                    {graded.id: existing} if existing else {},
+                    "graded",
+                    graded.id,
+                    source.id,
+                    {"market": market_value},
+                    heartbeat=history_heartbeat_enabled(),
                 )
-                if existing is None:
-                    db.add(latest)
-                latest.currency = "USD"
-                latest.market = market_value
-                latest.updated_at = updated_at
-                db.add(PriceHistory(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
-                    ts=updated_at,
-                    market=market_value,
-                ))
                 db.commit()
                 return {
                     "graded_id": graded.id,
@@ -435,34 +443,21 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
         if sales_by_grade:
             grade_key = normalize_grade_key(grader, grade)
             sales = sales_by_grade.get(grade_key) or []
-            mode = os.environ.get("GRADED_SALES_MODE", "last3")
+            mode = graded.price_estimator or os.environ.get("GRADED_SALES_MODE", DEFAULT_ESTIMATOR)
             max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
             average = compute_sales_average(sales, mode, max_days)
             if average is not None:
                 source = ensure_price_source(db, "pokemonpricetracker_ebay", "PokemonPriceTracker (eBay)")
-                updated_at = datetime.utcnow()
-                latest = db.query(LatestPrice).filter(
-                    LatestPrice.entity_type == "graded",
-                    LatestPrice.entity_id == graded.id,
-                    LatestPrice.source_id == source.id,
-                ).first()
-                if not latest:
-                    latest = LatestPrice(
-                        entity_type="graded",
-                        entity_id=graded.id,
-                        source_id=source.id,
-                    )
-                    db.add(latest)
-                latest.currency = "USD"
-                latest.market = average
-                latest.updated_at = updated_at
-                db.add(PriceHistory(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
-                    ts=updated_at,
-                    market=average,
-                ))
+                latest_map = load_latest_prices(db, "graded", [graded.id], source.id)
+                record_price(
+                    db,
+                    latest_map,
+                    "graded",
+                    graded.id,
+                    source.id,
+                    {"market": average},
+                    heartbeat=history_heartbeat_enabled(),
+                )
                 db.commit()
                 return {
                     "graded_id": graded.id,
@@ -493,34 +488,21 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
             if sales_by_grade:
                 grade_key = normalize_grade_key(grader, grade)
                 sales = sales_by_grade.get(grade_key) or []
-                mode = os.environ.get("GRADED_SALES_MODE", "last3")
+                mode = graded.price_estimator or os.environ.get("GRADED_SALES_MODE", DEFAULT_ESTIMATOR)
                 max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
                 average = compute_sales_average(sales, mode, max_days)
                 if average is not None:
                     source = ensure_price_source(db, "pokemonpricetracker_ebay", "PokemonPriceTracker (eBay)")
-                    updated_at = datetime.utcnow()
-                    latest = db.query(LatestPrice).filter(
-                        LatestPrice.entity_type == "graded",
-                        LatestPrice.entity_id == graded.id,
-                        LatestPrice.source_id == source.id,
-                    ).first()
-                    if not latest:
-                        latest = LatestPrice(
-                            entity_type="graded",
-                            entity_id=graded.id,
-                            source_id=source.id,
-                        )
-                        db.add(latest)
-                    latest.currency = "USD"
-                    latest.market = average
-                    latest.updated_at = updated_at
-                    db.add(PriceHistory(
-                        entity_type="graded",
-                        entity_id=graded.id,
-                        source_id=source.id,
-                        ts=updated_at,
-                        market=average,
-                    ))
+                    latest_map = load_latest_prices(db, "graded", [graded.id], source.id)
+                    record_price(
+                        db,
+                        latest_map,
+                        "graded",
+                        graded.id,
+                        source.id,
+                        {"market": average},
+                        heartbeat=history_heartbeat_enabled(),
+                    )
                     db.commit()
                     return {
                         "graded_id": graded.id,
@@ -647,34 +629,21 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
         if sales_by_grade:
             grade_key = normalize_grade_key(grader, grade)
             sales = sales_by_grade.get(grade_key) or []
-            mode = os.environ.get("GRADED_SALES_MODE", "last3")
+            mode = graded.price_estimator or os.environ.get("GRADED_SALES_MODE", DEFAULT_ESTIMATOR)
             max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
             average = compute_sales_average(sales, mode, max_days)
             if average is not None:
                 source = ensure_price_source(db, "pokemonpricetracker_ebay", "PokemonPriceTracker (eBay)")
-                updated_at = datetime.utcnow()
-                latest = db.query(LatestPrice).filter(
-                    LatestPrice.entity_type == "graded",
-                    LatestPrice.entity_id == graded.id,
-                    LatestPrice.source_id == source.id,
-                ).first()
-                if not latest:
-                    latest = LatestPrice(
-                        entity_type="graded",
-                        entity_id=graded.id,
-                        source_id=source.id,
-                    )
-                    db.add(latest)
-                latest.currency = "USD"
-                latest.market = average
-                latest.updated_at = updated_at
-                db.add(PriceHistory(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
-                    ts=updated_at,
-                    market=average,
-                ))
+                latest_map = load_latest_prices(db, "graded", [graded.id], source.id)
+                record_price(
+                    db,
+                    latest_map,
+                    "graded",
+                    graded.id,
+                    source.id,
+                    {"market": average},
+                    heartbeat=history_heartbeat_enabled(),
+                )
                 db.commit()
                 return {
                     "graded_id": graded.id,
@@ -711,35 +680,22 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
         if sales_by_grade:
             grade_key = normalize_grade_key(grader, grade)
             sales = sales_by_grade.get(grade_key) or []
-            mode = os.environ.get("GRADED_SALES_MODE", "last3")
+            mode = graded.price_estimator or os.environ.get("GRADED_SALES_MODE", DEFAULT_ESTIMATOR)
             max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
             average = compute_sales_average(sales, mode, max_days)
             if average is not None:
                 market_value = average
                 source = ensure_price_source(db, "pokemonpricetracker_ebay", "PokemonPriceTracker (eBay)")
-                updated_at = datetime.utcnow()
-                latest = db.query(LatestPrice).filter(
-                    LatestPrice.entity_type == "graded",
-                    LatestPrice.entity_id == graded.id,
-                    LatestPrice.source_id == source.id,
-                ).first()
-                if not latest:
-                    latest = LatestPrice(
-                        entity_type="graded",
-                        entity_id=graded.id,
-                        source_id=source.id,
-                    )
-                    db.add(latest)
-                latest.currency = "USD"
-                latest.market = market_value
-                latest.updated_at = updated_at
-                db.add(PriceHistory(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
-                    ts=updated_at,
-                    market=market_value,
-                ))
+                latest_map = load_latest_prices(db, "graded", [graded.id], source.id)
+                record_price(
+                    db,
+                    latest_map,
+                    "graded",
+                    graded.id,
+                    source.id,
+                    {"market": market_value},
+                    heartbeat=history_heartbeat_enabled(),
+                )
                 db.commit()
                 return {
                     "graded_id": graded.id,
@@ -779,24 +735,15 @@ def fetch_graded_price(payload: dict, db: Session = Depends(get_db), current_use
                 "source_type": source.type,
                 "cached": True,
             }
-    updated_at = datetime.utcnow()
-    latest = existing or LatestPrice(
-        entity_type="graded",
-        entity_id=graded.id,
-        source_id=source.id,
+    record_price(
+        db,
+        {graded.id: existing} if existing else {},
+        "graded",
+        graded.id,
+        source.id,
+        {"market": market_value},
+        heartbeat=history_heartbeat_enabled(),
     )
-    if existing is None:
-        db.add(latest)
-    latest.currency = "USD"
-    latest.market = market_value
-    latest.updated_at = updated_at
-    db.add(PriceHistory(
-        entity_type="graded",
-        entity_id=graded.id,
-        source_id=source.id,
-        ts=updated_at,
-        market=market_value,
-    ))
     db.commit()
     return {
         "graded_id": graded.id,
@@ -811,8 +758,14 @@ def update_graded(graded_id: int, payload: GradedCreate, db: Session = Depends(g
     graded = db.query(GradedItem).filter(GradedItem.id == graded_id, GradedItem.user_id == current_user.id).first()
     if not graded:
         raise HTTPException(status_code=404, detail="Graded item not found")
+    price_estimator = validate_price_estimator(payload.price_estimator)
+    previous_card_id = graded.card_id
     for key, value in payload.model_dump().items():
         setattr(graded, key, value)
+    graded.price_estimator = price_estimator
+    mark_position_changed(db, current_user.id, [previous_card_id, graded.card_id])
+    mark_completion_changed(db, current_user.id, [previous_card_id, graded.card_id])
+    mark_sync_changed(db, current_user.id, "graded", [graded.id])
     db.commit()
     db.refresh(graded)
     return graded
@@ -831,18 +784,24 @@ def graded_detail(graded_id: int, db: Session = Depends(get_db), current_user: U
 
 
 @router.get("/{graded_id}/history")
-def graded_history(graded_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def graded_history(
+    graded_id: int,
+    range: str = "all",
+    max_points: int = Query(300, ge=2, le=2000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     graded = db.query(GradedItem).filter(GradedItem.id == graded_id, GradedItem.user_id == current_user.id).first()
     if not graded:
         raise HTTPException(status_code=404, detail="Graded item not found")
-    history = (
-        db.query(PriceHistory)
-        .filter(PriceHistory.entity_type == "graded", PriceHistory.entity_id == graded_id)
-        .order_by(PriceHistory.ts.desc())
-        .limit(200)
-        .all()
-    )
+    try:
+        series = downsample_price_history(db, "graded", graded_id, range, max_points)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     return {
         "graded": GradedOut.model_validate(graded),
-        "price_history": [{"ts": h.ts, "market": h.market} for h in history],
+        "range": range,
+        "max_points": max_points,
+        "bucket_seconds": series["bucket_seconds"],
+        "price_history": series["points"],
     }
@@ -1,11 +1,20 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.dependencies import get_current_user
+from app.holdings_batch import MAX_BATCH_OPERATIONS, apply_holding_batch
+from app.holdings_listing import HOLDING_SORTS, load_holdings_page, stream_holdings
 from app.models import Card, Holding, Set, User
-from app.schemas import HoldingCreate, HoldingOut, HoldingUpdate
+from app.portfolio import mark_position_changed
+from app.schemas import HoldingBatchRequest, HoldingCreate, HoldingOut, HoldingUpdate
+from app.set_completion import mark_completion_changed
+from app.sync import mark_sync_changed
 
 router = APIRouter()
 
@@ -14,11 +23,28 @@ router = APIRouter()
 def create_holding(payload: HoldingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     holding = Holding(user_id=current_user.id, **payload.model_dump())
     db.add(holding)
+    mark_position_changed(db, current_user.id, [holding.card_id])
+    mark_completion_changed(db, current_user.id, [holding.card_id])
+    mark_sync_changed(db, current_user.id, "holding", [holding])
     db.commit()
     db.refresh(holding)
     return holding
 
 
+@router.post("/batch")
+def batch_holdings(payload: HoldingBatchRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if len(payload.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+    try:
+        results = apply_holding_batch(db, current_user.id, payload.operations)
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Batch rejected: a referenced row does not exist") from exc
+    failed = sum(1 for item in results if item["status"] == "error")
+    return {"applied": len(results) - failed, "failed": failed, "results": results}
+
+
 @router.patch("/{holding_id}", response_model=HoldingOut)
 def update_holding(holding_id: int, payload: HoldingUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     holding = db.query(Holding).filter(Holding.id == holding_id, Holding.user_id == current_user.id).first()
@@ -27,6 +53,9 @@ def update_holding(holding_id: int, payload: HoldingUpdate, db: Session = Depend
     for key, value in payload.model_dump(exclude_unset=True).items():
         setattr(holding, key, value)
     holding.updated_at = datetime.utcnow()
+    mark_position_changed(db, current_user.id, [holding.card_id])
+    mark_completion_changed(db, current_user.id, [holding.card_id])
+    mark_sync_changed(db, current_user.id, "holding", [holding.id])
     db.commit()
     db.refresh(holding)
     return holding
@@ -38,10 +67,49 @@ def delete_holding(holding_id: int, db: Session = Depends(get_db), current_user:
     if not holding:
         raise HTTPException(status_code=404, detail="Holding not found")
     db.delete(holding)
+    mark_position_changed(db, current_user.id, [holding.card_id])
+    mark_completion_changed(db, current_user.id, [holding.card_id])
+    mark_sync_changed(db, current_user.id, "holding", [holding.id], deleted=True)
     db.commit()
     return {"status": "deleted"}
 
 
+@router.get("")
+def search_holdings(
+    q: Optional[str] = None,
+    set_id: Optional[int] = None,
+    condition: Optional[str] = None,
+    is_for_trade: Optional[bool] = None,
+    is_wantlist: Optional[bool] = None,
+    is_watched: Optional[bool] = None,
+    sort: str = "updated",
+    cursor: Optional[str] = None,
+    page_size: int = Query(100, ge=1, le=500),
+    format: str = "json",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if sort not in HOLDING_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(HOLDING_SORTS)}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    options = {
+        "sort": sort,
+        "q": q,
+        "set_id": set_id,
+        "condition": condition,
+        "flags": {"is_for_trade": is_for_trade, "is_wantlist": is_wantlist, "is_watched": is_watched},
+    }
+    if format == "ndjson":
+        # Full export: every matching holding, streamed without paging.
+        return StreamingResponse(stream_holdings(SessionLocal, current_user.id, **options), media_type="application/x-ndjson")
+    try:
+        page = load_holdings_page(db, current_user.id, page_size, cursor=cursor, **options)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"sort": sort, "page_size": page_size, **page}
+
+
 @router.get("/my")
 def list_holdings(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     rows = (
@@ -1,17 +1,92 @@
-from fastapi import APIRouter, Depends, File, UploadFile
+import os
+import shutil
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.card_matching import match_lines
+from app.csv_import import IMPORT_JOB_NAME, run_import_job, run_spooled_import, spool_path
+from app.db import SessionLocal, get_db
 from app.dependencies import get_current_user
+from app.holdings_batch import MAX_BATCH_OPERATIONS, apply_holding_batch
+from app.models import JobRun
+from app.schemas import HoldingBatchOperation, PasteCommitRequest, PasteImportRequest
 
 router = APIRouter()
 
+MAX_PASTE_LINES = 10000
+
+# Uploads above this size are spooled to disk and imported in the background.
+IMPORT_SYNC_MAX_BYTES = int(os.environ.get("IMPORT_SYNC_MAX_BYTES", str(2 * 1024 * 1024)))
+
+
+def serialize_import_run(run: JobRun) -> dict:
+    stats = dict(run.stats_json or {})
+    stats.pop("user_id", None)
+    return {
+        "job_id": run.id,
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "error": run.error_text,
+        **stats,
+    }
+
 
 @router.post("/csv")
-def import_csv(file: UploadFile = File(...), db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return {"status": "received", "filename": file.filename}
+def import_csv(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    run = JobRun(
+        job_name=IMPORT_JOB_NAME,
+        status="queued",
+        stats_json={"user_id": current_user.id, "filename": file.filename},
+    )
+    db.add(run)
+    db.commit()
+    if file.size is not None and file.size > IMPORT_SYNC_MAX_BYTES:
+        path = spool_path(run.id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            shutil.copyfileobj(file.file, handle)
+        background_tasks.add_task(run_spooled_import, SessionLocal, run.id, current_user.id)
+        return {"status": "queued", "job_id": run.id}
+    run_import_job(db, run, current_user.id, file.file)
+    if run.status == "failed":
+        raise HTTPException(status_code=400, detail=run.error_text)
+    return serialize_import_run(run)
+
+
+@router.get("/jobs/{job_id}")
+def import_job(job_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    run = db.query(JobRun).filter(JobRun.id == job_id, JobRun.job_name == IMPORT_JOB_NAME).first()
+    if not run or (run.stats_json or {}).get("user_id") != current_user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return serialize_import_run(run)
 
 
 @router.post("/paste")
-def import_paste(payload: dict, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return {"status": "received", "lines": len(payload.get("lines", []))}
+def import_paste(payload: PasteImportRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    lines = payload.lines + (payload.text.splitlines() if payload.text else [])
+    if len(lines) > MAX_PASTE_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PASTE_LINES} lines per paste")
+    return {"lines": match_lines(db, lines)}
+
+
+@router.post("/paste/commit")
+def import_paste_commit(payload: PasteCommitRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    if len(payload.items) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} items per commit")
+    operations = [HoldingBatchOperation(op="create", data=item) for item in payload.items]
+    try:
+        results = apply_holding_batch(db, current_user.id, operations)
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Import rejected: a referenced row does not exist") from exc
+    failed = sum(1 for item in results if item["status"] == "error")
+    return {"imported": len(results) - failed, "failed": failed, "results": results}
@@ -10,6 +10,7 @@ from app.config import settings
 from app.db import get_db
 from app.dependencies import get_current_user
 from app.models import User, UserPhoto
+from app.sync import mark_sync_changed
 
 router = APIRouter()
 
@@ -48,5 +49,6 @@ def upload_photo(
         created_at=datetime.utcnow(),
     )
     db.add(photo)
+    mark_sync_changed(db, current_user.id, "photo", [photo])
     db.commit()
     return {"status": "uploaded", "photo_id": photo.id}
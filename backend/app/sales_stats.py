@@ -0,0 +1,154 @@
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+ESTIMATORS = (
+    "last3",
+    "window_mean",
+    "window_median",
+    "trimmed_mean",
+    "ewma",
+    "filtered_mean",
+)
+DEFAULT_ESTIMATOR = "last3"
+
+LAST_N = 3
+TRIM_FRACTION = 0.1
+EWMA_HALFLIFE_DAYS = 7.0
+OUTLIER_MAD_K = 3.0
+
+
+def normalize_estimator(value: Optional[str]) -> str:
+    if value in ESTIMATORS:
+        return value
+    # Any unknown GRADED_SALES_MODE used to mean "windowed mean".
+    return "window_mean" if value else DEFAULT_ESTIMATOR
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def _parse_price(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sorted_median(ordered: np.ndarray) -> float:
+    middle = ordered.size // 2
+    if ordered.size % 2:
+        return float(ordered[middle])
+    return float(ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def _parse_timestamps(raw_stamps: list) -> np.ndarray:
+    if all(isinstance(value, str) for value in raw_stamps):
+        try:
+            with warnings.catch_warnings():
+                # NumPy converts "Z"/"+hh:mm" suffixes to UTC but warns about it.
+                warnings.simplefilter("ignore")
+                return np.array(raw_stamps, dtype="datetime64[ms]").astype(np.int64) / 1000.0
+        except ValueError:
+            pass
+    elif all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in raw_stamps):
+        return np.asarray(raw_stamps, dtype=np.float64)
+    parsed = [_parse_timestamp(value) for value in raw_stamps]
+    return np.array([np.nan if value is None else value for value in parsed], dtype=np.float64)
+
+
+def parse_sales(sales: list) -> tuple[np.ndarray, np.ndarray]:
+    pairs = [
+        (
+            entry.get("price") or entry.get("salePrice") or entry.get("amount"),
+            entry.get("date") or entry.get("soldAt") or entry.get("timestamp"),
+        )
+        for entry in sales
+        if isinstance(entry, dict)
+    ]
+    pairs = [pair for pair in pairs if pair[0] is not None and pair[1] is not None]
+    if not pairs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    raw_prices, raw_stamps = zip(*pairs)
+
+    try:
+        prices = np.asarray(raw_prices, dtype=np.float64)
+    except (TypeError, ValueError):
+        prices = np.array([_parse_price(value) for value in raw_prices], dtype=np.float64)
+    stamps = _parse_timestamps(list(raw_stamps))
+
+    valid = ~(np.isnan(stamps) | np.isnan(prices))
+    if not valid.all():
+        stamps = stamps[valid]
+        prices = prices[valid]
+    stamps = stamps.astype(np.int64)
+    order = np.argsort(-stamps, kind="stable")
+    return stamps[order], prices[order]
+
+
+def compute_estimates(
+    stamps: np.ndarray,
+    prices: np.ndarray,
+    max_days: int = 30,
+    now: Optional[float] = None,
+    last_n: int = LAST_N,
+    trim: float = TRIM_FRACTION,
+    halflife_days: float = EWMA_HALFLIFE_DAYS,
+    outlier_k: float = OUTLIER_MAD_K,
+) -> dict:
+    estimates = {name: None for name in ESTIMATORS}
+    if prices.size == 0:
+        return estimates
+    now = time.time() if now is None else now
+
+    head = prices[:last_n]
+    estimates["last3"] = float(head.sum()) / head.size
+
+    age_seconds = now - stamps
+    halflife_seconds = max(halflife_days, 1e-6) * 86400.0
+    weights = np.exp2(-np.clip(age_seconds, 0, None) / halflife_seconds)
+    weight_total = float(weights.sum())
+    if weight_total > 0:
+        estimates["ewma"] = float(weights @ prices) / weight_total
+
+    window = prices[age_seconds <= max_days * 86400]
+    if window.size == 0:
+        return estimates
+    estimates["window_mean"] = float(window.sum()) / window.size
+
+    ordered = np.sort(window)
+    median = _sorted_median(ordered)
+    estimates["window_median"] = median
+
+    cut = int(ordered.size * trim)
+    trimmed = ordered[cut:ordered.size - cut] if cut else ordered
+    estimates["trimmed_mean"] = float(trimmed.sum()) / trimmed.size if trimmed.size else median
+
+    deviation = np.abs(ordered - median)
+    mad = _sorted_median(np.sort(deviation)) * 1.4826
+    kept = ordered[deviation <= outlier_k * mad] if mad > 0 else ordered
+    estimates["filtered_mean"] = float(kept.sum()) / kept.size if kept.size else median
+    return estimates
+
+
+def estimate_sales_price(sales: list, estimator: Optional[str], max_days: int) -> Optional[float]:
+    stamps, prices = parse_sales(sales)
+    if prices.size == 0:
+        return None
+    return compute_estimates(stamps, prices, max_days=max_days)[normalize_estimator(estimator)]
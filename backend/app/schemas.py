@@ -119,6 +119,7 @@ class GradedCreate(BaseModel):
     grader: str
     grade: str
     cert_number: Optional[str] = None
+    price_estimator: Optional[str] = None
     notes: Optional[str] = None
     purchase_price: Optional[float] = None
     purchase_date: Optional[date] = None
@@ -128,12 +129,32 @@ class GradedCreate(BaseModel):
     storage_location_id: Optional[int] = None
 
 
+class HoldingBatchOperation(BaseModel):
+    op: str
+    id: Optional[int] = None
+    data: dict = {}
+
+
+class HoldingBatchRequest(BaseModel):
+    operations: List[HoldingBatchOperation]
+
+
+class PasteImportRequest(BaseModel):
+    lines: List[str] = []
+    text: Optional[str] = None
+
+
+class PasteCommitRequest(BaseModel):
+    items: List[dict]
+
+
 class GradedOut(BaseModel):
     id: int
     card_id: int
     grader: str
     grade: str
     cert_number: Optional[str]
+    price_estimator: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -149,6 +170,47 @@ class PhotoOut(BaseModel):
         from_attributes = True
 
 
+class AlertCreate(BaseModel):
+    entity_type: str = "card"
+    entity_id: int
+    threshold: float
+    direction: str = "above"
+
+
+class AlertUpdate(BaseModel):
+    threshold: Optional[float] = None
+    direction: Optional[str] = None
+    enabled: Optional[bool] = None
+
+
+class AlertOut(BaseModel):
+    id: int
+    type: str
+    entity_type: str
+    entity_id: int
+    threshold: Optional[float]
+    direction: Optional[str]
+    enabled: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AlertEventOut(BaseModel):
+    id: int
+    alert_id: int
+    entity_type: str
+    entity_id: int
+    threshold: float
+    direction: str
+    price: float
+    triggered_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class AnalyticsResponse(BaseModel):
     range: str
     data: list
@@ -0,0 +1,36 @@
+import os
+import time
+
+from sqlalchemy import create_engine
+
+from app.config import settings
+from app.portfolio_backfill import backfill_days, backfill_window, first_snapshot_offsets, write_snapshots
+
+
+def main():
+    days = int(os.environ.get("BACKFILL_DAYS", "365"))
+    chunk_size = int(os.environ.get("BACKFILL_CHUNK", "200000"))
+    work_mem = os.environ.get("BACKFILL_WORK_MEM", "256MB")
+    dry_run = os.environ.get("BACKFILL_DRY_RUN") == "1"
+    start, end = backfill_window(days)
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        result = backfill_days(conn, start, end, chunk_size, work_mem)
+        computed = time.perf_counter() - started
+        print(f"Valued {result['user_ids'].size} users x {result['days'].size} days ({start} to {end}) in {computed:.1f}s")
+
+        cutoffs = first_snapshot_offsets(conn, result["user_ids"], start, result["days"].size)
+        started = time.perf_counter()
+        written = write_snapshots(conn, result, cutoffs)
+        if dry_run:
+            conn.rollback()
+            print(f"Dry run: {written} snapshots would be written.")
+            return
+        conn.commit()
+        print(f"Wrote {written} backfilled snapshots in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
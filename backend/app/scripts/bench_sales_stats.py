@@ -0,0 +1,108 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.routers.graded import compute_sales_average
+from app.sales_stats import ESTIMATORS, compute_estimates, parse_sales
+
+
+def legacy_sales_average(sales: list, mode: str, max_days: int):
+    # Pre-NumPy implementation of compute_sales_average, kept as the baseline.
+    now = datetime.utcnow()
+    entries = []
+    for entry in sales:
+        if not isinstance(entry, dict):
+            continue
+        price = entry.get("price") or entry.get("salePrice") or entry.get("amount")
+        ts = entry.get("date") or entry.get("soldAt") or entry.get("timestamp")
+        if price is None or ts is None:
+            continue
+        try:
+            price_value = float(price)
+        except (TypeError, ValueError):
+            continue
+        sale_time = None
+        if isinstance(ts, (int, float)):
+            try:
+                sale_time = datetime.utcfromtimestamp(ts)
+            except Exception:
+                sale_time = None
+        elif isinstance(ts, str):
+            try:
+                sale_time = datetime.fromisoformat(ts.replace("Z", "+00:00")).replace(tzinfo=None)
+            except ValueError:
+                sale_time = None
+        if sale_time is None:
+            continue
+        entries.append({"price": price_value, "ts": sale_time})
+    if not entries:
+        return None
+    entries.sort(key=lambda row: row["ts"], reverse=True)
+    if mode == "last3":
+        entries = entries[:3]
+    else:
+        cutoff = now - timedelta(days=max_days)
+        entries = [row for row in entries if row["ts"] >= cutoff]
+    if not entries:
+        return None
+    return sum(row["price"] for row in entries) / len(entries)
+
+
+def build_sales(count: int, rng: random.Random) -> list:
+    now = datetime.utcnow()
+    sales = []
+    for _ in range(count):
+        sold_at = now - timedelta(days=rng.uniform(0, 120), seconds=rng.randint(0, 86400))
+        sales.append({
+            "price": round(rng.lognormvariate(4.5, 0.4), 2),
+            "date": sold_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        })
+    return sales
+
+
+def timed(label: str, fn, datasets: list, repeat: int):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for sales in datasets:
+            fn(sales)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40} {best * 1000:9.1f} ms  ({best / len(datasets) * 1e6:7.1f} us/item)")
+    return best
+
+
+def main():
+    items = int(os.environ.get("BENCH_ITEMS", "2000"))
+    sales_per_item = int(os.environ.get("BENCH_SALES", "60"))
+    repeat = int(os.environ.get("BENCH_REPEAT", "3"))
+    max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
+    rng = random.Random(42)
+    datasets = [build_sales(sales_per_item, rng) for _ in range(items)]
+    print(f"Benchmarking {items} graded items x {sales_per_item} sales (best of {repeat})")
+
+    legacy_last3 = timed("legacy last3", lambda s: legacy_sales_average(s, "last3", max_days), datasets, repeat)
+    timed("legacy window mean", lambda s: legacy_sales_average(s, "window", max_days), datasets, repeat)
+    current = timed("compute_sales_average last3", lambda s: compute_sales_average(s, "last3", max_days), datasets, repeat)
+    all_estimators = timed(
+        f"parse_sales + all {len(ESTIMATORS)} estimators",
+        lambda s: compute_estimates(*parse_sales(s), max_days=max_days),
+        datasets,
+        repeat,
+    )
+    print(f"Speedup last3: {legacy_last3 / current:.2f}x; all estimators vs legacy last3: {legacy_last3 / all_estimators:.2f}x")
+
+    mismatches = 0
+    for sales in datasets:
+        expected = legacy_sales_average(sales, "last3", max_days)
+        actual = compute_sales_average(sales, "last3", max_days)
+        if expected is None or actual is None:
+            mismatches += int(expected != actual)
+        elif abs(expected - actual) > 1e-6:
+            mismatches += 1
+    print(f"last3 mismatches vs legacy: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models import GradedItem, Holding, LatestPrice
+from app.portfolio import take_snapshots
+
+BENCH_SCHEMA = "bench_snapshot"
+BENCH_TABLES = ("holdings", "graded_items", "latest_prices", "portfolio_snapshots")
+
+
+def legacy_snapshot_value(db, user_id: int):
+    # Per-user ORM implementation from the old snapshot_portfolio script, kept as the baseline.
+    holdings = db.query(Holding).filter(Holding.user_id == user_id).all()
+    if not holdings:
+        return None
+    card_ids = list({holding.card_id for holding in holdings})
+    graded_items = db.query(GradedItem).filter(GradedItem.user_id == user_id).all()
+    graded_by_card = {graded.card_id: graded for graded in graded_items}
+    graded_ids = [graded.id for graded in graded_items]
+    card_prices = db.query(LatestPrice).filter(
+        LatestPrice.entity_type == "card",
+        LatestPrice.entity_id.in_(card_ids),
+    ).all()
+    graded_prices = []
+    if graded_ids:
+        graded_prices = db.query(LatestPrice).filter(
+            LatestPrice.entity_type == "graded",
+            LatestPrice.entity_id.in_(graded_ids),
+        ).all()
+
+    def build_price_map(rows):
+        price_map = {}
+        for row in rows:
+            if row.market is None:
+                continue
+            current = price_map.get(row.entity_id)
+            if current is None or row.market > current:
+                price_map[row.entity_id] = row.market
+        return price_map
+
+    card_price_map = build_price_map(card_prices)
+    graded_price_map = build_price_map(graded_prices)
+    raw_value = 0.0
+    graded_value = 0.0
+    for holding in holdings:
+        qty = float(holding.quantity or 0)
+        graded = graded_by_card.get(holding.card_id)
+        if graded and graded_price_map.get(graded.id) is not None:
+            graded_value += graded_price_map[graded.id] * qty
+        else:
+            price = card_price_map.get(holding.card_id)
+            if price is not None:
+                raw_value += price * qty
+    return raw_value, graded_value
+
+
+def build_fixture(conn, users: int, holdings_per_user: int, cards: int, graded_pct: float):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    for table in BENCH_TABLES:
+        conn.execute(text(f"CREATE TABLE {BENCH_SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)"))
+    conn.execute(text(f"SET search_path TO {BENCH_SCHEMA}, public"))
+    conn.execute(text(
+        """
+        INSERT INTO holdings (user_id, card_id, quantity, condition, is_for_trade, is_wantlist, is_watched, created_at, updated_at)
+        SELECT u, 1 + ((u::bigint * 7919 + h * 104729) % :cards), 1 + (h % 3), 'NM', false, false, false, now(), now()
+        FROM generate_series(1, :users) u, generate_series(1, :per_user) h
+        """
+    ), {"users": users, "per_user": holdings_per_user, "cards": cards})
+    conn.execute(text(
+        """
+        INSERT INTO graded_items (user_id, card_id, grader, grade, created_at)
+        SELECT user_id, card_id, 'PSA', '10', now() FROM holdings WHERE random() < :pct
+        """
+    ), {"pct": graded_pct})
+    # Two sources per card (the snapshot keeps the higher one), ~10% unpriced.
+    conn.execute(text(
+        """
+        INSERT INTO latest_prices (entity_type, entity_id, source_id, currency, market, updated_at)
+        SELECT 'card', c, s, 'USD', round((random() * 50)::numeric, 2), now()
+        FROM generate_series(1, :cards) c, generate_series(1, 2) s
+        WHERE c % 10 <> 0
+        """
+    ), {"cards": cards})
+    conn.execute(text(
+        """
+        INSERT INTO latest_prices (entity_type, entity_id, source_id, currency, market, updated_at)
+        SELECT 'graded', id, 1, 'USD', round((random() * 500)::numeric, 2), now() FROM graded_items
+        """
+    ))
+    for table in BENCH_TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def main():
+    users = int(os.environ.get("BENCH_USERS", "10000"))
+    holdings_per_user = int(os.environ.get("BENCH_HOLDINGS", "1000"))
+    cards = int(os.environ.get("BENCH_CARDS", "20000"))
+    graded_pct = float(os.environ.get("BENCH_GRADED_PCT", "0.02"))
+    legacy_users = int(os.environ.get("BENCH_LEGACY_USERS", "50"))
+    engine = create_engine(settings.database_url)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        started = time.perf_counter()
+        build_fixture(db.connection(), users, holdings_per_user, cards, graded_pct)
+        db.commit()
+        print(f"Fixture: {users} users x {holdings_per_user} holdings in schema {BENCH_SCHEMA} ({time.perf_counter() - started:.1f}s)")
+        db.execute(text(f"SET search_path TO {BENCH_SCHEMA}, public"))
+
+        started = time.perf_counter()
+        snapshots = take_snapshots(db, ts=datetime.utcnow())
+        set_based = time.perf_counter() - started
+        db.rollback()
+        db.execute(text(f"SET search_path TO {BENCH_SCHEMA}, public"))
+        print(f"Set-based snapshot: {len(snapshots)} users in {set_based:.2f}s")
+
+        sample = [snapshot for snapshot in snapshots[:legacy_users]]
+        started = time.perf_counter()
+        mismatches = 0
+        for snapshot in sample:
+            raw_value, graded_value = legacy_snapshot_value(db, snapshot["user_id"])
+            if abs(raw_value - snapshot["raw"]) > 1e-6 or abs(graded_value - snapshot["graded"]) > 1e-6:
+                mismatches += 1
+            db.expunge_all()
+        legacy = time.perf_counter() - started
+        if sample:
+            projected = legacy / len(sample) * users
+            print(f"Legacy per-user loop: {len(sample)} users in {legacy:.2f}s, projected {projected:.1f}s for {users} users ({projected / set_based:.1f}x slower)")
+        print(f"Mismatches vs legacy: {mismatches}")
+    finally:
+        db.rollback()
+        db.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
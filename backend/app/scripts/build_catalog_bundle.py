@@ -0,0 +1,22 @@
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.catalog_bundle import run_catalog_bundle_job
+from app.config import settings
+
+
+def main():
+    engine = create_engine(settings.database_url)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        run = run_catalog_bundle_job(db, full=os.environ.get("CATALOG_BUNDLE_FULL", "0") == "1")
+        print(f"catalog_bundle {run.status}: {run.stats_json or run.error_text}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+
+from app.config import settings
+from app.portfolio import compact_snapshots
+
+
+def main():
+    retention_days = int(os.environ.get("PORTFOLIO_SNAPSHOT_RETENTION_DAYS", "90"))
+    if retention_days <= 0:
+        print("Retention disabled (PORTFOLIO_SNAPSHOT_RETENTION_DAYS<=0); keeping all snapshots.")
+        return
+    cutoff = date.today() - timedelta(days=retention_days)
+    engine = create_engine(settings.database_url)
+    with engine.begin() as conn:
+        removed = compact_snapshots(conn, cutoff)
+    print(f"Compacted snapshots before {cutoff} to daily rows | removed {removed['snapshots']} snapshots, {removed['breakdowns']} breakdowns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+
+# Sources whose rows carry the upstream "updated" timestamp (record_price gets
+# it as observed_at); a repeated value under a new timestamp is kept for them,
+# like at ingestion. Other sources stamp rows with the write time.
+TIMESTAMPED_SOURCES = ["tcgdex_tcgplayer"]
+
+DELETE_DUPLICATES_SQL = """
+WITH ordered AS (
+    SELECT
+        ph.id,
+        ph.ts,
+        ph.market,
+        ph.low,
+        ph.mid,
+        ph.high,
+        LAG(ph.ts) OVER w AS prev_ts,
+        LAG(ph.market) OVER w AS prev_market,
+        LAG(ph.low) OVER w AS prev_low,
+        LAG(ph.mid) OVER w AS prev_mid,
+        LAG(ph.high) OVER w AS prev_high,
+        ps.type = ANY(:timestamped_sources) AS timestamped
+    FROM price_history ph
+    JOIN price_sources ps ON ps.id = ph.source_id
+    WHERE ph.entity_id BETWEEN :first_id AND :last_id
+    WINDOW w AS (PARTITION BY ph.entity_type, ph.entity_id, ph.source_id ORDER BY ph.ts, ph.id)
+)
+DELETE FROM price_history p
+USING ordered o
+WHERE p.id = o.id
+  AND o.prev_ts IS NOT NULL
+  AND o.market IS NOT DISTINCT FROM o.prev_market
+  AND o.low IS NOT DISTINCT FROM o.prev_low
+  AND o.mid IS NOT DISTINCT FROM o.prev_mid
+  AND o.high IS NOT DISTINCT FROM o.prev_high
+  AND (NOT o.timestamped OR o.ts = o.prev_ts)
+  {heartbeat_clause}
+"""
+
+
+def table_stats(conn) -> dict:
+    row = conn.execute(text(
+        "SELECT COUNT(*), pg_total_relation_size('price_history') FROM price_history"
+    )).first()
+    return {"rows": int(row[0]), "bytes": int(row[1])}
+
+
+def sample_entities(conn, limit: int) -> list[tuple[str, int]]:
+    rows = conn.execute(text(
+        "SELECT entity_type, entity_id FROM price_history "
+        "GROUP BY entity_type, entity_id ORDER BY COUNT(*) DESC LIMIT :limit"
+    ), {"limit": limit}).all()
+    return [(row[0], row[1]) for row in rows]
+
+
+def history_latency_ms(conn, entities: list[tuple[str, int]]) -> float:
+    if not entities:
+        return 0.0
+    started = time.perf_counter()
+    for entity_type, entity_id in entities:
+        conn.execute(text(
+            "SELECT ts, market FROM price_history "
+            "WHERE entity_type = :entity_type AND entity_id = :entity_id "
+            "ORDER BY ts DESC LIMIT 200"
+        ), {"entity_type": entity_type, "entity_id": entity_id}).all()
+    return (time.perf_counter() - started) * 1000.0 / len(entities)
+
+
+def format_report(label: str, stats: dict, latency_ms: float) -> str:
+    return f"{label}: rows={stats['rows']} size={stats['bytes'] / (1024 * 1024):.1f} MB history_query={latency_ms:.2f} ms avg"
+
+
+def main():
+    heartbeat = os.environ.get("PRICE_HISTORY_HEARTBEAT", "0") == "1"
+    batch_size = int(os.environ.get("COMPACT_BATCH", "5000"))
+    samples = int(os.environ.get("COMPACT_SAMPLES", "25"))
+    dry_run = os.environ.get("COMPACT_DRY_RUN") == "1"
+    vacuum_full = os.environ.get("COMPACT_VACUUM_FULL") == "1"
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        entities = sample_entities(conn, samples)
+        before = table_stats(conn)
+        before_latency = history_latency_ms(conn, entities)
+        print(format_report("Before", before, before_latency))
+        bounds = conn.execute(text("SELECT MIN(entity_id), MAX(entity_id) FROM price_history")).first()
+
+    if bounds is None or bounds[0] is None:
+        print("price_history is empty.")
+        return
+
+    heartbeat_clause = "AND o.ts::date = o.prev_ts::date" if heartbeat else ""
+    statement = text(DELETE_DUPLICATES_SQL.format(heartbeat_clause=heartbeat_clause))
+    deleted = 0
+    first_id, max_id = int(bounds[0]), int(bounds[1])
+    while first_id <= max_id:
+        last_id = first_id + batch_size - 1
+        with engine.connect() as conn:
+            result = conn.execute(statement, {
+                "first_id": first_id,
+                "last_id": last_id,
+                "timestamped_sources": TIMESTAMPED_SOURCES,
+            })
+            deleted += result.rowcount or 0
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        print(f"Compacted entity ids {first_id}-{min(last_id, max_id)} | removed={deleted}")
+        first_id = last_id + 1
+
+    if dry_run:
+        print(f"Dry run: {deleted} duplicate rows would be removed.")
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Plain VACUUM only marks space reusable; FULL rewrites the table (exclusive lock).
+        conn.execute(text("VACUUM (FULL, ANALYZE) price_history" if vacuum_full else "VACUUM (ANALYZE) price_history"))
+
+    with engine.connect() as conn:
+        after = table_stats(conn)
+        after_latency = history_latency_ms(conn, entities)
+    print(format_report("After", after, after_latency))
+    print(f"Removed {deleted} duplicate rows ({before['rows'] - after['rows']} net)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.movers import run_movers_job
+
+
+def main():
+    engine = create_engine(settings.database_url)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        run = run_movers_job(db)
+        print(f"compute_movers {run.status}: {run.stats_json or run.error_text}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import time
+
+from sqlalchemy import create_engine
+
+from app.config import settings
+from app.parquet_export import EXPORT_TABLES, export_root, export_table, load_state
+
+
+def main():
+    root = export_root()
+    chunk_size = int(os.environ.get("EXPORT_CHUNK", "50000"))
+    tables = [name.strip() for name in os.environ.get("EXPORT_TABLES", ",".join(EXPORT_TABLES)).split(",") if name.strip()]
+    unknown = [name for name in tables if name not in EXPORT_TABLES]
+    if unknown:
+        raise SystemExit(f"Unknown export tables: {', '.join(unknown)}")
+    engine = create_engine(settings.database_url)
+    state = load_state(root)
+
+    for table in tables:
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            exported = export_table(conn, root, table, state, chunk_size)
+        months = len(state.get(table, {}).get("months", {}))
+        print(f"{table}: exported {exported} rows ({months} months tracked) in {time.perf_counter() - started:.1f}s -> {os.path.join(root, table)}")
+
+
+if __name__ == "__main__":
+    main()
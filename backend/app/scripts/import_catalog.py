@@ -7,8 +7,10 @@ from typing import Any, Dict, Iterable, List, Optional, Tuple
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.catalog_bundle import run_catalog_bundle_job
 from app.config import settings
 from app.models import Card, ExternalId, Set
+from app.set_completion import assign_set_positions, rebuild_completions
 
 
 def load_dataset(path: str):
@@ -208,7 +210,13 @@ def main():
                 external_id=external_id,
             ))
     db.commit()
-    print(f"Imported {len(sets)} sets and {len(cards)} cards (format={format_name})")
+    positioned = assign_set_positions(db)
+    rebuild_completions(db)
+    db.commit()
+    print(f"Imported {len(sets)} sets and {len(cards)} cards (format={format_name}); positioned {positioned} new cards")
+    if os.environ.get("CATALOG_BUNDLE_AFTER_IMPORT", "1") == "1":
+        run = run_catalog_bundle_job(db)
+        print(f"Catalog bundle {run.status}: {run.stats_json or run.error_text}")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
+import os
+from datetime import date, timedelta
+
 from sqlalchemy import create_engine
 
 from app.config import settings
 from app.db import Base
 from app import models
+from app.price_history import ensure_partitions
 
 
 def main():
     engine = create_engine(settings.database_url)
     Base.metadata.create_all(bind=engine)
+    months_ahead = int(os.environ.get("PRICE_HISTORY_MONTHS_AHEAD", "3"))
+    today = date.today()
+    with engine.begin() as conn:
+        ensure_partitions(conn, today, today + timedelta(days=31 * months_ahead))
     print("Database tables created")
 
 
@@ -0,0 +1,38 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.price_history import ensure_partitions, is_partitioned, list_partitions, retention_cutoff, rollup_daily
+
+
+def main():
+    retention_days = int(os.environ.get("PRICE_HISTORY_RETENTION_DAYS", "365"))
+    months_ahead = int(os.environ.get("PRICE_HISTORY_MONTHS_AHEAD", "3"))
+    engine = create_engine(settings.database_url)
+    today = date.today()
+
+    with engine.begin() as conn:
+        created = ensure_partitions(conn, today, today + timedelta(days=31 * months_ahead))
+    print(f"Created {len(created)} partitions ahead")
+
+    if retention_days <= 0:
+        print("Retention disabled (PRICE_HISTORY_RETENTION_DAYS<=0); keeping all raw rows.")
+        return
+
+    cutoff = retention_cutoff(retention_days, today)
+    with engine.begin() as conn:
+        rolled = rollup_daily(conn, cutoff)
+        dropped = []
+        if is_partitioned(conn):
+            for name, _, upper in list_partitions(conn):
+                if upper <= cutoff:
+                    conn.execute(text(f"DROP TABLE {name}"))
+                    dropped.append(name)
+        deleted = conn.execute(text("DELETE FROM price_history WHERE ts < :cutoff"), {"cutoff": cutoff}).rowcount
+    print(f"Rolled up {rolled} daily rows before {cutoff}; dropped {len(dropped)} partitions; deleted {deleted} raw rows")
+
+
+if __name__ == "__main__":
+    main()
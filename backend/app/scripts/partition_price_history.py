@@ -0,0 +1,49 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.models import PriceHistory
+from app.price_history import ensure_partitions, is_partitioned
+
+LEGACY_TABLE = "price_history_unpartitioned"
+COLUMNS = "id, entity_type, entity_id, source_id, ts, market, low, mid, high, volume"
+
+
+def main():
+    months_ahead = int(os.environ.get("PRICE_HISTORY_MONTHS_AHEAD", "3"))
+    keep_legacy = os.environ.get("KEEP_LEGACY_TABLE") == "1"
+    engine = create_engine(settings.database_url)
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            print("price_history is already partitioned.")
+            return
+        conn.execute(text(f"ALTER TABLE price_history RENAME TO {LEGACY_TABLE}"))
+        conn.execute(text(f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT price_history_pkey TO {LEGACY_TABLE}_pkey"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS price_history_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_price_history_entity_ts"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_price_history_ts_brin"))
+        PriceHistory.__table__.create(conn)
+
+        bounds = conn.execute(text(f"SELECT MIN(ts), MAX(ts) FROM {LEGACY_TABLE}")).first()
+        today = date.today()
+        first_day = bounds[0].date() if bounds[0] else today
+        last_day = max(bounds[1].date() if bounds[1] else today, today + timedelta(days=31 * months_ahead))
+        created = ensure_partitions(conn, first_day, last_day)
+        print(f"Created {len(created)} monthly partitions ({first_day:%Y-%m} to {last_day:%Y-%m})")
+
+        copied = conn.execute(text(
+            f"INSERT INTO price_history ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY_TABLE}"
+        )).rowcount
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('price_history', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM price_history"
+        ))
+        if not keep_legacy:
+            conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    print(f"Copied {copied} rows into partitioned price_history")
+
+
+if __name__ == "__main__":
+    main()
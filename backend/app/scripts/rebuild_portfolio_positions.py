@@ -0,0 +1,27 @@
+import os
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.portfolio import rebuild_positions
+
+
+def main():
+    user_id = os.environ.get("USER_ID")
+    engine = create_engine(settings.database_url)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        started = time.perf_counter()
+        rebuild_positions(db, [int(user_id)] if user_id else None)
+        db.commit()
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"Rebuilt portfolio positions for {scope} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.set_completion import assign_set_positions, rebuild_completions
+
+
+def main():
+    user_id = os.environ.get("USER_ID")
+    engine = create_engine(settings.database_url)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        started = time.perf_counter()
+        positioned = assign_set_positions(db)
+        rebuild_completions(db, [int(user_id)] if user_id else None)
+        db.commit()
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"Positioned {positioned} new cards; rebuilt set completion for {scope} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
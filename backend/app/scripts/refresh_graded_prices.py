@@ -1,13 +1,13 @@
 import os
 import time
 import urllib.parse
-from datetime import datetime
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
-from app.models import Card, GradedItem, LatestPrice, PriceHistory, Set
+from app.models import Card, GradedItem, Set
+from app.pricing import history_heartbeat_enabled, load_latest_prices, record_price
 from app.routers.graded import (
     compute_sales_average,
     extract_sales_by_grade,
@@ -17,6 +17,7 @@ from app.routers.graded import (
     normalize_number,
     ensure_price_source,
 )
+from app.sales_stats import DEFAULT_ESTIMATOR
 
 
 def main():
@@ -26,7 +27,7 @@ def main():
     base_url = os.environ.get("POKEMONPRICETRACKER_BASE_URL", "https://www.pokemonpricetracker.com")
     retries = int(os.environ.get("PRICE_RETRIES", "2"))
     backoff = float(os.environ.get("PRICE_BACKOFF", "1.2"))
-    mode = os.environ.get("GRADED_SALES_MODE", "last3")
+    mode = os.environ.get("GRADED_SALES_MODE", DEFAULT_ESTIMATOR)
     max_days = int(os.environ.get("GRADED_SALES_MAX_DAYS", "30"))
     limit = int(os.environ.get("GRADED_REFRESH_LIMIT", "0"))
     sleep_seconds = float(os.environ.get("GRADED_REFRESH_SLEEP", "0"))
@@ -53,7 +54,8 @@ def main():
             return
 
         source = ensure_price_source(db, "pokemonpricetracker_ebay", "PokemonPriceTracker (eBay)")
-        updated_at = datetime.utcnow()
+        latest_map = load_latest_prices(db, "graded", [graded.id for graded, _, _ in rows], source.id)
+        heartbeat = history_heartbeat_enabled()
 
         for graded, card, set_row in rows:
             resolved_set_name = (set_row.name or "").strip()
@@ -78,39 +80,23 @@ def main():
             sales_by_grade = extract_sales_by_grade(entry)
             grade_key = normalize_grade_key(graded.grader, graded.grade)
             sales = sales_by_grade.get(grade_key) or []
-            average = compute_sales_average(sales, mode, max_days)
+            average = compute_sales_average(sales, graded.price_estimator or mode, max_days)
             if average is None:
                 print(f"[skip] {card.name} {graded.grader} {graded.grade} no sales data")
                 continue
 
-            latest = (
-                db.query(LatestPrice)
-                .filter(
-                    LatestPrice.entity_type == "graded",
-                    LatestPrice.entity_id == graded.id,
-                    LatestPrice.source_id == source.id,
-                )
-                .first()
+            changed = record_price(
+                db,
+                latest_map,
+                "graded",
+                graded.id,
+                source.id,
+                {"market": average},
+                heartbeat=heartbeat,
             )
-            if not latest:
-                latest = LatestPrice(
-                    entity_type="graded",
-                    entity_id=graded.id,
-                    source_id=source.id,
-                )
-                db.add(latest)
-            latest.currency = "USD"
-            latest.market = average
-            latest.updated_at = updated_at
-            db.add(PriceHistory(
-                entity_type="graded",
-                entity_id=graded.id,
-                source_id=source.id,
-                ts=updated_at,
-                market=average,
-            ))
             db.commit()
-            print(f"[ok] {card.name} {graded.grader} {graded.grade} = {average:.2f}")
+            status = "ok" if changed else "unchanged"
+            print(f"[{status}] {card.name} {graded.grader} {graded.grade} = {average:.2f}")
             if sleep_seconds:
                 time.sleep(sleep_seconds)
     finally:
@@ -12,8 +12,12 @@ from sqlalchemy import create_engine
 from sqlalchemy import or_
 from sqlalchemy.orm import sessionmaker
 
+from app.catalog_bundle import run_catalog_bundle_job
 from app.config import settings
-from app.models import Holding, LatestPrice, PriceHistory, PriceSource, Set, Card
+from app.models import Holding, PriceSource, Set, Card
+from app.movers import run_movers_job
+from app.pricing import history_heartbeat_enabled, load_latest_prices, record_price
+from app.text import normalize_token
 
 
 def parse_updated(value: Any) -> Optional[datetime]:
@@ -73,10 +77,6 @@ def fetch_json(url: str, retries: int, backoff_seconds: float) -> tuple[Optional
     return None, last_error
 
 
-def normalize_token(value: str) -> str:
-    return "".join(ch for ch in value.lower().strip() if ch.isalnum())
-
-
 def parse_card_number(value: str) -> str:
     if not value:
         return ""
@@ -309,9 +309,13 @@ def main():
         print("No cards eligible for pricing.")
         return
 
+    heartbeat = history_heartbeat_enabled()
+    tcgdex_latest = load_latest_prices(db, "card", [task["card_id"] for task in tasks], tcgdex_source.id)
+
     log_every = max(1, total_tasks // 20)
     completed = 0
     updated_count = 0
+    history_count = 0
     skipped_count = 0
     error_count = 0
     missing_for_tcgcsv = []
@@ -340,35 +344,23 @@ def main():
                     skipped_count += 1
                     completed += 1
                 else:
-                    updated_at = parse_updated(tcgplayer.get("updated")) or datetime.utcnow()
-                    latest = db.query(LatestPrice).filter(
-                        LatestPrice.entity_type == "card",
-                        LatestPrice.entity_id == task["card_id"],
-                        LatestPrice.source_id == tcgdex_source.id,
-                    ).first()
-                    if not latest:
-                        latest = LatestPrice(
-                            entity_type="card",
-                            entity_id=task["card_id"],
-                            source_id=tcgdex_source.id,
-                        )
-                        db.add(latest)
-                    latest.currency = str(tcgplayer.get("unit") or "USD")
-                    latest.market = variant.get("marketPrice")
-                    latest.low = variant.get("lowPrice")
-                    latest.mid = variant.get("midPrice")
-                    latest.high = variant.get("highPrice")
-                    latest.updated_at = updated_at
-                    db.add(PriceHistory(
-                        entity_type="card",
-                        entity_id=task["card_id"],
-                        source_id=tcgdex_source.id,
-                        ts=updated_at,
-                        market=latest.market,
-                        low=latest.low,
-                        mid=latest.mid,
-                        high=latest.high,
-                    ))
+                    if record_price(
+                        db,
+                        tcgdex_latest,
+                        "card",
+                        task["card_id"],
+                        tcgdex_source.id,
+                        {
+                            "market": variant.get("marketPrice"),
+                            "low": variant.get("lowPrice"),
+                            "mid": variant.get("midPrice"),
+                            "high": variant.get("highPrice"),
+                        },
+                        observed_at=parse_updated(tcgplayer.get("updated")),
+                        currency=str(tcgplayer.get("unit") or "USD"),
+                        heartbeat=heartbeat,
+                    ):
+                        history_count += 1
                     updated_count += 1
                     completed += 1
             if payload is not None:
@@ -389,6 +381,7 @@ def main():
         groups = fetch_tcgcsv_groups(tcgcsv_base_url, retries, backoff)
         tcgcsv_set_map = load_optional_json(tcgcsv_set_map_path)
         tcgcsv_number_overrides = load_optional_json(tcgcsv_number_overrides_path)
+        tcgcsv_latest = load_latest_prices(db, "card", [task["card_id"] for task in missing_for_tcgcsv], tcgcsv_source.id)
         group_cache: dict[str, Optional[int]] = {}
         product_cache: dict[int, dict] = {}
         price_cache: dict[int, dict] = {}
@@ -510,35 +503,21 @@ def main():
                         if debug_samples and len(tcgcsv_debug_entries) < debug_samples:
                             tcgcsv_debug_entries.append({**task, "reason": "tcgcsv_price_missing"})
                     else:
-                        updated_at = datetime.utcnow()
-                        latest = db.query(LatestPrice).filter(
-                            LatestPrice.entity_type == "card",
-                            LatestPrice.entity_id == task["card_id"],
-                            LatestPrice.source_id == tcgcsv_source.id,
-                        ).first()
-                        if not latest:
-                            latest = LatestPrice(
-                                entity_type="card",
-                                entity_id=task["card_id"],
-                                source_id=tcgcsv_source.id,
-                            )
-                            db.add(latest)
-                        latest.currency = "USD"
-                        latest.market = variant.get("marketPrice")
-                        latest.low = variant.get("lowPrice")
-                        latest.mid = variant.get("midPrice")
-                        latest.high = variant.get("highPrice")
-                        latest.updated_at = updated_at
-                        db.add(PriceHistory(
-                            entity_type="card",
-                            entity_id=task["card_id"],
-                            source_id=tcgcsv_source.id,
-                            ts=updated_at,
-                            market=latest.market,
-                            low=latest.low,
-                            mid=latest.mid,
-                            high=latest.high,
-                        ))
+                        if record_price(
+                            db,
+                            tcgcsv_latest,
+                            "card",
+                            task["card_id"],
+                            tcgcsv_source.id,
+                            {
+                                "market": variant.get("marketPrice"),
+                                "low": variant.get("lowPrice"),
+                                "mid": variant.get("midPrice"),
+                                "high": variant.get("highPrice"),
+                            },
+                            heartbeat=heartbeat,
+                        ):
+                            history_count += 1
                         tcgcsv_updated += 1
                         tcgcsv_completed += 1
 
@@ -564,6 +543,13 @@ def main():
 
     db.commit()
     print(f"Updated {updated_count} prices from TCGdex, skipped {skipped_count}, errors {error_count}")
+    print(f"Appended {history_count} price history rows (unchanged prices skipped)")
+    if os.environ.get("MOVERS_AFTER_SEED", "1") == "1":
+        run = run_movers_job(db)
+        print(f"Top movers refresh {run.status}: {run.stats_json or run.error_text}")
+    if os.environ.get("CATALOG_BUNDLE_AFTER_SEED", "1") == "1":
+        run = run_catalog_bundle_job(db)
+        print(f"Catalog bundle {run.status}: {run.stats_json or run.error_text}")
     if debug_entries:
         print("Sample missing cards (for manual mapping):")
         for entry in debug_entries:
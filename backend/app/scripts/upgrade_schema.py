@@ -0,0 +1,62 @@
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+
+# Columns and indexes added to tables that already existed; init_db only
+# creates missing tables. Every step can be re-run.
+UPGRADE_STEPS = [
+    "ALTER TABLE graded_items ADD COLUMN IF NOT EXISTS price_estimator VARCHAR(20)",
+    "ALTER TABLE latest_prices ADD COLUMN IF NOT EXISTS history_at TIMESTAMP WITHOUT TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_graded_items_user_id ON graded_items (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_portfolio_breakdowns_user_type_ts ON portfolio_breakdowns (user_id, breakdown_type, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_portfolio_snapshots_user_ts ON portfolio_snapshots (user_id, ts)",
+    "ALTER TABLE cards ADD COLUMN IF NOT EXISTS set_position INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_cards_set_position ON cards (set_id, set_position)",
+    "CREATE INDEX IF NOT EXISTS ix_card_images_card_id ON card_images (card_id)",
+    "CREATE INDEX IF NOT EXISTS ix_holdings_user_card ON holdings (user_id, card_id)",
+    # The (user_id, card_id) index serves every user_id lookup.
+    "DROP INDEX IF EXISTS ix_holdings_user_id",
+]
+
+LEGACY_BREAKDOWNS_SQL = """
+SELECT 1 FROM information_schema.columns
+WHERE table_schema = current_schema() AND table_name = 'portfolio_breakdowns' AND column_name = 'key'
+"""
+
+# Older installs stored one portfolio_breakdowns row per key; fold them into
+# one values_json row per user, snapshot and type, then drop the old columns.
+FOLD_BREAKDOWNS_STEPS = [
+    "ALTER TABLE portfolio_breakdowns ADD COLUMN IF NOT EXISTS values_json JSON",
+    "ALTER TABLE portfolio_breakdowns ALTER COLUMN key DROP NOT NULL, ALTER COLUMN value DROP NOT NULL",
+    """
+    INSERT INTO portfolio_breakdowns (user_id, ts, breakdown_type, values_json)
+    SELECT user_id, ts, breakdown_type, json_object_agg(key, value)
+    FROM (
+        SELECT user_id, ts, breakdown_type, key, SUM(value) AS value
+        FROM portfolio_breakdowns
+        WHERE values_json IS NULL
+        GROUP BY user_id, ts, breakdown_type, key
+    ) legacy
+    GROUP BY user_id, ts, breakdown_type
+    """,
+    "DELETE FROM portfolio_breakdowns WHERE values_json IS NULL",
+    "ALTER TABLE portfolio_breakdowns DROP COLUMN key, DROP COLUMN value",
+    "ALTER TABLE portfolio_breakdowns ALTER COLUMN values_json SET NOT NULL",
+]
+
+
+def main():
+    engine = create_engine(settings.database_url)
+    with engine.begin() as conn:
+        for statement in UPGRADE_STEPS:
+            conn.execute(text(statement))
+        if conn.execute(text(LEGACY_BREAKDOWNS_SQL)).first():
+            for statement in FOLD_BREAKDOWNS_STEPS:
+                conn.execute(text(statement))
+            folded = conn.execute(text("SELECT COUNT(*) FROM portfolio_breakdowns")).scalar()
+            print(f"Folded portfolio breakdowns into {folded} values_json rows")
+    print(f"Applied {len(UPGRADE_STEPS)} schema upgrade steps")
+
+
+if __name__ == "__main__":
+    main()
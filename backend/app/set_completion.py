@@ -0,0 +1,205 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+PENDING_KEY = "set_completion_pending"
+
+# New cards are appended after the highest existing position of their set, so
+# stored bitmaps stay valid; a fresh set is ordered by card number.
+ASSIGN_POSITIONS_SQL = """
+WITH ranked AS (
+    SELECT
+        c.id,
+        COALESCE((SELECT MAX(p.set_position) FROM cards p WHERE p.set_id = c.set_id), -1)
+            + ROW_NUMBER() OVER (
+                PARTITION BY c.set_id
+                ORDER BY
+                    c.number !~ '^\\d+$',
+                    NULLIF(regexp_replace(c.number, '\\D', '', 'g'), '')::numeric NULLS LAST,
+                    c.number,
+                    c.id
+            ) AS position
+    FROM cards c
+    WHERE c.set_position IS NULL
+)
+UPDATE cards c
+SET set_position = r.position
+FROM ranked r
+WHERE c.id = r.id
+"""
+
+# Cards a user currently owns: unsold holdings that are not wantlist entries
+# and unsold graded items.
+# {users} narrows both branches so single-user refreshes use the user_id indexes.
+OWNED_CARDS = """
+SELECT user_id, card_id FROM holdings
+WHERE {users} quantity > 0 AND NOT is_wantlist AND sell_date IS NULL AND sell_price IS NULL
+UNION ALL
+SELECT user_id, card_id FROM graded_items
+WHERE {users} sell_date IS NULL AND sell_price IS NULL
+"""
+
+# Recomputes the given (user_id, set_id) pairs. The bitmap starts with every
+# bit of the set cleared, owned positions are OR-ed in and the result is
+# inverted, so only owned rows are aggregated.
+REFRESH_SQL = """
+WITH targets AS (
+    SELECT DISTINCT user_id, set_id FROM ({targets}) t
+),
+set_sizes AS (
+    SELECT set_id, COUNT(*) AS total_cards, MAX(set_position) + 1 AS bits
+    FROM cards
+    WHERE set_id IN (SELECT set_id FROM targets) AND set_position IS NOT NULL
+    GROUP BY set_id
+),
+owned AS (
+    SELECT DISTINCT o.user_id, c.set_id, c.set_position
+    FROM ({owned}) o
+    JOIN cards c ON c.id = o.card_id
+    JOIN targets t ON t.user_id = o.user_id AND t.set_id = c.set_id
+    WHERE c.set_position IS NOT NULL
+),
+counted AS (
+    SELECT
+        o.user_id,
+        o.set_id,
+        COUNT(*) AS owned_cards,
+        s.total_cards,
+        ~bit_or(set_bit(repeat('0', s.bits)::varbit, o.set_position, 1)) AS missing_bitmap
+    FROM owned o
+    JOIN set_sizes s ON s.set_id = o.set_id
+    GROUP BY o.user_id, o.set_id, s.total_cards
+),
+removed AS (
+    DELETE FROM set_completions sc
+    USING targets t
+    WHERE sc.user_id = t.user_id
+      AND sc.set_id = t.set_id
+      AND NOT EXISTS (SELECT 1 FROM counted c WHERE c.user_id = t.user_id AND c.set_id = t.set_id)
+)
+INSERT INTO set_completions (user_id, set_id, owned_cards, total_cards, missing_bitmap, updated_at)
+SELECT user_id, set_id, owned_cards, total_cards, missing_bitmap, :now
+FROM counted
+ON CONFLICT ON CONSTRAINT uq_set_completion DO UPDATE SET
+    owned_cards = EXCLUDED.owned_cards,
+    total_cards = EXCLUDED.total_cards,
+    missing_bitmap = EXCLUDED.missing_bitmap,
+    updated_at = EXCLUDED.updated_at
+"""
+
+CARD_TARGETS = """
+SELECT t.user_id, c.set_id
+FROM unnest(CAST(:user_ids AS integer[]), CAST(:card_ids AS integer[])) AS t (user_id, card_id)
+JOIN cards c ON c.id = t.card_id
+"""
+OWNER_TARGETS = "SELECT o.user_id, c.set_id FROM ({owned}) o JOIN cards c ON c.id = o.card_id"
+
+# Cards imported after the row was computed sit past the end of the bitmap and
+# count as missing, as does every card of a set without a row.
+MISSING_CARDS_SQL = """
+SELECT c.id, c.number, c.name, c.rarity, c.set_position
+FROM cards c
+LEFT JOIN set_completions sc ON sc.set_id = c.set_id AND sc.user_id = :user_id
+WHERE c.set_id = :set_id
+  AND c.set_position IS NOT NULL
+  AND (
+      sc.id IS NULL
+      OR c.set_position >= length(sc.missing_bitmap)
+      OR get_bit(sc.missing_bitmap, c.set_position) = 1
+  )
+ORDER BY c.set_position
+"""
+
+# Every set, started or not; totals come from the catalog so cards imported
+# after a row was computed count as missing here too.
+COMPLETION_SQL = """
+WITH set_sizes AS (
+    SELECT set_id, COUNT(*) AS total_cards
+    FROM cards
+    WHERE set_position IS NOT NULL
+    GROUP BY set_id
+)
+SELECT
+    st.id,
+    st.code,
+    st.name,
+    st.series,
+    COALESCE(sc.owned_cards, 0) AS owned,
+    COALESCE(ss.total_cards, 0) AS total
+FROM sets st
+LEFT JOIN set_sizes ss ON ss.set_id = st.id
+LEFT JOIN set_completions sc ON sc.set_id = st.id AND sc.user_id = :user_id
+"""
+
+
+def assign_set_positions(db) -> int:
+    return db.execute(text(ASSIGN_POSITIONS_SQL)).rowcount or 0
+
+
+def refresh_completions(db, targets: str, params: dict) -> None:
+    owned = OWNED_CARDS.format(users="user_id IN (SELECT user_id FROM targets) AND")
+    db.execute(text(REFRESH_SQL.format(targets=targets, owned=owned)), {**params, "now": datetime.utcnow()})
+
+
+def refresh_card_completions(db, pairs: Iterable[tuple[int, int]]) -> None:
+    pairs = sorted(set(pairs))
+    if pairs:
+        user_ids, card_ids = zip(*pairs)
+        refresh_completions(db, CARD_TARGETS, {"user_ids": list(user_ids), "card_ids": list(card_ids)})
+
+
+def rebuild_completions(db, user_ids: Optional[Iterable[int]] = None) -> None:
+    params = {}
+    scope = ""
+    if user_ids is not None:
+        params["user_ids"] = sorted(set(user_ids))
+        scope = "WHERE user_id = ANY(:user_ids)"
+    else:
+        # Typically runs right after a catalog import; stale statistics on
+        # cards turn the bulk join into nested loops.
+        db.execute(text("ANALYZE cards"))
+    db.execute(text(f"DELETE FROM set_completions {scope}"), params)
+    owned = OWNED_CARDS.format(users="user_id = ANY(:user_ids) AND" if user_ids is not None else "")
+    refresh_completions(db, OWNER_TARGETS.format(owned=owned), params)
+
+
+def mark_completion_changed(db: Session, user_id: int, card_ids: Iterable[int]) -> None:
+    db.info.setdefault(PENDING_KEY, set()).update((user_id, card_id) for card_id in card_ids if card_id is not None)
+
+
+@event.listens_for(Session, "before_commit")
+def apply_pending_completions(db: Session) -> None:
+    pending = db.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    db.flush()
+    refresh_card_completions(db, pending)
+
+
+def load_missing_cards(db, user_id: int, set_id: int) -> list[dict]:
+    rows = db.execute(text(MISSING_CARDS_SQL), {"user_id": user_id, "set_id": set_id}).all()
+    return [
+        {"card_id": row[0], "number": row[1], "name": row[2], "rarity": row[3], "position": row[4]}
+        for row in rows
+    ]
+
+
+def load_set_completion(db, user_id: int) -> list[dict]:
+    rows = db.execute(text(COMPLETION_SQL), {"user_id": user_id}).all()
+    data = [
+        {
+            "set_id": row.id,
+            "set_code": row.code,
+            "set_name": row.name,
+            "series": row.series,
+            "owned": row.owned,
+            "total": row.total,
+            "missing": row.total - row.owned,
+            "pct": row.owned / row.total if row.total else 0.0,
+        }
+        for row in rows
+    ]
+    data.sort(key=lambda item: (-item["pct"], item["set_code"]))
+    return data
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+PENDING_KEY = "sync_pending"
+SYNC_ENTITIES = {"holding": "holdings", "graded": "graded_items", "photo": "user_photos"}
+
+# Changes are stamped with the writing transaction id rather than a sequence
+# value: a sequence is handed out before commit, so a reader could pass a
+# later value while an earlier one is still uncommitted and skip it for good.
+RECORD_CHANGES_SQL = """
+INSERT INTO sync_changes (user_id, entity_type, entity_id, deleted, change_xid, changed_at)
+SELECT t.user_id, t.entity_type, t.entity_id, t.deleted, pg_current_xact_id()::text::bigint, :now
+FROM unnest(
+    CAST(:user_ids AS integer[]),
+    CAST(:entity_types AS text[]),
+    CAST(:entity_ids AS integer[]),
+    CAST(:deleted AS boolean[])
+) AS t (user_id, entity_type, entity_id, deleted)
+ON CONFLICT ON CONSTRAINT uq_sync_change DO UPDATE SET
+    user_id = EXCLUDED.user_id,
+    deleted = EXCLUDED.deleted,
+    change_xid = EXCLUDED.change_xid,
+    changed_at = EXCLUDED.changed_at
+"""
+
+# Every transaction below the snapshot's xmin has finished, so its changes are
+# visible to the queries that follow. Newer ones may be read twice, never lost.
+TOKEN_SQL = "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+CHANGES_SQL = """
+SELECT entity_type, entity_id, deleted
+FROM sync_changes
+WHERE user_id = :user_id AND change_xid >= :since
+"""
+
+ENTITY_ROWS_SQL = "SELECT * FROM {table} WHERE user_id = :user_id {changed} ORDER BY id"
+
+# Prices of the cards and graded items the user holds. A delta returns prices
+# that changed since the token plus the prices of items added or edited since
+# then, which the client may not have fetched yet.
+PRICES_SQL = """
+SELECT lp.id, lp.entity_type, lp.entity_id, lp.source_id, lp.currency,
+       lp.market, lp.low, lp.mid, lp.high, lp.updated_at
+FROM latest_prices lp
+WHERE (
+    lp.entity_type = 'card'
+    AND lp.entity_id IN (
+        SELECT card_id FROM holdings WHERE user_id = :user_id
+        UNION
+        SELECT card_id FROM graded_items WHERE user_id = :user_id
+    )
+    AND {cards_changed}
+) OR (
+    lp.entity_type = 'graded'
+    AND lp.entity_id IN (SELECT id FROM graded_items WHERE user_id = :user_id)
+    AND {graded_changed}
+)
+ORDER BY lp.id
+"""
+PRICE_CHANGED = """(
+    lp.entity_id = ANY(:{ids})
+    OR lp.entity_id IN (SELECT entity_id FROM sync_changes WHERE entity_type = '{entity_type}' AND change_xid >= :since)
+)"""
+
+
+def mark_sync_changed(db: Session, user_id: Optional[int], entity_type: str, entities: Iterable, deleted: bool = False) -> None:
+    # entities are ids or pending ORM instances; ids of new rows are read after the flush.
+    db.info.setdefault(PENDING_KEY, []).extend((user_id, entity_type, entity, deleted) for entity in entities)
+
+
+@event.listens_for(Session, "before_commit")
+def record_pending_changes(db: Session) -> None:
+    pending = db.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    db.flush()
+    changes = {}
+    for user_id, entity_type, entity, deleted in pending:
+        entity_id = getattr(entity, "id", entity)
+        if entity_id is not None:
+            changes[(entity_type, entity_id)] = (user_id, deleted)
+    if not changes:
+        return
+    keys = sorted(changes)
+    db.execute(
+        text(RECORD_CHANGES_SQL),
+        {
+            "user_ids": [changes[key][0] for key in keys],
+            "entity_types": [key[0] for key in keys],
+            "entity_ids": [key[1] for key in keys],
+            "deleted": [changes[key][1] for key in keys],
+            "now": datetime.utcnow(),
+        },
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_pending_changes(db: Session) -> None:
+    db.info.pop(PENDING_KEY, None)
+
+
+def parse_sync_token(token: str) -> int:
+    if not token.isdigit():
+        raise ValueError("Invalid sync token")
+    return int(token)
+
+
+def load_sync(db, user_id: int, since: Optional[int] = None) -> dict:
+    # since=None returns the full collection; otherwise only rows changed in
+    # transactions at or after the token, plus tombstones for deleted rows.
+    token = db.execute(text(TOKEN_SQL)).scalar()
+    params: dict = {"user_id": user_id, "since": since}
+    changed: dict[str, list[int]] = {entity_type: [] for entity_type in SYNC_ENTITIES}
+    deleted: dict[str, list[int]] = {entity_type: [] for entity_type in SYNC_ENTITIES}
+    if since is not None:
+        for entity_type, entity_id, is_deleted in db.execute(text(CHANGES_SQL), params):
+            if entity_type in SYNC_ENTITIES:
+                (deleted if is_deleted else changed)[entity_type].append(entity_id)
+    rows = {}
+    for entity_type, table in SYNC_ENTITIES.items():
+        if since is not None and not changed[entity_type]:
+            rows[entity_type] = []
+            continue
+        statement = ENTITY_ROWS_SQL.format(table=table, changed="AND id = ANY(:ids)" if since is not None else "")
+        result = db.execute(text(statement), {**params, "ids": changed[entity_type]})
+        rows[entity_type] = [dict(row._mapping) for row in result]
+    if since is None:
+        prices_sql = PRICES_SQL.format(cards_changed="TRUE", graded_changed="TRUE")
+    else:
+        prices_sql = PRICES_SQL.format(
+            cards_changed=PRICE_CHANGED.format(ids="card_ids", entity_type="card_price"),
+            graded_changed=PRICE_CHANGED.format(ids="graded_ids", entity_type="graded_price"),
+        )
+        card_ids = {row["card_id"] for row in rows["holding"] + rows["graded"]}
+        params.update({"card_ids": sorted(card_ids), "graded_ids": changed["graded"]})
+    prices = [dict(row._mapping) for row in db.execute(text(prices_sql), params)]
+    return {
+        "token": str(token),
+        "full": since is None,
+        "holdings": rows["holding"],
+        "graded": rows["graded"],
+        "photos": rows["photo"],
+        "prices": prices,
+        "deleted": {
+            "holdings": deleted["holding"],
+            "graded": deleted["graded"],
+            "photos": deleted["photo"],
+        },
+    }
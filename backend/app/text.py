@@ -0,0 +1,2 @@
+def normalize_token(value: str) -> str:
+    return "".join(ch for ch in value.lower().strip() if ch.isalnum())
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.sync import TOKEN_SQL
+
+# Per-user bitmaps of wanted and tradeable card ids (bit n = card id n), so a
+# match between two users is a single AND of Python ints.
+_index: dict = {"wants": {}, "offers": {}, "token": None, "loaded_at": 0.0}
+_lock = threading.Lock()
+
+# Wantlist entries count as wanted whatever their quantity; only unsold,
+# owned copies can be offered.
+FLAGGED_HOLDINGS_SQL = """
+SELECT user_id, card_id, is_wantlist
+FROM holdings
+WHERE {users}
+  (is_wantlist OR (is_for_trade AND quantity > 0 AND sell_date IS NULL AND sell_price IS NULL))
+"""
+
+CHANGED_USERS_SQL = """
+SELECT DISTINCT user_id FROM sync_changes
+WHERE entity_type = 'holding' AND change_xid >= :since AND user_id IS NOT NULL
+"""
+
+# Friends who share their collection with the user.
+TRADE_FRIENDS_SQL = """
+SELECT u.id, u.name
+FROM shared_collections sc
+JOIN users u ON u.id = sc.owner_user_id
+WHERE sc.viewer_user_id = :user_id
+"""
+
+MATCHED_CARDS_SQL = """
+SELECT c.id, c.name, c.number, st.code, st.name, lp.market
+FROM cards c
+JOIN sets st ON st.id = c.set_id
+LEFT JOIN LATERAL (
+    SELECT MAX(market) AS market FROM latest_prices WHERE entity_type = 'card' AND entity_id = c.id
+) lp ON TRUE
+WHERE c.id = ANY(:card_ids)
+"""
+
+
+def index_ttl() -> float:
+    return float(os.environ.get("TRADE_INDEX_TTL", "3600"))
+
+
+def load_bitmaps(db, user_ids=None) -> tuple[dict, dict]:
+    params = {}
+    users = ""
+    if user_ids is not None:
+        params["user_ids"] = list(user_ids)
+        users = "user_id = ANY(:user_ids) AND"
+    wants: dict[int, int] = {}
+    offers: dict[int, int] = {}
+    for user_id, card_id, is_wantlist in db.execute(text(FLAGGED_HOLDINGS_SQL.format(users=users)), params):
+        target = wants if is_wantlist else offers
+        target[user_id] = target.get(user_id, 0) | (1 << card_id)
+    return wants, offers
+
+
+def refresh_trade_index(db) -> None:
+    # Catches up from the sync change feed: only users whose holdings changed
+    # since the last refresh are reloaded, in this process or any other.
+    with _lock:
+        token = db.execute(text(TOKEN_SQL)).scalar()
+        if _index["token"] is None or time.monotonic() - _index["loaded_at"] > index_ttl():
+            _index["wants"], _index["offers"] = load_bitmaps(db)
+            _index["loaded_at"] = time.monotonic()
+        else:
+            changed = db.execute(text(CHANGED_USERS_SQL), {"since": _index["token"]}).scalars().all()
+            if changed:
+                wants, offers = load_bitmaps(db, changed)
+                for user_id in changed:
+                    for key, bitmaps in (("wants", wants), ("offers", offers)):
+                        if user_id in bitmaps:
+                            _index[key][user_id] = bitmaps[user_id]
+                        else:
+                            _index[key].pop(user_id, None)
+        _index["token"] = token
+
+
+def bitmap_ids(bits: int) -> list[int]:
+    ids = []
+    while bits:
+        lowest = bits & -bits
+        ids.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return ids
+
+
+def match_trades(db, user_id: int) -> list[dict]:
+    refresh_trade_index(db)
+    my_wants = _index["wants"].get(user_id, 0)
+    my_offers = _index["offers"].get(user_id, 0)
+    raw = []
+    for friend_id, friend_name in db.execute(text(TRADE_FRIENDS_SQL), {"user_id": user_id}):
+        they_have = bitmap_ids(my_wants & _index["offers"].get(friend_id, 0))
+        they_want = bitmap_ids(my_offers & _index["wants"].get(friend_id, 0))
+        if they_have or they_want:
+            raw.append((friend_id, friend_name, they_have, they_want))
+    card_ids = sorted({card_id for _, _, have, want in raw for card_id in have + want})
+    cards = {}
+    if card_ids:
+        for card_id, name, number, set_code, set_name, market in db.execute(text(MATCHED_CARDS_SQL), {"card_ids": card_ids}):
+            cards[card_id] = {
+                "card_id": card_id,
+                "name": name,
+                "number": number,
+                "set_code": set_code,
+                "set_name": set_name,
+                "market": market,
+            }
+
+    def ranked(ids: list[int]) -> list[dict]:
+        return sorted((cards[card_id] for card_id in ids if card_id in cards), key=lambda card: -(card["market"] or 0))
+
+    matches = []
+    for friend_id, friend_name, they_have, they_want in raw:
+        have_cards, want_cards = ranked(they_have), ranked(they_want)
+        have_value = sum(card["market"] or 0 for card in have_cards)
+        want_value = sum(card["market"] or 0 for card in want_cards)
+        matches.append(
+            {
+                "user_id": friend_id,
+                "name": friend_name,
+                "mutual": bool(have_cards and want_cards),
+                "they_have": have_cards,
+                "they_want": want_cards,
+                "they_have_value": round(have_value, 2),
+                "they_want_value": round(want_value, 2),
+            }
+        )
+    # Two-way matches first, then by the value that could change hands.
+    matches.sort(key=lambda item: (not item["mutual"], -(item["they_have_value"] + item["they_want_value"])))
+    return matches
@@ -13,6 +13,7 @@ type CardDetailModalProps = {
   imageUrl: string;
   details: DetailItem[];
   priceHistory: PricePoint[];
+  historyPath?: string;
   priceLabel: string;
   latestPrice?: number | null;
 };
@@ -25,6 +26,7 @@ const CardDetailModal = ({
   imageUrl,
   details,
   priceHistory,
+  historyPath,
   priceLabel,
   latestPrice,
 }: CardDetailModalProps) => {
@@ -66,7 +68,7 @@ const CardDetailModal = ({
               <div className="flex items-center justify-between text-sm text-white/60">
                 <span>{priceLabel}</span>
               </div>
-              <PriceHistoryChart data={priceHistory} label={priceLabel} />
+              <PriceHistoryChart data={priceHistory} label={priceLabel} historyPath={historyPath} />
             </div>
           </div>
         </div>
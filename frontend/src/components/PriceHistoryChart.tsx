@@ -1,5 +1,6 @@
 import { useEffect, useMemo, useRef, useState } from "react";
 import Chart from "chart.js/auto";
+import { useAuth } from "../auth/AuthContext";
 
 type PricePoint = {
   ts: string;
@@ -9,14 +10,66 @@ type PricePoint = {
 type PriceHistoryChartProps = {
   data: PricePoint[];
   label: string;
+  historyPath?: string;
 };
 
-const PriceHistoryChart = ({ data, label }: PriceHistoryChartProps) => {
+const API_BASE =
+  (import.meta as any).env?.VITE_API_URL ?? `${window.location.origin}/api`;
+
+const SERVER_RANGES: Record<string, string> = {
+  "1D": "1d",
+  "7D": "7d",
+  "1M": "30d",
+  "3M": "90d",
+  "6M": "180d",
+  "1Y": "1y",
+  ALL: "all",
+};
+
+const MAX_POINTS = 300;
+
+const PriceHistoryChart = ({ data, label, historyPath }: PriceHistoryChartProps) => {
+  const { token } = useAuth();
   const canvasRef = useRef<HTMLCanvasElement | null>(null);
   const chartRef = useRef<Chart | null>(null);
   const [range, setRange] = useState("1M");
+  const [serverData, setServerData] = useState<PricePoint[] | null>(null);
+
+  useEffect(() => {
+    if (!historyPath || !token) {
+      setServerData(null);
+      return;
+    }
+    let cancelled = false;
+    const params = new URLSearchParams({ range: SERVER_RANGES[range] ?? "30d", max_points: String(MAX_POINTS) });
+    fetch(`${API_BASE}${historyPath}?${params.toString()}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    })
+      .then((response) => (response.ok ? response.json() : null))
+      .then((payload: { price_history?: PricePoint[] } | null) => {
+        if (!cancelled) {
+          setServerData(payload?.price_history ?? null);
+        }
+      })
+      .catch(() => {
+        if (!cancelled) {
+          setServerData(null);
+        }
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [historyPath, token, range]);
 
   const chartData = useMemo(() => {
+    if (serverData) {
+      // Already bucketed and range-filtered server side.
+      const points = serverData.filter((point) => point.market !== null && point.market !== undefined);
+      return {
+        labels: points.map((point) => new Date(point.ts).toLocaleDateString()),
+        values: points.map((point) => Number(point.market)),
+      };
+    }
     const points = (data || [])
       .filter((point) => point.market !== null && point.market !== undefined)
       .map((point) => ({
@@ -55,7 +108,7 @@ const PriceHistoryChart = ({ data, label }: PriceHistoryChartProps) => {
       labels: filtered.map((point) => new Date(point.ts).toLocaleDateString()),
       values: filtered.map((point) => point.market),
     };
-  }, [data, range]);
+  }, [data, range, serverData]);
 
   const accent = useMemo(() => {
     if (typeof window === "undefined") return "#f59e0b";
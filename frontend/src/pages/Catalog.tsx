@@ -492,6 +492,7 @@ const Catalog = () => {
         latestPrice={detailLatest}
         priceLabel="NM market history"
         priceHistory={detailHistory}
+        historyPath={detailCard ? `/cards/${detailCard.id}/history` : undefined}
         details={[
           { label: "Set", value: detailSet?.name },
           { label: "Series", value: detailSet?.series },
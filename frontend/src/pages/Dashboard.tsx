@@ -1,24 +1,20 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import { useAuth } from "../auth/AuthContext";
 import PriceHistoryChart, { PricePoint } from "../components/PriceHistoryChart";
 import { useToast } from "../components/Toast";
 
-type HoldingRow = {
-  holding_id: number;
-  quantity: number;
-  card: {
-    id: number;
-    name: string;
-  };
-};
-
-type PriceRow = {
+type TopHolding = {
   card_id: number;
-  market: number | null;
+  name: string;
+  value: number;
 };
 
-type GradedRow = {
-  id: number;
+type Summary = {
+  holdings: number;
+  priced_holdings: number;
+  graded: number;
+  total_value: number;
+  top_holdings: TopHolding[];
 };
 
 type PortfolioPoint = {
@@ -32,87 +28,29 @@ const API_BASE =
 const Dashboard = () => {
   const { notify } = useToast();
   const { token } = useAuth();
-  const [holdings, setHoldings] = useState<HoldingRow[]>([]);
-  const [prices, setPrices] = useState<Record<number, PriceRow>>({});
-  const [gradedCount, setGradedCount] = useState(0);
+  const [summary, setSummary] = useState<Summary | null>(null);
   const [portfolio, setPortfolio] = useState<PortfolioPoint[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
-  const totalValue = useMemo(() => {
-    return holdings.reduce((sum, holding) => {
-      const price = prices[holding.card.id]?.market;
-      if (!price) return sum;
-      return sum + price * holding.quantity;
-    }, 0);
-  }, [holdings, prices]);
-
-  const pricedCount = useMemo(() => {
-    return holdings.filter((holding) => prices[holding.card.id]?.market).length;
-  }, [holdings, prices]);
-
-  const topHoldings = useMemo(() => {
-    return holdings
-      .map((holding) => {
-        const price = prices[holding.card.id]?.market ?? 0;
-        return {
-          name: holding.card.name,
-          value: price * holding.quantity,
-        };
-      })
-      .filter((row) => row.value > 0)
-      .sort((a, b) => b.value - a.value)
-      .slice(0, 5);
-  }, [holdings, prices]);
+  const totalValue = summary?.total_value ?? 0;
+  const holdingsCount = summary?.holdings ?? 0;
+  const pricedCount = summary?.priced_holdings ?? 0;
+  const gradedCount = summary?.graded ?? 0;
+  const topHoldings = summary?.top_holdings ?? [];
 
   const loadDashboard = async () => {
     if (!token) return;
     setLoading(true);
     setError(null);
     try {
-      const holdingsResponse = await fetch(`${API_BASE}/holdings/my`, {
+      const summaryResponse = await fetch(`${API_BASE}/analytics/summary`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      if (!holdingsResponse.ok) {
-        throw new Error(`Failed to load holdings (${holdingsResponse.status})`);
-      }
-      const holdingsData = (await holdingsResponse.json()) as HoldingRow[];
-      setHoldings(holdingsData);
-
-      const gradedResponse = await fetch(`${API_BASE}/graded`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      if (gradedResponse.ok) {
-        const gradedData = (await gradedResponse.json()) as GradedRow[];
-        setGradedCount(gradedData.length);
-      } else {
-        setGradedCount(0);
-      }
-
-      if (holdingsData.length) {
-        const next: Record<number, PriceRow> = {};
-        const ids = holdingsData.map((holding) => holding.card.id);
-        const batchSize = 50;
-        for (let i = 0; i < ids.length; i += batchSize) {
-          const batch = ids.slice(i, i + batchSize);
-          const priceResponse = await fetch(`${API_BASE}/cards/prices`, {
-            method: "POST",
-            headers: {
-              Authorization: `Bearer ${token}`,
-              "Content-Type": "application/json",
-            },
-            body: JSON.stringify({ card_ids: batch, fetch_remote: true }),
-          });
-          if (!priceResponse.ok) continue;
-          const payload = (await priceResponse.json()) as { prices: PriceRow[] };
-          payload.prices.forEach((price) => {
-            next[price.card_id] = price;
-          });
-        }
-        setPrices(next);
-      } else {
-        setPrices({});
+      if (!summaryResponse.ok) {
+        throw new Error(`Failed to load summary (${summaryResponse.status})`);
       }
+      setSummary((await summaryResponse.json()) as Summary);
 
       const portfolioResponse = await fetch(`${API_BASE}/analytics/portfolio`, {
         headers: { Authorization: `Bearer ${token}` },
@@ -150,13 +88,13 @@ const Dashboard = () => {
             {loading ? "Loading..." : `$${totalValue.toFixed(2)}`}
           </h2>
           <p className="mt-2 text-xs text-white/50">
-            {pricedCount}/{holdings.length} holdings priced
+            {pricedCount}/{holdingsCount} holdings priced
           </p>
         </div>
         <div className="rounded-2xl border border-white/10 bg-surface p-5">
           <p className="text-sm text-white/50">Holdings vs Graded</p>
           <h2 className="mt-4 text-2xl font-semibold text-white">
-            {loading ? "Loading..." : `${holdings.length} / ${gradedCount}`}
+            {loading ? "Loading..." : `${holdingsCount} / ${gradedCount}`}
           </h2>
           <p className="mt-2 text-xs text-white/50">Holdings / graded items</p>
         </div>
@@ -215,9 +153,9 @@ const Dashboard = () => {
                 No priced holdings yet.
               </li>
             )}
-            {topHoldings.map((row, idx) => (
+            {topHoldings.map((row) => (
               <li
-                key={`${row.name}-${idx}`}
+                key={row.card_id}
                 className="flex items-center justify-between rounded-xl bg-base/60 px-4 py-3"
               >
                 <span>{row.name}</span>
@@ -36,6 +36,7 @@ type GradedRow = {
   card_id: number;
   grader: string;
   grade: string;
+  graded_price: number | null;
 };
 
 type CardImageRow = {
@@ -83,6 +84,7 @@ const Holdings = () => {
   const [detailHistory, setDetailHistory] = useState<PricePoint[]>([]);
   const [detailLatest, setDetailLatest] = useState<number | null>(null);
   const [detailMeta, setDetailMeta] = useState<{
+    cardId?: number;
     name?: string;
     number?: string;
     rarity?: string | null;
@@ -195,6 +197,7 @@ const Holdings = () => {
     setDetailLatest(priceMap[item.card.id]?.market ?? null);
     const graded = gradedMap[item.card.id];
     setDetailMeta({
+      cardId: item.card.id,
       name: item.card.name,
       number: item.card.number,
       rarity: item.card.rarity ?? null,
@@ -261,54 +264,31 @@ const Holdings = () => {
   const loadGraded = async () => {
     if (!token) return;
     try {
-      const response = await fetch(`${API_BASE}/graded`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      if (!response.ok) {
-        setGradedMap({});
-        return;
-      }
-      const data = (await response.json()) as GradedRow[];
       const map: Record<number, GradedRow> = {};
-      data.forEach((row) => {
-        map[row.card_id] = row;
-      });
-      setGradedMap(map);
-      const ids = data.map((row) => row.id);
-      if (ids.length) {
-        await fetchGradedPrices(ids);
-      } else {
-        setGradedPrices({});
-      }
-    } catch {
-      setGradedMap({});
-      setGradedPrices({});
-    }
-  };
-
-  const fetchGradedPrices = async (gradedIds: number[]) => {
-    if (!token) return;
-    try {
-      const next: Record<number, { market: number | null }> = {};
-      const batchSize = 50;
-      for (let i = 0; i < gradedIds.length; i += batchSize) {
-        const batch = gradedIds.slice(i, i + batchSize);
-        const response = await fetch(`${API_BASE}/graded/prices`, {
-          method: "POST",
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify({ graded_ids: batch, fetch_remote: true }),
+      const prices: Record<number, { market: number | null }> = {};
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ page_size: "500" });
+        if (cursor) params.set("cursor", cursor);
+        const response = await fetch(`${API_BASE}/graded/listing?${params.toString()}`, {
+          headers: { Authorization: `Bearer ${token}` },
         });
-        if (!response.ok) continue;
-        const payload = (await response.json()) as { prices: { graded_id: number; market: number | null }[] };
-        payload.prices.forEach((price) => {
-          next[price.graded_id] = { market: price.market };
+        if (!response.ok) {
+          setGradedMap({});
+          setGradedPrices({});
+          return;
+        }
+        const payload = (await response.json()) as { data: GradedRow[]; next_cursor: string | null };
+        payload.data.forEach((row) => {
+          if (!map[row.card_id]) map[row.card_id] = row;
+          prices[row.id] = { market: row.graded_price };
         });
-      }
-      setGradedPrices(next);
+        cursor = payload.next_cursor;
+      } while (cursor);
+      setGradedMap(map);
+      setGradedPrices(prices);
     } catch {
+      setGradedMap({});
       setGradedPrices({});
     }
   };
@@ -728,6 +708,13 @@ const Holdings = () => {
             : "NM market history"
         }
         priceHistory={detailHistory}
+        historyPath={
+          detailMeta?.gradedId
+            ? `/graded/${detailMeta.gradedId}/history`
+            : detailMeta?.cardId
+              ? `/cards/${detailMeta.cardId}/history`
+              : undefined
+        }
         details={[
           { label: "Set", value: detailMeta?.setName },
           { label: "Number", value: detailMeta?.number },